@@ -0,0 +1,250 @@
+"""
+Balance-tuning sweeps over the game's costs and random event chances.
+
+A configuration sets the knobs designers otherwise edit by hand: SLIGHT_DAMAGE_COST, SEVERE_DAMAGE_COST,
+TOTAL_DAMAGE_COST, TIRE_UPGRADE_COST, TIRE_GRIP and the random_event_chance of the levels (all of them scaled by
+chance_scale, or one level set directly). Every configuration is evaluated exactly with the solver
+(solver.py), under the optimal policy, and reports:
+    expected_cost         expected total money lost until the game is won, over all cars
+    expected_money_lost   expected "Total Money Lost" shown at the end of a game
+    bust_probability      chance that an attempt ends with a totaled car
+    tire_upgrade_value    how much the tire upgrade saves, compared to never buying it
+    upgrades              at which levels the optimal player buys the tires
+
+Configurations are evaluated across a process pool. Results are stored in a content-addressed cache:
+the file name is the SHA-256 of everything the result depends on (the solved layout and CACHE_VERSION),
+so a repeated or extended sweep only computes the points it has not seen, whatever their order,
+and edited levels never hit stale results.
+
+A sweep is either a grid (the product of the given values) or, with --target-cost, an adaptive pattern
+search: starting from the best grid point it tries a step up and down on every knob, keeps the
+configuration whose expected_cost is closest to the target and halves the steps when none got closer.
+
+Usage: python balance.py --slight 150,250,400 --total 1000,2000,4000 --chance-scale 0.5,1,2
+       python balance.py --target-cost 12000 --rounds 6
+"""
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+
+from main import Game
+from sketches import load_checkpoint, save_checkpoint
+from solver import layout_key, solve_layout
+
+
+CACHE_VERSION = 3
+# Bump when the solver's results change, so old cache entries are not reused.
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".balance-cache")
+KNOBS = ('slight', 'severe', 'total', 'tire', 'tire_grip', 'chance_scale')
+INTEGER_KNOBS = ('slight', 'severe', 'total', 'tire')
+
+Config = collections.namedtuple('Config', KNOBS + ('level_chances',))
+Config.__doc__ = """
+One point of a sweep: the four costs in $, tire_grip (see Game.TIRE_GRIP), chance_scale (multiplies every
+level's random_event_chance, capped at 1) and level_chances, a tuple of (level index, chance) pairs that
+override single levels.
+"""
+
+
+def default_config(game_class=Game):
+    return Config(game_class.SLIGHT_DAMAGE_COST, game_class.SEVERE_DAMAGE_COST, game_class.TOTAL_DAMAGE_COST,
+                  game_class.TIRE_UPGRADE_COST, game_class.TIRE_GRIP, 1.0, ())
+
+
+def config_layout(base_layout, config):
+    """
+    :param base_layout: solver.layout_key() of the levels being tuned.
+    :return: The solver layout of the levels with config applied.
+    """
+    levels, costs = base_layout
+    overrides = dict(config.level_chances)
+    levels = tuple((overrides.get(index, min(1.0, chance * config.chance_scale)), turns)
+                   for index, (chance, turns) in enumerate(levels))
+    car_price = costs[3]
+    return levels, (config.slight, config.severe, config.total, car_price, config.tire, config.tire_grip)
+
+
+def cache_key(layout):
+    """
+    :return: Hex SHA-256 of the layout and CACHE_VERSION, the name of the layout's cache entry.
+    """
+    text = json.dumps({'version': CACHE_VERSION, 'layout': layout}, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + ".json")
+
+
+def evaluate(layout):
+    """
+    Description: Worker entry point; solves one layout with and without the tire upgrade.
+    :return: Dictionary of the reported values, or {'error': message} when the layout cannot be solved.
+    """
+    levels, costs = layout
+    try:
+        solution = solve_layout(layout)
+        without_tires = solve_layout((levels, costs[:4] + (math.inf,) + costs[5:]))
+        # An infinite price means the upgrade is never bought.
+    except (ValueError, RuntimeError) as error:
+        return {'error': str(error)}
+    return {'expected_cost': solution.expected_total_money_lost,
+            'expected_money_lost': solution.expected_money_lost,
+            'bust_probability': 1 - solution.completion_probability,
+            'expected_restarts': solution.expected_restarts,
+            'tire_upgrade_value': without_tires.expected_total_money_lost - solution.expected_total_money_lost,
+            'upgrades': list(solution.upgrades)}
+
+
+def evaluate_configs(configs, levels=None, workers=None, cache_dir=DEFAULT_CACHE, game_class=Game):
+    """
+    Description: Evaluates configurations across a process pool, reusing and filling the on-disk cache.
+    :param configs: Iterable of Config.
+    :param levels: Level objects to tune; defaults to game_class.create_levels().
+    :param workers: Integer, worker processes; defaults to os.cpu_count().
+    :param cache_dir: Directory of the result cache, or None to disable it.
+    :return: (list of (Config, result dictionary) in the order of configs, number of cached results).
+    """
+    base_layout = layout_key(levels if levels is not None else game_class.create_levels(), game_class)
+    configs = list(configs)
+    layouts = [config_layout(base_layout, config) for config in configs]
+    results = {}
+    for layout in layouts:
+        if cache_dir and layout not in results:
+            cached = load_checkpoint(_cache_path(cache_dir, cache_key(layout)))
+            if cached is not None:
+                results[layout] = cached
+    hits = len(results)
+
+    missing = list(dict.fromkeys(layout for layout in layouts if layout not in results))
+    workers = workers or os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        # Worker processes are only started by the first submitted layout.
+        if len(missing) > 1 and workers > 1:
+            computed = pool.map(evaluate, missing, chunksize=max(1, len(missing) // (4 * workers)))
+        else:
+            computed = map(evaluate, missing)
+        for layout, result in zip(missing, computed):
+            results[layout] = result
+            if cache_dir:
+                path = _cache_path(cache_dir, cache_key(layout))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                save_checkpoint(path, result)
+                # Written as results arrive, so an interrupted sweep keeps what it computed.
+    return [(config, results[layout]) for config, layout in zip(configs, layouts)], hits
+
+
+def grid(base, **values):
+    """
+    :param base: Config whose knobs are kept where values gives none.
+    :param values: Knob name -> list of values.
+    :return: List of Config, the product of the values.
+    """
+    names = [name for name in KNOBS if values.get(name)]
+    return [base._replace(**dict(zip(names, point)))
+            for point in itertools.product(*(values[name] for name in names))]
+
+
+def _distance(result, target):
+    return abs(result['expected_cost'] - target) if 'error' not in result else math.inf
+
+
+def adaptive_search(start, target_cost, rounds=6, steps=None, **kwargs):
+    """
+    Description: Pattern search for the configuration whose expected_cost is closest to target_cost.
+    :param start: List of Config to start from (e.g. a grid); the best of them is the first center.
+    :param steps: Dictionary knob -> initial step; defaults to a quarter of the center's value.
+    :param kwargs: Passed to evaluate_configs().
+    :return: (list of every distinct (Config, result) evaluated, number of cached results).
+    """
+    results, hits = evaluate_configs(start, **kwargs)
+    evaluated = dict(results)
+    best = min(evaluated.items(), key=lambda item: _distance(item[1], target_cost))[0]
+    steps = dict(steps or {name: getattr(best, name) / 4 for name in KNOBS})
+    for _ in range(rounds):
+        neighbours = []
+        for name in KNOBS:
+            center, step = getattr(best, name), steps[name]
+            for candidate in (center - step, center + step):
+                candidate = round(candidate) if name in INTEGER_KNOBS else candidate
+                if 0 <= candidate and (name != 'tire_grip' or candidate <= 1) and candidate != center:
+                    neighbours.append(best._replace(**{name: candidate}))
+            # One knob at a time: 2 * len(KNOBS) configurations per round instead of a 3 ** len(KNOBS) grid.
+        results, round_hits = evaluate_configs(neighbours, **kwargs)
+        evaluated.update(results)
+        hits += round_hits
+        center, best = best, min(evaluated.items(), key=lambda item: _distance(item[1], target_cost))[0]
+        if best == center:
+            steps = {name: step / 2 for name, step in steps.items()}
+            # No neighbour got closer: search closer around the center.
+    return list(evaluated.items()), hits
+
+
+def format_result(config, result):
+    knobs = (f"slight {config.slight:>5} severe {config.severe:>5} total {config.total:>5} "
+             f"tire {config.tire:>5} grip {config.tire_grip:<5g} chances x{config.chance_scale:<5g}")
+    if config.level_chances:
+        knobs += " " + " ".join(f"L{index + 1}={chance:g}" for index, chance in config.level_chances)
+    if 'error' in result:
+        return f"{knobs} | {result['error']}"
+    return (f"{knobs} | cost ${result['expected_cost']:>10,.2f}  bust {result['bust_probability']:7.2%}  "
+            f"tires worth ${result['tire_upgrade_value']:>8,.2f}  buy at {result['upgrades']}")
+
+
+def _values(kind):
+    return lambda text: [kind(value) for value in text.split(',')]
+
+
+def _level_chance(text):
+    level, _, chances = text.partition('=')
+    return int(level) - 1, [float(chance) for chance in chances.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the game's costs and random event chances.")
+    parser.add_argument('--slight', type=_values(int), help="comma-separated SLIGHT_DAMAGE_COST values")
+    parser.add_argument('--severe', type=_values(int), help="comma-separated SEVERE_DAMAGE_COST values")
+    parser.add_argument('--total', type=_values(int), help="comma-separated TOTAL_DAMAGE_COST values")
+    parser.add_argument('--tire', type=_values(int), help="comma-separated TIRE_UPGRADE_COST values")
+    parser.add_argument('--tire-grip', type=_values(float), help="comma-separated TIRE_GRIP values")
+    parser.add_argument('--chance-scale', type=_values(float), help="comma-separated factors for every level's chance")
+    parser.add_argument('--level-chance', type=_level_chance, action='append', default=[], metavar='LEVEL=VALUES',
+                        help="random_event_chance values of one level (1-based), e.g. 2=0.1,0.3; repeatable")
+    parser.add_argument('--target-cost', type=float, help="adaptive search for this expected cost instead of a grid")
+    parser.add_argument('--rounds', type=int, default=6)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="result cache directory ('' disables it)")
+    parser.add_argument('--json', help="also write every result to this JSON file")
+    args = parser.parse_args(argv)
+
+    configs = grid(default_config(), slight=args.slight, severe=args.severe, total=args.total, tire=args.tire,
+                   tire_grip=args.tire_grip, chance_scale=args.chance_scale)
+    for level_index, chances in args.level_chance:
+        configs = [config._replace(level_chances=config.level_chances + ((level_index, chance),))
+                   for config in configs for chance in chances]
+
+    started = time.perf_counter()
+    if args.target_cost is None:
+        evaluated, hits = evaluate_configs(configs, workers=args.workers, cache_dir=args.cache)
+    else:
+        evaluated, hits = adaptive_search(configs, args.target_cost, args.rounds, workers=args.workers,
+                                          cache_dir=args.cache)
+        print(f"Searched {len(evaluated)} configurations; the 10 closest to ${args.target_cost:,.2f}:")
+        evaluated = sorted(evaluated, key=lambda item: _distance(item[1], args.target_cost))[:10]
+    elapsed = time.perf_counter() - started
+    for config, result in evaluated:
+        print(format_result(config, result))
+    print(f"Done in {elapsed:.2f}s ({hits} results from the cache)")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump([{**config._asdict(), **result} for config, result in evaluated], file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
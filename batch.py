@@ -0,0 +1,190 @@
+"""
+Scripted batch mode: plays many games from a script, for QA and load testing.
+
+A script has one game per line. Its words are the answers the player would type, minus the
+"Press Enter" pauses, which batch mode skips:
+    left / straight / right (or l / s / r)   the direction of the next turn
+    yes / no (or y / n)                      the answer to the tire upgrade offer at the start of a level;
+                                             may be left out, a direction there means "no"
+    quit                                     ends the game, like typing quit at the start of a level
+    seed=N                                   plays the game with Game(seed=N), for reproducible runs
+Anything after a # is a comment. A game whose line runs out of answers stops there (finished: false).
+Any other word is an invalid answer, which the console game would ask again for: it is reported
+(in full output) and skipped. A line with an invalid seed is not played; summary output reports it
+as {"line": N, "error": ...} and the totals count it as skipped.
+
+Output goes through one buffered writer, in one of three modes:
+    full     the same texts as the console game, without the pause prompts
+    summary  one JSON object per game: line, seed, finished, money_lost, restarts, turns, car_status
+    quiet    only the totals at the end
+
+Usage: python main.py --batch script.txt [--output summary], or --batch - to read the script from stdin.
+"""
+import json
+import sys
+import time
+
+import main
+from main import Game
+
+
+DIRECTIONS = {'left': 'left', 'l': 'left', 'straight': 'straight', 's': 'straight', 'right': 'right', 'r': 'right'}
+ANSWERS = {'yes': True, 'y': True, 'no': False, 'n': False}
+
+
+class ScriptError(ValueError):
+    pass
+
+
+def parse_line(line):
+    """
+    :return: (seed or None, list of answers), or None for blank and comment-only lines.
+             Unknown words are kept as answers; play_script_game() treats them as invalid input.
+    :raises ScriptError: For a seed=N word whose N is not an integer.
+    """
+    words = line.split('#', 1)[0].lower().split()
+    if not words:
+        return None
+    seed = None
+    answers = []
+    for word in words:
+        if word.startswith('seed='):
+            try:
+                seed = int(word[5:])
+            except ValueError:
+                raise ScriptError(f"Invalid seed {word!r}")
+        else:
+            answers.append(word)
+    return seed, answers
+
+
+def play_script_game(seed, answers, levels=None, lines=None):
+    """
+    Description: Plays one game from its answers with Game.step().
+    :param lines: Optional list that receives the console texts of the game.
+    :return: The Game, in the state the answers left it.
+    """
+    game = Game(levels=levels, seed=seed)
+    answers = iter(answers)
+    if lines is not None:
+        lines += [main.TITLE, main.INTRO]
+    answer = next(answers, None)
+    while not game.is_finished() and answer is not None:
+        turn_number = game.current_turn_index
+        upgrade = False
+        if turn_number == 0:
+            if lines is not None:
+                lines.append(game.level_banner("Starting", game.current_level_index))
+            if answer == 'quit':
+                if lines is not None:
+                    lines.append(main.GOODBYE)
+                break
+            if game.tires_upgraded:
+                if lines is not None:
+                    lines.append(main.TIRES_ALREADY_UPGRADED)
+            else:
+                while answer is not None and answer not in ANSWERS and answer not in DIRECTIONS:
+                    if lines is not None:
+                        lines.append(main.UPGRADE_INVALID)
+                    answer = next(answers, None)
+                    # Like the console game, anything but yes/no is asked again; a direction still means "no".
+                if answer is None:
+                    break
+                if answer in ANSWERS:
+                    upgrade = ANSWERS[answer]
+                    answer = next(answers, None)
+                    if lines is not None:
+                        lines.append(main.UPGRADE_ACCEPTED if upgrade else main.UPGRADE_DECLINED)
+                elif lines is not None:
+                    lines.append(main.UPGRADE_DECLINED)
+        if lines is not None:
+            lines.append(game.turn_header(game.levels[game.current_level_index], turn_number))
+            # Printed before the choice is read, like the console game, so invalid answers follow it.
+        while answer is not None and answer not in DIRECTIONS:
+            if lines is not None:
+                lines.append(main.CHOICE_INVALID)
+            answer = next(answers, None)
+            # Like the console game, anything but a direction is asked again.
+        if answer is None:
+            break
+
+        result = game.step(DIRECTIONS[answer], upgrade)
+        if lines is not None:
+            lines += game.report_turn(result)
+            if result.reset:
+                lines += main.RESET_MESSAGES
+            elif result.level_completed:
+                lines.append(game.level_banner("Completed", result.level_index) + "\n")
+        answer = next(answers, None)
+
+    if lines is not None and game.is_finished():
+        lines += [main.CONGRATULATIONS, f"Total Money Lost: ${game.money_lost}", main.THANK_YOU]
+    return game
+
+
+def run_script(script, out, output='summary', levels=None):
+    """
+    Description: Plays every game of a script.
+    :param script: Iterable of script lines (e.g. an open file).
+    :param out: Text stream receiving the output; written in large blocks.
+    :param output: 'full', 'summary' or 'quiet'.
+    :return: Dictionary of totals: games, finished, turns, money_lost, skipped (lines with an invalid seed),
+             seconds.
+    """
+    if output not in ('full', 'summary', 'quiet'):
+        raise ValueError(f"Unknown output mode {output!r}")
+    totals = {'games': 0, 'finished': 0, 'turns': 0, 'money_lost': 0, 'skipped': 0}
+    buffer = []
+    started = time.perf_counter()
+    for line_number, line in enumerate(script, 1):
+        try:
+            parsed = parse_line(line)
+        except ScriptError as error:
+            totals['skipped'] += 1
+            if output == 'full':
+                buffer.append(f"Skipped line {line_number}: {error}")
+            elif output == 'summary':
+                buffer.append(json.dumps({'line': line_number, 'error': str(error)}))
+            continue
+            # One bad line must not abort a run of thousands of games.
+        if parsed is None:
+            continue
+        seed, answers = parsed
+        lines = [] if output == 'full' else None
+        game = play_script_game(seed, answers, levels, lines)
+        finished = game.is_finished()
+        totals['games'] += 1
+        totals['finished'] += finished
+        totals['turns'] += game.turns_played
+        totals['money_lost'] += game.money_lost
+        if output == 'full':
+            buffer += lines
+        elif output == 'summary':
+            buffer.append(json.dumps({'line': line_number, 'seed': game.seed, 'finished': finished,
+                                      'money_lost': game.money_lost, 'restarts': game.restarts,
+                                      'turns': game.turns_played, 'car_status': str(game.car_status)}))
+        if len(buffer) >= 4096:
+            out.write("\n".join(buffer) + "\n")
+            buffer.clear()
+    if buffer:
+        out.write("\n".join(buffer) + "\n")
+    totals['seconds'] = time.perf_counter() - started
+    return totals
+
+
+def main_batch(path, output='summary', levels=None):
+    """
+    Description: Entry point of `main.py --batch`: runs a script file ('-' for stdin) and prints the totals.
+    """
+    script = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        totals = run_script(script, sys.stdout, output, levels)
+        # run_script() writes thousands of lines per call, so stdout is not flushed line by line.
+    finally:
+        if script is not sys.stdin:
+            script.close()
+        sys.stdout.flush()
+    rate = totals['games'] / max(totals['seconds'], 1e-9)
+    print(f"Batch: {totals['games']} games, {totals['finished']} finished, {totals['turns']} turns, "
+          f"{totals['skipped']} lines skipped, in {totals['seconds']:.2f}s ({rate:,.0f} games/s)", file=sys.stderr)
+    return totals
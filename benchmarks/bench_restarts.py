@@ -0,0 +1,94 @@
+"""
+Stress benchmark for the restart flow of Game.start_game().
+
+Drives the interactive game through 100,000 consecutive totaled cars: every turn of a one-level
+layout totals the car, input() is answered by a script and the console output goes to os.devnull.
+Python memory (tracemalloc) and the call stack depth are sampled along the way; both must stay flat.
+
+Usage: python -m benchmarks.bench_restarts [--restarts 100000]
+"""
+import argparse
+import builtins
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+
+import main
+from main import Event, Game, Level, Turn
+
+
+def wreck_levels():
+    """
+    :return: A single level whose every direction totals the car and which never rolls a clear path.
+    """
+    crash = Event("Benchmark crash.", "Totaled")
+    return [Level("Wreck Road", [Turn(crash, crash, crash)], random_event_chance=0.0)]
+
+
+def run(restarts, samples=10):
+    """
+    :return: List of (restarts, seconds, traced memory in bytes, stack depth) samples.
+    """
+    game = Game(levels=wreck_levels())
+    every = max(restarts // samples, 1)
+    report = []
+    started = time.perf_counter()
+
+    def scripted_input(prompt=""):
+        if prompt == main.START_LEVEL_PROMPT:
+            if game.restarts and game.restarts % every == 0 and (not report or report[-1][0] != game.restarts):
+                report.append((game.restarts, time.perf_counter() - started,
+                               tracemalloc.get_traced_memory()[0], _stack_depth()))
+            return 'quit' if game.restarts >= restarts else ''
+        if prompt == main.UPGRADE_PROMPT:
+            return 'no'
+        if prompt == main.CHOICE_PROMPT:
+            return 'left'
+        return ''
+
+    real_input = builtins.input
+    builtins.input = scripted_input
+    tracemalloc.start()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            game.start_game()
+    except SystemExit:
+        pass
+        # start_game() calls exit() when the script answers 'quit'.
+    finally:
+        builtins.input = real_input
+        tracemalloc.stop()
+    return report
+
+
+def _stack_depth():
+    depth = 0
+    frame = sys._getframe(1)
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Check that start_game() restarts in constant memory.")
+    parser.add_argument('--restarts', type=int, default=100_000)
+    parser.add_argument('--max-growth', type=int, default=64 * 1024,
+                        help="allowed traced memory growth in bytes between the first and last sample")
+    args = parser.parse_args(argv)
+
+    report = run(args.restarts)
+    print(f"{'restarts':>10} {'seconds':>9} {'memory KiB':>11} {'stack':>6}")
+    for restarts, seconds, memory, depth in report:
+        print(f"{restarts:>10} {seconds:>9.2f} {memory / 1024:>11.1f} {depth:>6}")
+    growth = report[-1][2] - report[0][2]
+    flat = growth <= args.max_growth and report[-1][3] == report[0][3]
+    print(f"Memory growth {growth / 1024:.1f} KiB, stack depth {report[0][3]} -> {report[-1][3]}: "
+          f"{'flat' if flat else 'NOT flat'}")
+    return 0 if flat else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
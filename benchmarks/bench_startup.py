@@ -0,0 +1,86 @@
+"""
+Startup benchmark: how long importing main and building the first Game take.
+
+Each sample is a fresh interpreter (stdin closed, so an import that started the interactive game would
+fail instead of hanging), timed against an interpreter that imports nothing. The difference is the
+cost a pool worker or test process pays for `import main`. The same processes also time the first
+Game() (loads the level pack) and the following ones (shared level tables).
+
+Usage: python -m benchmarks.bench_startup [--runs 20] [--budget-ms 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.Game()
+first_game = time.perf_counter()
+for _ in range(1000):
+    main.Game()
+print(imported - started, first_game - imported, (time.perf_counter() - first_game) / 1000)
+"""
+
+
+def interpreter_seconds(code):
+    """
+    :return: (wall seconds, stdout) of a fresh interpreter running code.
+    """
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - started, output
+
+
+def run(runs):
+    """
+    :return: Dictionary of median seconds: 'interpreter', 'import', 'first_game' and 'game', plus
+             'import_only_side_effects', the optional modules that a bare `import main` loaded.
+    """
+    interpreter_seconds('import main')
+    # Warms the .pyc and level pack caches, like any run after the first one.
+    bare, imports, first_games, games = [], [], [], []
+    for _ in range(runs):
+        bare.append(interpreter_seconds('pass')[0])
+        import_seconds, first_game, game = interpreter_seconds(PROBE)[1].split()
+        imports.append(float(import_seconds))
+        first_games.append(float(first_game))
+        games.append(float(game))
+    loaded = interpreter_seconds("import sys, main; print(' '.join(sorted(m for m in ('random', 'levelpack', "
+                                 "'array', 'mmap', 'json') if m in sys.modules)))")[1].split()
+    return {
+        'interpreter': statistics.median(bare),
+        'import': statistics.median(imports),
+        'first_game': statistics.median(first_games),
+        'game': statistics.median(games),
+        'import_only_side_effects': loaded,
+    }
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the startup cost of importing main.")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=5.0, help="allowed median time of `import main`")
+    args = parser.parse_args(argv)
+
+    report = run(args.runs)
+    print(f"python -c pass        {report['interpreter'] * 1e3:8.2f} ms")
+    print(f"import main           {report['import'] * 1e3:8.2f} ms")
+    print(f"first Game()          {report['first_game'] * 1e3:8.2f} ms  (loads the level pack)")
+    print(f"next Game()           {report['game'] * 1e6:8.2f} us")
+    print(f"Modules loaded by the import itself: {', '.join(report['import_only_side_effects']) or 'none'}")
+    ok = report['import'] * 1e3 <= args.budget_ms
+    print(f"import main {'within' if ok else 'OVER'} the {args.budget_ms:g} ms budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,246 @@
+"""
+Benchmark suite for the game engine, run headlessly.
+
+Measures level loading, Game() construction, turn dispatch through step() and through the console
+play_turn() (input() answered by a script, output sent to os.devnull), full-game throughput, memory
+per Game and the peak of a full game, and how games/s scales across 1..N processes.
+
+Results are compared with the saved baselines in benchmarks/baselines.json: a metric more than
+--threshold worse than its baseline is a regression and makes the run exit with status 1.
+Baselines are machine specific; save new ones with --save after changing machines.
+
+Usage: python -m benchmarks.bench_suite [--quick] [--save] [--threshold 0.2] [--processes 4]
+"""
+import argparse
+import builtins
+import concurrent.futures
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import levelpack
+from main import Game
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+LOWER_IS_BETTER = {'bytes_per_game', 'full_game_peak_bytes'}
+# Memory metrics; every other metric is a rate.
+
+
+def greedy(turn):
+    return min(Game.CHOICES, key=lambda choice: turn.get_event(choice).damage)
+
+
+def best_rate(function, repeat=5):
+    """
+    :param function: Callable returning the number of operations it performed.
+    :return: Operations per second of the fastest of `repeat` runs.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operations = function()
+        best = max(best, operations / (time.perf_counter() - started))
+    return best
+
+
+"""------------------------------BENCHMARKS----------------------------------"""
+
+
+def bench_create_levels(count):
+    def run():
+        for _ in range(count):
+            Game.create_levels.cache_clear()
+            levelpack._open_packs.clear()
+            Game.create_levels()
+        return count
+    return best_rate(run)
+
+
+def bench_game_construction(count):
+    Game.create_levels()
+
+    def run():
+        for _ in range(count):
+            Game()
+        return count
+    return best_rate(run)
+
+
+def bench_step(turns):
+    def run():
+        game = Game(seed=0)
+        for _ in range(turns):
+            if game.is_finished():
+                game = Game(seed=0)
+            game.step(greedy(game.turn_at(game.current_level_index, game.current_turn_index)))
+        return turns
+    return best_rate(run)
+
+
+def bench_play_turn(turns):
+    """
+    :return: Turns per second through the console play_turn(), with input() and print() going nowhere.
+    """
+    def run():
+        game = Game(seed=0)
+        played = 0
+        real_input = builtins.input
+        builtins.input = lambda prompt='': 'no' if prompt.startswith('Would') else 'left'
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                while played < turns:
+                    level = game.levels[game.current_level_index]
+                    for turn_number in range(len(level.turns)):
+                        played += 1
+                        if not game.play_turn(level, turn_number, game.turn_at(game.current_level_index, turn_number)):
+                            break
+                    else:
+                        game.current_level_index = (game.current_level_index + 1) % len(game.levels)
+        finally:
+            builtins.input = real_input
+        return played
+    return best_rate(run)
+
+
+def play_games(games, seed=0):
+    """
+    :return: (games, turns) played headlessly with the greedy strategy.
+    """
+    turns = 0
+    for index in range(games):
+        game = Game(seed=seed + index)
+        while not game.is_finished():
+            game.step(greedy(game.turn_at(game.current_level_index, game.current_turn_index)))
+            turns += 1
+    return games, turns
+
+
+def bench_full_games(games):
+    played = []
+
+    def run():
+        played.append(play_games(games))
+        return games
+    rate = best_rate(run)
+    return rate, rate * played[-1][1] / games
+
+
+def bench_memory(games):
+    """
+    :return: (traced bytes per live Game, peak traced bytes while playing one full game).
+    """
+    Game.create_levels()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [Game() for _ in range(games)]
+        per_game = (tracemalloc.get_traced_memory()[0] - before) / len(kept)
+        del kept
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        play_games(1)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return per_game, peak
+
+
+def bench_scaling(games_per_process, processes):
+    """
+    :return: Dictionary process count -> total games per second with that many worker processes.
+    """
+    rates = {}
+    for workers in processes:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(play_games, [1] * workers))
+            # Starts the workers and loads the levels before timing.
+            started = time.perf_counter()
+            played = sum(games for games, _ in pool.map(play_games, [games_per_process] * workers,
+                                                         range(0, workers * games_per_process, games_per_process)))
+            rates[workers] = played / (time.perf_counter() - started)
+    return rates
+
+
+"""--------------------------------RUNNER------------------------------------"""
+
+
+def run(quick=False, processes=None):
+    """
+    :return: Dictionary metric name -> value. Rates are per second, memory in bytes.
+    """
+    scale = 10 if quick else 1
+    metrics = {'create_levels_per_s': bench_create_levels(200 // scale),
+               'games_constructed_per_s': bench_game_construction(20_000 // scale),
+               'step_turns_per_s': bench_step(100_000 // scale),
+               'play_turn_turns_per_s': bench_play_turn(50_000 // scale)}
+    metrics['full_games_per_s'], metrics['full_game_turns_per_s'] = bench_full_games(2_000 // scale)
+    metrics['bytes_per_game'], metrics['full_game_peak_bytes'] = bench_memory(10_000 // scale)
+    processes = processes or os.cpu_count() or 1
+    counts = sorted({1, processes} | {count for count in (2, 4, 8, 16) if count < processes})
+    for workers, rate in bench_scaling(2_000 // scale, counts).items():
+        metrics[f'scaling_{workers}_processes_games_per_s'] = rate
+    return metrics
+
+
+def lower_is_better(metric):
+    return metric in LOWER_IS_BETTER
+
+
+def compare(metrics, baselines, threshold):
+    """
+    :return: List of (metric, value, baseline, relative change, regressed) for every metric with a baseline;
+             the relative change is positive when the metric got better.
+    """
+    rows = []
+    for metric, value in metrics.items():
+        baseline = baselines.get(metric)
+        if not baseline:
+            continue
+        change = (baseline - value) / baseline if lower_is_better(metric) else (value - baseline) / baseline
+        rows.append((metric, value, baseline, change, change < -threshold))
+    return rows
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game engine and check for regressions.")
+    parser.add_argument('--quick', action='store_true', help="10x fewer iterations, for a smoke run")
+    parser.add_argument('--processes', type=int, help="largest process count of the scaling benchmark")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed relative slowdown, 0.2 = 20%%")
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--save', action='store_true', help="save the results as the new baselines")
+    args = parser.parse_args(argv)
+
+    metrics = run(args.quick, args.processes)
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as file:
+            baselines = json.load(file)['metrics']
+    rows = {row[0]: row for row in compare(metrics, baselines, args.threshold)}
+
+    print(f"{'metric':42s} {'value':>14s} {'baseline':>14s} {'change':>8s}")
+    for metric, value in metrics.items():
+        if metric in rows:
+            _, _, baseline, change, regressed = rows[metric]
+            print(f"{metric:42s} {value:14,.1f} {baseline:14,.1f} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+        else:
+            print(f"{metric:42s} {value:14,.1f} {'-':>14s}")
+
+    if args.save:
+        with open(args.baselines, 'w') as file:
+            json.dump({'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                                   'cpus': os.cpu_count()},
+                       'metrics': metrics}, file, indent=2)
+            file.write("\n")
+        print(f"Saved baselines to {args.baselines}")
+        return 0
+    regressions = [row for row in rows.values() if row[4]]
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
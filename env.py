@@ -0,0 +1,244 @@
+"""
+Reset/step environments for training driving policies, in the style of Gymnasium.
+
+An action is an integer 0-5: action % 3 is the direction (0 left, 1 straight, 2 right) and
+action >= 3 buys the tire upgrade when it is offered (first turn of a level, tires not upgraded yet).
+The reward of a step is minus the money it cost: repairs, the tire upgrade and a totaled car.
+
+An observation is an integer vector:
+    0 level index, 1 turn index, 2 car_status (main.Damage code), 3 tires_upgraded, 4 money_lost,
+    5-7 the damage codes of left/straight/right on the current turn (what the player reads in the event
+    descriptions before choosing; random events and upgraded tires can still soften the chosen one)
+
+RoadWreckerEnv steps one Game. VectorRoadWreckerEnv steps thousands of independent games per call
+over NumPy arrays (the same tables as simulation.py) and resets finished games automatically.
+If gymnasium is installed both expose action_space and observation_space.
+
+Usage: python env.py --envs 4096 --steps 1000   (measures vector env steps/s with a random agent)
+"""
+import argparse
+import time
+
+import numpy as np
+
+from main import Game
+from simulation import HEALTHY, TOTALED, LevelTables, _turn_orders, damage_of, resolve_outcomes, unpack_options
+
+try:
+    import gymnasium
+except ImportError:
+    gymnasium = None
+
+
+OBSERVATION_SIZE = 8
+ACTION_COUNT = 2 * len(Game.CHOICES)
+
+
+def _spaces(levels, game_class):
+    """
+    :return: (action_space, observation_space), or (None, None) without gymnasium.
+    """
+    if gymnasium is None:
+        return None, None
+    high = np.array([len(levels), max(len(level.turns) for level in levels), 3, 1, np.iinfo(np.int64).max, 3, 3, 3])
+    return (gymnasium.spaces.Discrete(ACTION_COUNT),
+            gymnasium.spaces.Box(low=0, high=high, shape=(OBSERVATION_SIZE,), dtype=np.int64))
+
+
+class RoadWreckerEnv:
+    """
+    Purpose: Single-game environment on top of Game.step().
+    """
+    def __init__(self, levels=None, max_turns=10_000, game_class=Game):
+        """
+        :param levels: Optional Level objects; defaults to game_class.create_levels().
+        :param max_turns: Integer, episodes are truncated after this many steps.
+        """
+        self.levels = tuple(levels) if levels is not None else game_class.create_levels()
+        self.max_turns = max_turns
+        self.game_class = game_class
+        self.game = None
+        self.turns = 0
+        self.action_space, self.observation_space = _spaces(self.levels, game_class)
+
+    def observation(self):
+        game = self.game
+        if game.is_finished():
+            level, turn, options = game.current_level_index, 0, (0, 0, 0)
+        else:
+            level, turn = game.current_level_index, game.current_turn_index
+            options = tuple(event.damage for event in game.turn_at(level, turn))
+        return np.array((level, turn, game.car_status, game.tires_upgraded, game.money_lost) + options, dtype=np.int64)
+
+    def reset(self, seed=None):
+        """
+        :param seed: Optional integer seed of the new game.
+        :return: (observation, info)
+        """
+        self.game = self.game_class(levels=self.levels, seed=seed)
+        self.turns = 0
+        return self.observation(), {'seed': self.game.seed}
+
+    def step(self, action):
+        """
+        :return: (observation, reward, terminated, truncated, info)
+        """
+        action = int(action)
+        result = self.game.step(Game.CHOICES[action % 3], action >= 3)
+        self.turns += 1
+        reward = -(result.cost + (self.game.TIRE_UPGRADE_COST if result.upgraded else 0))
+        terminated = self.game.is_finished()
+        truncated = not terminated and self.turns >= self.max_turns
+        return self.observation(), reward, terminated, truncated, {'result': result}
+
+
+class VectorRoadWreckerEnv:
+    """
+    Purpose: num_envs independent games stepped together over arrays. A game that ends is reset in the
+    same step: the returned observation is already its new game's first one, and info holds the final
+    money_lost and restarts of the games that ended (like Gymnasium's autoreset vector envs).
+    """
+    def __init__(self, num_envs, levels=None, seed=None, max_turns=10_000, game_class=Game):
+        """
+        :param num_envs: Integer, the number of games.
+        :param levels: Optional Level objects; defaults to game_class.create_levels().
+        :param seed: Optional seed of the numpy random generator of all games.
+        :param max_turns: Integer, games are truncated after this many steps.
+        :param game_class: The class providing the costs.
+        """
+        levels = tuple(levels) if levels is not None else game_class.create_levels()
+        self.tables = LevelTables(levels, game_class)
+        self.num_envs = num_envs
+        self.max_turns = max_turns
+        self.rng = np.random.default_rng(seed)
+        self.action_space, self.observation_space = _spaces(levels, game_class)
+        self.single_action_space, self.single_observation_space = self.action_space, self.observation_space
+
+        self.routes = np.zeros((num_envs, self.tables.level_count, self.tables.max_turns), dtype=np.uint8)
+        # routes[env, level, position] is the packed code of the turn the game meets there (see LevelTables).
+        self.level = np.zeros(num_envs, dtype=np.int64)
+        self.turn = np.zeros(num_envs, dtype=np.int64)
+        self.status = np.zeros(num_envs, dtype=np.int64)
+        self.tires = np.zeros(num_envs, dtype=bool)
+        self.money = np.zeros(num_envs, dtype=np.int64)
+        self.restarts = np.zeros(num_envs, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.envs = np.arange(num_envs)
+
+    def _shuffle_routes(self, games):
+        """
+        :param games: Integer array of the envs that drive the levels in a new turn order.
+        """
+        order = _turn_orders(self.tables, len(games), self.rng)
+        # order[position, game, level] -> routes[game, level, position]
+        self.routes[games] = self.tables.turn_codes[np.arange(self.tables.level_count), order].transpose(1, 2, 0)
+
+    def _reset_games(self, games):
+        """
+        :param games: Integer array of the envs that start a new game.
+        """
+        if not len(games):
+            return
+        self._shuffle_routes(games)
+        self.level[games] = 0
+        self.turn[games] = 0
+        self.status[games] = HEALTHY
+        self.tires[games] = False
+        self.money[games] = self.tables.car_price
+        self.restarts[games] = 0
+        self.steps[games] = 0
+
+    def observations(self):
+        level = np.minimum(self.level, self.tables.level_count - 1)
+        codes = self.routes[self.envs, level, self.turn]
+        observation = np.empty((self.num_envs, OBSERVATION_SIZE), dtype=np.int64)
+        observation[:, 0] = self.level
+        observation[:, 1] = self.turn
+        observation[:, 2] = self.status
+        observation[:, 3] = self.tires
+        observation[:, 4] = self.money
+        observation[:, 5:] = unpack_options(codes)
+        return observation
+
+    def reset(self, seed=None):
+        """
+        :return: (observations, info) for all games.
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_games(self.envs)
+        return self.observations(), {}
+
+    def step(self, actions):
+        """
+        :param actions: Integer array of num_envs actions.
+        :return: (observations, rewards, terminated, truncated, info) arrays.
+        """
+        tables = self.tables
+        actions = np.asarray(actions)
+        choice = (actions % 3).astype(np.uint8)
+        rewards = np.zeros(self.num_envs, dtype=np.int64)
+
+        buying = (self.turn == 0) & ~self.tires & (actions >= 3)
+        self.money += buying * tables.tire_upgrade_cost
+        rewards -= buying * tables.tire_upgrade_cost
+        self.tires |= buying
+
+        codes = self.routes[self.envs, self.level, self.turn]
+        damage = resolve_outcomes(tables, self.level, self.tires, damage_of(codes, choice),
+                                  self.rng.random(self.num_envs))
+        cost = tables.costs[damage]
+        rewards -= cost
+        self.money += cost
+        self.status = np.maximum(self.status, damage)
+        self.turn += 1
+        self.steps += 1
+
+        totaled = damage == TOTALED
+        self.level[totaled] = 0
+        self.turn[totaled] = 0
+        self.status[totaled] = HEALTHY
+        self.tires[totaled] = False
+        self.money[totaled] = tables.car_price
+        self.restarts[totaled] += 1
+        if totaled.any():
+            self._shuffle_routes(np.flatnonzero(totaled))
+            # Like Game.restart(), every new attempt drives the levels in a new order.
+
+        level_done = self.turn == tables.turn_counts[np.minimum(self.level, tables.level_count - 1)]
+        self.level += level_done
+        self.turn[level_done] = 0
+
+        terminated = self.level == tables.level_count
+        truncated = ~terminated & (self.steps >= self.max_turns)
+        ended = np.flatnonzero(terminated | truncated)
+        info = {}
+        if len(ended):
+            info = {'ended': ended, 'final_money_lost': self.money[ended].copy(),
+                    'final_restarts': self.restarts[ended].copy()}
+            self._reset_games(ended)
+        return self.observations(), rewards, terminated, truncated, info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the vector environment with a random agent.")
+    parser.add_argument('--envs', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VectorRoadWreckerEnv(args.envs, seed=args.seed)
+    env.reset()
+    rng = np.random.default_rng(args.seed)
+    episodes = 0
+    started = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, _, _, info = env.step(rng.integers(0, ACTION_COUNT, size=args.envs))
+        episodes += len(info.get('ended', ()))
+    elapsed = time.perf_counter() - started
+    steps = args.envs * args.steps
+    print(f"{steps} steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s), {episodes} episodes ended")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Seeded procedural level generator.
+
+Builds routes of any length (e.g. 1,000-turn endurance routes) from the event vocabulary of the
+default levels. Every turn is derived from a hash of (seed, level, turn index), so a route is a
+lazy, random-access sequence: turn 999,999 is built on its own when a game reaches it, nothing is
+stored per turn, and the same seed and parameters always give the same route. Generated routes
+are already in random order, so games play them as they are instead of keeping a shuffled copy.
+Like the hand-made levels, no generated turn is Totaled in all three directions.
+
+Difficulty is controlled per level by its damage mix (relative weights of Healthy, Slightly Damaged,
+Severely Damaged and Totaled choices) and its random_event_chance. Generated level sets are kept in
+an LRU cache keyed by the seed and the parameters.
+
+Usage: python generator.py --seed 7 --levels 3 --turns 1000 --difficulty 0.3
+"""
+import argparse
+import bisect
+import collections
+import functools
+import time
+
+from main import Damage, Event, Game, Level, Turn
+
+
+MASK64 = (1 << 64) - 1
+CLEAR_PATH = Event("Clear path! No issues this turn.", Damage.HEALTHY)
+# The only Healthy event the default levels have, used when a mix asks for healthy choices.
+
+LevelSpec = collections.namedtuple('LevelSpec', 'name turns random_event_chance damage_mix')
+LevelSpec.__doc__ = """
+Parameters of one generated level: its name, number of turns, random_event_chance and damage_mix,
+a tuple of 4 relative weights for (Healthy, Slightly Damaged, Severely Damaged, Totaled) choices.
+"""
+
+
+def _mix64(value):
+    """
+    :return: The splitmix64 finalizer of value: a fast, well-distributed 64-bit hash.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def damage_mix(difficulty):
+    """
+    :param difficulty: Float from 0 (mostly harmless) to 1 (mostly wrecks).
+    :return: A damage mix tuple; 0.3 is about as hard as the default levels.
+    """
+    difficulty = min(max(difficulty, 0.0), 1.0)
+    return (max(0.4 - difficulty, 0.0), 1.0 - 0.6 * difficulty, 0.2 + 0.8 * difficulty, 0.05 + 0.9 * difficulty)
+
+
+@functools.lru_cache(maxsize=None)
+def event_vocabulary(levels=None):
+    """
+    :param levels: Optional tuple of levels to take the events from; defaults to Game.create_levels().
+    :return: Tuple of 4 tuples of events, one per damage tier, in a stable order.
+    """
+    events = {CLEAR_PATH}
+    for level in levels if levels is not None else Game.create_levels():
+        for turn in level.turns:
+            events.update(turn)
+    tiers = [[] for _ in Damage]
+    for event in sorted(events, key=lambda event: (event.damage, event.description)):
+        tiers[event.damage].append(event)
+    return tuple(tuple(tier) for tier in tiers)
+
+
+class TurnStream:
+    """
+    Purpose: Read-only sequence of the generated turns of one level. Turns are computed on access
+    from (seed, level, index) and never stored, so a route's length costs no memory.
+    """
+    preshuffled = True
+    # Tells Level and Game to keep this sequence as it is (see Game.shuffle_turn_orders).
+    __slots__ = ('key', 'length', 'thresholds', 'vocabulary')
+
+    def __init__(self, seed, level_index, length, mix, vocabulary):
+        """
+        :param seed: Integer seed of the level set.
+        :param level_index: Integer, position of the level in the set.
+        :param length: Integer, number of turns.
+        :param mix: Damage mix of the level (see LevelSpec); tiers without events in the vocabulary never occur.
+        :param vocabulary: Events per damage tier, see event_vocabulary().
+        """
+        weights = [weight if vocabulary[tier] else 0.0 for tier, weight in enumerate(mix)]
+        if not sum(weights) > 0:
+            raise ValueError(f"Damage mix {mix} has no weight on a damage tier with events")
+        self.key = _mix64(_mix64(seed & MASK64) ^ level_index)
+        self.length = length
+        total, running, thresholds = sum(weights), 0.0, []
+        for weight in weights:
+            running += weight
+            thresholds.append(round(running / total * 0x10000))
+        thresholds[-1] = 0x10000
+        self.thresholds = thresholds
+        # A 16-bit hash slice below thresholds[tier] (and not below the previous one) picks that tier. The last
+        # entry is 0x10000, above every slice, and a zero-weight tier repeats the previous entry, so it is never picked.
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("turn index out of range")
+        bits = _mix64(self.key ^ index) << 64 | _mix64(self.key ^ index ^ 0x5DEECE66D << 32)
+        # 128 bits: 3 choices x (16 bits for the damage tier + 16 bits for the event within the tier).
+        events = []
+        for _ in range(3):
+            tier = bisect.bisect_right(self.thresholds, bits & 0xFFFF)
+            events.append(self.vocabulary[tier][(bits >> 16 & 0xFFFF) % len(self.vocabulary[tier])])
+            bits >>= 32
+        if all(event.damage == Damage.TOTALED for event in events) and self.vocabulary[Damage.SEVERE]:
+            severe = self.vocabulary[Damage.SEVERE]
+            events[index % 3] = severe[index % len(severe)]
+            # Every turn keeps a way through, as in the hand-made levels; otherwise long routes could not be finished.
+        return Turn(*events)
+
+    def __iter__(self):
+        for index in range(self.length):
+            yield self[index]
+
+
+@functools.lru_cache(maxsize=64)
+def generate_levels(seed, specs, vocabulary_levels=None):
+    """
+    Description: Generates a level set; the same arguments always return the same (cached) tuple.
+    :param seed: Integer seed.
+    :param specs: Tuple of LevelSpec.
+    :param vocabulary_levels: Optional tuple of levels providing the events; defaults to the default levels.
+    :return: Tuple of Level objects whose turns are TurnStreams.
+    """
+    vocabulary = event_vocabulary(vocabulary_levels)
+    return tuple(Level(spec.name, TurnStream(seed, index, spec.turns, tuple(spec.damage_mix), vocabulary),
+                       spec.random_event_chance)
+                 for index, spec in enumerate(specs))
+
+
+def endurance_route(seed, turns=1_000, levels=3, difficulty=0.3, random_event_chance=0.2):
+    """
+    :return: A generated level set of `levels` levels of `turns` turns each, getting harder level by level.
+    """
+    specs = tuple(LevelSpec(f"Endurance Route {index + 1}", turns, random_event_chance,
+                            damage_mix(difficulty * (1 + index / max(levels, 1))))
+                  for index in range(levels))
+    return generate_levels(seed, specs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a route and play it with the greedy strategy.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--levels', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=1_000)
+    parser.add_argument('--difficulty', type=float, default=0.3)
+    parser.add_argument('--random-event-chance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    levels = endurance_route(args.seed, args.turns, args.levels, args.difficulty, args.random_event_chance)
+    game = Game(levels=levels, seed=args.seed)
+    damage = collections.Counter()
+    while not game.is_finished() and game.restarts < 1_000:
+        turn = game.turn_at(game.current_level_index, game.current_turn_index)
+        damage[game.step(min(Game.CHOICES, key=lambda choice: turn.get_event(choice).damage)).damage] += 1
+    elapsed = time.perf_counter() - started
+    for level in levels:
+        print(f"{level.name}: {len(level.turns)} turns, random_event_chance {level.random_event_chance}")
+    print("Damage taken: " + ", ".join(f"{damage_type.label} {damage[damage_type]}" for damage_type in Damage))
+    print(f"{'Finished' if game.is_finished() else 'Gave up'} after {game.turns_played} turns and "
+          f"{game.restarts} restarts, money lost ${game.money_lost} ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
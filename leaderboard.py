@@ -0,0 +1,369 @@
+"""
+Persistent leaderboard of completed runs, ranked by the lowest "Total Money Lost" (then restarts, then time).
+
+The store is an append-only log of checksummed records. Submissions are buffered and written, then
+fsync'ed, in batches (every sync_every records or sync_interval seconds, whichever comes first), so
+one fsync covers thousands of runs. A daemon thread syncs a batch once it is sync_interval seconds old,
+even when no further run is submitted. A crash can lose the runs submitted since the last sync, but never
+corrupts the log: on open, a torn or corrupt record at the end is cut off and everything before it is kept.
+
+Two indexes are kept in memory and rebuilt from the log on open: the global top K and the top K of
+every level (by the money spent on that level in the winning attempt). Both are sorted lists that only
+take a run that beats their current K-th entry, so submitting costs O(log K) for most runs and a query
+returns K entries without touching the history. Runs that are in no index can never rank again, so
+compaction rewrites the log with only the indexed runs; it happens automatically once the log holds
+compact_after records more than the indexes.
+
+Log layout (little-endian):
+    header  magic "RWLB", version u8, level count u32
+    record  crc32 u32 of the payload, payload length u32, payload:
+            money_lost u32, restarts u32, turns u32, seconds f64, timestamp f64, seed u64,
+            one u32 per level (money spent on it), name length u8, name (UTF-8)
+
+Usage: python leaderboard.py scores.rwlb [--top 10] [--level 2] [--compact] [--bench 100000]
+"""
+import argparse
+import bisect
+import collections
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+from main import Game, GameObserver
+
+
+MAGIC = b"RWLB"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sBI")
+RECORD_HEADER = struct.Struct("<II")
+# The payload length is a u32 too, so a run of thousands of levels still fits in one record.
+PAYLOAD = struct.Struct("<IIIddQ")
+
+Entry = collections.namedtuple('Entry', 'money_lost restarts turns seconds timestamp seed level_costs name')
+Entry.__doc__ = """
+One completed run. level_costs is a tuple with the money spent on each level in the attempt that won.
+"""
+
+
+def _rank(entry):
+    return entry.money_lost, entry.restarts, entry.seconds, entry.timestamp
+
+
+def encode_entry(entry):
+    """
+    :return: bytes of the entry's log record.
+    """
+    name = entry.name.encode()[:255].decode(errors='ignore').encode()
+    # Cut on a character boundary: a multi-byte character split at byte 255 is dropped whole.
+    payload = (PAYLOAD.pack(entry.money_lost, entry.restarts, entry.turns, entry.seconds, entry.timestamp, entry.seed)
+               + struct.pack(f"<{len(entry.level_costs)}I", *entry.level_costs) + bytes((len(name),)) + name)
+    return RECORD_HEADER.pack(zlib.crc32(payload), len(payload)) + payload
+
+
+def decode_entries(data, offset, level_count):
+    """
+    Description: Reads records from offset until the end of data or the first torn/corrupt record.
+    :return: (list of Entry, offset just after the last valid record).
+    """
+    entries = []
+    levels = struct.Struct(f"<{level_count}I")
+    while offset + RECORD_HEADER.size <= len(data):
+        crc, length = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc or length < PAYLOAD.size + levels.size + 1:
+            break
+        money_lost, restarts, turns, seconds, timestamp, seed = PAYLOAD.unpack_from(payload, 0)
+        level_costs = levels.unpack_from(payload, PAYLOAD.size)
+        name = payload[PAYLOAD.size + levels.size + 1:].decode(errors='replace')
+        entries.append(Entry(money_lost, restarts, turns, seconds, timestamp, seed, level_costs, name))
+        offset = start + length
+    return entries, offset
+
+
+class TopK:
+    """
+    Purpose: The K best entries by a key, as a sorted list.
+    """
+    __slots__ = ('k', 'keys', 'entries')
+
+    def __init__(self, k):
+        self.k = k
+        self.keys = []
+        self.entries = []
+
+    def add(self, key, entry):
+        """
+        :return: True if the entry made it into the top K.
+        """
+        if len(self.keys) >= self.k and key >= self.keys[-1]:
+            return False
+            # The common case under load: one comparison with the current K-th entry.
+        index = bisect.bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.entries.insert(index, entry)
+        if len(self.keys) > self.k:
+            self.keys.pop()
+            self.entries.pop()
+        return True
+
+
+class Leaderboard:
+    """
+    Purpose: Thread-safe leaderboard store on one log file. Use as a context manager, or call close(),
+    so the last batch is written.
+    """
+    def __init__(self, path, level_count=None, k=100, sync_every=4096, sync_interval=0.5, compact_after=100_000):
+        """
+        :param path: The log file; created if missing.
+        :param level_count: Integer, levels per run; defaults to the file's, or to the default levels for a new file.
+        :param k: Integer, entries kept in every top-K index.
+        :param sync_every: Integer, buffered submissions that trigger a write and fsync.
+        :param sync_interval: Float, seconds after which a batch is written and fsync'ed, by the next submission
+                              or by the background flush thread; None only syncs every sync_every records.
+        :param compact_after: Integer, records in the log beyond the indexed ones that trigger a compaction.
+        """
+        self.path = path
+        self.k = k
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        self.lock = threading.Lock()
+        self.pending = []
+        # Encoded records not written yet.
+        self.last_sync = time.monotonic()
+        self.submitted = 0
+
+        if level_count is None and not os.path.exists(path):
+            level_count = len(Game.create_levels())
+        self.file = open(path, 'a+b')
+        self.file.seek(0)
+        data = self.file.read()
+        if data:
+            magic, version, file_level_count = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} leaderboard")
+            if level_count is not None and level_count != file_level_count:
+                raise ValueError(f"{path} ranks runs of {file_level_count} levels, not {level_count}")
+            self.level_count = file_level_count
+            entries, end = decode_entries(data, HEADER.size, self.level_count)
+            if end < len(data):
+                self.file.truncate(end)
+                # Cuts off the torn record a crash left behind.
+        else:
+            self.level_count = level_count
+            self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, level_count))
+            self._fsync()
+            entries = []
+        self.records = len(entries)
+        self.top = TopK(k)
+        self.level_tops = [TopK(k) for _ in range(self.level_count)]
+        for entry in entries:
+            self._index(entry)
+        self.stopped = threading.Event()
+        self.thread = None
+        if sync_interval:
+            self.thread = threading.Thread(target=self._flush_loop, name='leaderboard-flush', daemon=True)
+            self.thread.start()
+
+    def _flush_loop(self):
+        while not self.stopped.wait(self.sync_interval):
+            with self.lock:
+                if self.pending and not self.file.closed and time.monotonic() - self.last_sync >= self.sync_interval:
+                    self._sync()
+
+    def _fsync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _index(self, entry):
+        rank = _rank(entry)
+        self.top.add(rank, entry)
+        for cost, level_top in zip(entry.level_costs, self.level_tops):
+            level_top.add((cost,) + rank, entry)
+
+    def submit(self, money_lost, restarts=0, seconds=0.0, level_costs=None, name='', seed=0, turns=0):
+        """
+        Description: Records a completed run. It is on disk after the next sync (see the class parameters).
+        :param money_lost: Integer, the run's "Total Money Lost".
+        :param level_costs: Optional sequence with the money spent on each level; zeros when unknown.
+        :return: The Entry.
+        """
+        level_costs = tuple(level_costs) if level_costs is not None else (0,) * self.level_count
+        if len(level_costs) != self.level_count:
+            raise ValueError(f"Expected {self.level_count} level costs, got {len(level_costs)}")
+        entry = Entry(money_lost, restarts, turns, seconds, time.time(), seed, level_costs, name)
+        record = encode_entry(entry)
+        with self.lock:
+            self.pending.append(record)
+            self.records += 1
+            self.submitted += 1
+            self._index(entry)
+            if len(self.pending) >= self.sync_every or (self.sync_interval is not None
+                                                        and time.monotonic() - self.last_sync >= self.sync_interval):
+                self._sync()
+        return entry
+
+    def _sync(self):
+        if self.pending:
+            self.file.write(b"".join(self.pending))
+            self.pending.clear()
+            self._fsync()
+        self.last_sync = time.monotonic()
+        if self.records - self.indexed_count() > self.compact_after:
+            self._compact()
+
+    def sync(self):
+        """
+        Description: Writes and fsyncs every pending submission now.
+        """
+        with self.lock:
+            self._sync()
+
+    def indexed_entries(self):
+        """
+        :return: The distinct entries of all indexes, best first.
+        """
+        entries = {id(entry): entry for top in [self.top] + self.level_tops for entry in top.entries}
+        return sorted(entries.values(), key=_rank)
+
+    def indexed_count(self):
+        return len({id(entry) for top in [self.top] + self.level_tops for entry in top.entries})
+
+    def _compact(self):
+        temporary = self.path + ".compact"
+        with open(temporary, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.level_count))
+            file.write(b"".join(encode_entry(entry) for entry in self.indexed_entries()))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        # Atomic: a crash leaves either the old log or the compacted one.
+        self.file.close()
+        self.file = open(self.path, 'a+b')
+        self.records = self.indexed_count()
+
+    def compact(self):
+        """
+        Description: Writes pending submissions, then rewrites the log with only the indexed runs.
+        """
+        with self.lock:
+            self._sync()
+            self._compact()
+
+    def top_runs(self, count=10):
+        """
+        :return: List of the best `count` (at most K) entries.
+        """
+        with self.lock:
+            return self.top.entries[:count]
+
+    def level_best(self, level_index, count=10):
+        """
+        :return: List of the `count` (at most K) entries that spent the least on a level.
+        """
+        with self.lock:
+            return self.level_tops[level_index].entries[:count]
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LeaderboardObserver(GameObserver):
+    """
+    Purpose: Submits every game it is attached to to a Leaderboard when the game is completed, with the
+    money spent on each level since the last restart and the time since the game's first turn.
+    """
+    def __init__(self, leaderboard, name='', executor=None):
+        """
+        :param executor: Optional concurrent.futures executor that runs the submissions (and the fsyncs and
+                         compactions they trigger), e.g. so an asyncio server never blocks its event loop on them.
+        """
+        self.leaderboard = leaderboard
+        self.name = name
+        self.executor = executor
+        self.runs = weakref.WeakKeyDictionary()
+        # game -> [start time, turns, money spent per level]; dropped with games that are never completed.
+
+    def _run(self, game):
+        run = self.runs.get(game)
+        if run is None:
+            run = self.runs[game] = [time.monotonic(), 0, [0] * len(game.levels)]
+        return run
+
+    def on_upgrade(self, game, level_index, accepted):
+        if accepted:
+            self._run(game)[2][level_index] += game.TIRE_UPGRADE_COST
+
+    def on_turn(self, game, level, result, seconds):
+        run = self._run(game)
+        run[1] += 1
+        run[2][result.level_index] += result.cost
+
+    def on_reset(self, game):
+        run = self._run(game)
+        run[2] = [0] * len(game.levels)
+
+    def on_game_completed(self, game):
+        started, turns, level_costs = self.runs.pop(game, None) or self._run(game)
+        run = (game.money_lost, game.restarts, time.monotonic() - started, level_costs,
+               self.name, game.seed if isinstance(game.seed, int) else 0, turns)
+        if self.executor is None:
+            self.leaderboard.submit(*run)
+        else:
+            self.executor.submit(self.leaderboard.submit, *run)
+
+
+def format_entry(position, entry):
+    return (f"{position:>4}. ${entry.money_lost:<8,} restarts {entry.restarts:<4} {entry.seconds:8.2f}s  "
+            f"{entry.name or '-':16s} levels {'/'.join(f'${cost:,}' for cost in entry.level_costs)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show, compact or load-test a leaderboard file.")
+    parser.add_argument('path')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--level', type=int, help="show the best runs of this level (1-based) instead")
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--bench', type=int, metavar='RUNS', help="submit this many random runs and report the rate")
+    args = parser.parse_args(argv)
+
+    with Leaderboard(args.path) as leaderboard:
+        if args.bench:
+            import random
+            rng = random.Random(0)
+            started = time.perf_counter()
+            for _ in range(args.bench):
+                costs = [rng.randrange(0, 5_000, 250) for _ in range(leaderboard.level_count)]
+                leaderboard.submit(Game.CAR_PRICE + sum(costs), rng.randrange(5), rng.uniform(10, 600), costs)
+            leaderboard.sync()
+            elapsed = time.perf_counter() - started
+            print(f"Submitted {args.bench} runs in {elapsed:.2f}s ({args.bench / elapsed:,.0f} runs/s)")
+        if args.compact:
+            leaderboard.compact()
+        if args.level is None:
+            entries = leaderboard.top_runs(args.top)
+        else:
+            entries = leaderboard.level_best(args.level - 1, args.top)
+        for position, entry in enumerate(entries, 1):
+            print(format_entry(position, entry))
+        print(f"{leaderboard.records} runs in {args.path} ({os.path.getsize(args.path):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Level packs: the game's levels defined in an external JSON or TOML file.
+
+A pack source looks like this (TOML packs use the same keys):
+
+    {
+      "name": "My Pack",
+      "levels": [
+        {"name": "Suburban Roads", "random_event_chance": 0.1,
+         "turns": [{"left": ["You hit a pothole.", "Slightly Damaged"],
+                    "straight": ["Skid on a wet road.", "Severely Damaged"],
+                    "right": ["Collision with a stray shopping cart.", "Totaled"]}]},
+        {"name": "Countryside Roads", "random_event_chance": 0.2, "turns_from": "Suburban Roads"}
+      ]
+    }
+
+The first time a source is opened it is compiled into a compact binary file next to it
+("<source>.rwpack"), which is memory-mapped on every later open. The operating system shares the
+mapped pages between all processes that open the same pack, and the cache is recompiled
+automatically whenever the size or modification time of the source changes (like .pyc files).
+
+Binary layout (little-endian), right after the header:
+    level records   n_levels x (name string, first level_turns entry, turn count, random_event_chance)
+    level_turns     u32 turn id per level turn (levels with "turns_from" share one range)
+    turns           n_turns x 3 u32 event ids (left, straight, right)
+    turn_damage     n_turns x 3 u8 damage codes, ready for array-based simulators
+    events          n_events u32 description string ids, then n_events u8 damage codes
+    strings         (n_strings + 1) u32 offsets into the UTF-8 blob that follows
+"""
+import collections.abc
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+
+MAGIC = b"RWPK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHQqIIIIII")
+# magic, version, reserved, source size, source mtime_ns, pack name, strings, events, turns, levels, level turns.
+LEVEL_RECORD = struct.Struct("<IIId")
+DAMAGE_LABELS = ("Healthy", "Slightly Damaged", "Severely Damaged", "Totaled")
+# The damage codes of the pack format, in the same order as main.Damage.
+CHOICES = ('left', 'straight', 'right')
+EAGER_TURNS = 4096
+# Packs with up to this many level turns are built all at once into tuples, which are the fastest to index;
+# larger packs are built lazily, a level or turn at a time, so they open in milliseconds.
+
+
+class LevelPack:
+    """
+    Purpose: Read-only view of a compiled level pack. Nothing is copied out of the buffer until a
+    level or turn is asked for, so opening even a pack with thousands of levels only reads its header.
+    """
+    def __init__(self, buffer, path=None):
+        """
+        :param buffer: The compiled pack, as a mmap or bytes object.
+        :param path: Optional path of the compiled file, for error messages.
+        """
+        self.buffer = buffer
+        self.path = path
+        view = memoryview(buffer)
+        (magic, version, _, self.source_size, self.source_mtime_ns, name_id, string_count, event_count,
+         turn_count, level_count, level_turn_count) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path or 'buffer'} is not a version {FORMAT_VERSION} level pack")
+
+        offset = HEADER.size
+        self._level_records = view[offset:offset + LEVEL_RECORD.size * level_count]
+        offset += len(self._level_records)
+        self.level_turns = view[offset:offset + 4 * level_turn_count].cast('I')
+        offset += 4 * level_turn_count
+        self.turn_events = view[offset:offset + 12 * turn_count].cast('I')
+        offset += 12 * turn_count
+        self.turn_damage = view[offset:offset + 3 * turn_count]
+        # turn_damage[3 * turn + choice] is the damage code of that choice; usable with numpy.frombuffer.
+        offset += 3 * turn_count
+        self.event_descriptions = view[offset:offset + 4 * event_count].cast('I')
+        offset += 4 * event_count
+        self.event_damage = view[offset:offset + event_count]
+        offset += event_count
+        self._string_offsets = view[offset:offset + 4 * (string_count + 1)].cast('I')
+        offset += 4 * (string_count + 1)
+        self._strings = view[offset:]
+        self.name = self.string(name_id)
+        self.level_count = level_count
+        self._levels = {}
+        self._turns = {}
+        self._turn_ranges = {}
+        # Materialized level and turn objects, keyed by (index, classes used to build them).
+        # Levels built from the same turns share the same PackTurns and Turn objects.
+
+    def __len__(self):
+        return self.level_count
+
+    def string(self, string_id):
+        return bytes(self._strings[self._string_offsets[string_id]:self._string_offsets[string_id + 1]]).decode()
+
+    def level_record(self, level_index):
+        """
+        :return: (name, first level_turns entry, turn count, random_event_chance) of a level.
+        """
+        name_id, first, count, chance = LEVEL_RECORD.unpack_from(self._level_records, LEVEL_RECORD.size * level_index)
+        return self.string(name_id), first, count, chance
+
+    def level(self, level_index, event_class, turn_class, level_class):
+        """
+        :return: The level built with the given classes; built once and cached per pack. In packs larger than
+                 EAGER_TURNS its turns are a PackTurns, so only the turns that are played are ever built.
+        """
+        key = (level_index, event_class, turn_class, level_class)
+        level = self._levels.get(key)
+        if level is None:
+            name, first, count, chance = self.level_record(level_index)
+            turns_key = (first, count, event_class, turn_class)
+            turns = self._turn_ranges.get(turns_key)
+            if turns is None:
+                turns = PackTurns(self, self.level_turns[first:first + count], event_class, turn_class)
+                if len(self.level_turns) <= EAGER_TURNS:
+                    turns = tuple(turns)
+                self._turn_ranges[turns_key] = turns
+            level = self._levels[key] = level_class(name, turns, chance)
+        return level
+
+    def turn(self, turn_id, event_class, turn_class):
+        key = (turn_id, event_class, turn_class)
+        turn = self._turns.get(key)
+        if turn is None:
+            events = self.turn_events[3 * turn_id:3 * turn_id + 3]
+            turn = self._turns[key] = turn_class(*(event_class(self.string(self.event_descriptions[event_id]),
+                                                               self.event_damage[event_id]) for event_id in events))
+        return turn
+
+    def levels(self, event_class=None, turn_class=None, level_class=None):
+        """
+        :return: All levels, built with main's Event, Turn and Level unless other classes are given: a tuple for
+                 packs of up to EAGER_TURNS level turns, otherwise a PackLevels that builds them on access.
+        """
+        if event_class is None or turn_class is None or level_class is None:
+            import main
+            event_class, turn_class, level_class = event_class or main.Event, turn_class or main.Turn, level_class or main.Level
+        levels = PackLevels(self, event_class, turn_class, level_class)
+        return tuple(levels) if len(self.level_turns) <= EAGER_TURNS else levels
+
+
+class PackLevels(collections.abc.Sequence):
+    """
+    Purpose: Read-only sequence of the levels of a pack. A level is built the first time it is accessed,
+    so a pack of thousands of levels is ready as soon as its file is mapped.
+    """
+    __slots__ = ('pack', 'classes', 'built')
+
+    def __init__(self, pack, event_class, turn_class, level_class):
+        self.pack = pack
+        self.classes = (event_class, turn_class, level_class)
+        self.built = [None] * pack.level_count
+
+    def __len__(self):
+        return len(self.built)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.built)))]
+        level = self.built[index]
+        # Also raises the IndexError that ends iteration.
+        if level is None:
+            level = self.built[index] = self.pack.level(index % len(self.built), *self.classes)
+        return level
+
+
+class PackTurns(collections.abc.Sequence):
+    """
+    Purpose: Read-only sequence of the turns of a pack level, each built from the pack on first access.
+    """
+    lazy = True
+    # Tells Level to keep this sequence instead of copying it into a tuple.
+    __slots__ = ('pack', 'turn_ids', 'event_class', 'turn_class', 'built')
+
+    def __init__(self, pack, turn_ids, event_class, turn_class):
+        """
+        :param turn_ids: The level's slice of pack.level_turns.
+        """
+        self.pack = pack
+        self.turn_ids = turn_ids
+        self.event_class = event_class
+        self.turn_class = turn_class
+        self.built = [None] * len(turn_ids)
+
+    def __len__(self):
+        return len(self.built)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.built)))]
+        turn = self.built[index]
+        if turn is None:
+            turn = self.built[index] = self.pack.turn(self.turn_ids[index], self.event_class, self.turn_class)
+        return turn
+
+
+"""--------------------------------COMPILER----------------------------------"""
+
+
+def read_source(source_path):
+    """
+    :return: The parsed pack source (a dictionary), from JSON or, for .toml files, TOML.
+    """
+    if source_path.endswith('.toml'):
+        import tomllib
+        with open(source_path, 'rb') as source:
+            return tomllib.load(source)
+    with open(source_path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def _parse_damage(damage, where):
+    if isinstance(damage, int) and 0 <= damage < len(DAMAGE_LABELS):
+        return damage
+    if damage in DAMAGE_LABELS:
+        return DAMAGE_LABELS.index(damage)
+    raise ValueError(f"{where}: unknown damage {damage!r}, expected one of {DAMAGE_LABELS}")
+
+
+def compile_source(data, source_size=0, source_mtime_ns=0):
+    """
+    Description: Compiles a parsed pack source into the binary pack format.
+    :param data: Dictionary with "name" and "levels", see the module docstring.
+    :param source_size, source_mtime_ns: The source file's stat values, stored for cache invalidation.
+    :return: bytes of the compiled pack.
+    """
+    strings, string_ids = [], {}
+    events, event_ids = [], {}
+    turns, turn_ids = [], {}
+    level_records, level_turns, ranges = [], [], {}
+
+    def string_id(text):
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text.encode())
+        return string_ids[text]
+
+    def event_id(description, damage):
+        key = (string_id(description), damage)
+        if key not in event_ids:
+            event_ids[key] = len(events)
+            events.append(key)
+        return event_ids[key]
+
+    name_id = string_id(data.get('name', ''))
+    for level_index, level in enumerate(data.get('levels', ())):
+        name = level.get('name')
+        where = f"level {level_index} ({name})"
+        if not isinstance(name, str):
+            raise ValueError(f"{where}: every level needs a name")
+        chance = float(level.get('random_event_chance', 0.0))
+        if not 0.0 <= chance <= 1.0:
+            raise ValueError(f"{where}: random_event_chance must be between 0 and 1")
+        if 'turns_from' in level:
+            if level['turns_from'] not in ranges:
+                raise ValueError(f"{where}: turns_from {level['turns_from']!r} must name an earlier level")
+            first, count = ranges[level['turns_from']]
+        else:
+            first, count = len(level_turns), len(level.get('turns', ()))
+            for turn_index, turn in enumerate(level.get('turns', ())):
+                key = []
+                for choice in CHOICES:
+                    try:
+                        description, damage = turn[choice]
+                    except (KeyError, TypeError, ValueError):
+                        raise ValueError(f"{where}, turn {turn_index}: {choice!r} must be [description, damage]")
+                    key.append(event_id(description, _parse_damage(damage, f"{where}, turn {turn_index}")))
+                key = tuple(key)
+                if key not in turn_ids:
+                    turn_ids[key] = len(turns)
+                    turns.append(key)
+                level_turns.append(turn_ids[key])
+        if not count:
+            raise ValueError(f"{where}: a level needs at least one turn")
+        ranges[name] = (first, count)
+        level_records.append(LEVEL_RECORD.pack(string_id(name), first, count, chance))
+
+    string_offsets = [0]
+    for text in strings:
+        string_offsets.append(string_offsets[-1] + len(text))
+    event_damage = [damage for _, damage in events]
+    parts = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, 0, source_size, source_mtime_ns, name_id, len(strings), len(events),
+                    len(turns), len(level_records), len(level_turns)),
+        b"".join(level_records),
+        struct.pack(f"<{len(level_turns)}I", *level_turns),
+        struct.pack(f"<{3 * len(turns)}I", *(event for turn in turns for event in turn)),
+        bytes(event_damage[event] for turn in turns for event in turn),
+        struct.pack(f"<{len(events)}I", *(description for description, _ in events)),
+        bytes(event_damage),
+        struct.pack(f"<{len(string_offsets)}I", *string_offsets),
+        b"".join(strings),
+    ]
+    return b"".join(parts)
+
+
+def cache_path_for(source_path):
+    return source_path + '.rwpack'
+
+
+def compile_pack(source_path, cache_path=None):
+    """
+    Description: Compiles a pack source and writes the binary cache atomically next to it.
+    :return: The compiled bytes (also returned when the cache file could not be written).
+    """
+    stat = os.stat(source_path)
+    compiled = compile_source(read_source(source_path), stat.st_size, stat.st_mtime_ns)
+    cache_path = cache_path or cache_path_for(source_path)
+    try:
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(cache_path) or '.', delete=False) as temporary:
+            temporary.write(compiled)
+        os.chmod(temporary.name, 0o644)
+        os.replace(temporary.name, cache_path)
+        # Readers either see the old cache or the complete new one, never a half-written file.
+    except OSError:
+        pass
+        # A read-only install still works, it just compiles in memory every time.
+    return compiled
+
+
+def _map(path):
+    with open(path, 'rb') as cache:
+        return mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+_open_packs = {}
+# Packs already opened by this process: source path -> (source size, source mtime_ns, LevelPack).
+
+
+def open_pack(source_path):
+    """
+    Description: Opens a level pack, memory-mapping its compiled cache and recompiling it when the
+    source changed since it was compiled.
+    :param source_path: Path of the .json or .toml pack source.
+    :return: LevelPack.
+    """
+    source_path = os.path.abspath(source_path)
+    stat = os.stat(source_path)
+    opened = _open_packs.get(source_path)
+    if opened is not None and opened[:2] == (stat.st_size, stat.st_mtime_ns):
+        return opened[2]
+
+    cache_path = cache_path_for(source_path)
+    pack = None
+    try:
+        pack = LevelPack(_map(cache_path), cache_path)
+        if (pack.source_size, pack.source_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            pack = None
+    except (OSError, ValueError, struct.error):
+        pack = None
+        # A missing, outdated or corrupt cache is simply compiled again.
+    if pack is None:
+        compiled = compile_pack(source_path, cache_path)
+        try:
+            pack = LevelPack(_map(cache_path), cache_path)
+            if (pack.source_size, pack.source_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                raise ValueError("cache was replaced concurrently")
+        except (OSError, ValueError):
+            pack = LevelPack(compiled)
+    _open_packs[source_path] = (stat.st_size, stat.st_mtime_ns, pack)
+    return pack
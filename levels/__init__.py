@@ -0,0 +1,3 @@
+"""
+The game's level packs, shipped as package data (see main.DEFAULT_LEVEL_PACK and levelpack.py).
+"""
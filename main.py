@@ -1,4 +1,8 @@
-import random
+import bisect
+import enum
+import functools
+import os
+import time
 """----------------------------DEFINITIONS-----------------------------------"""
 """
 class Definition
@@ -27,308 +31,546 @@ Return a copy of the string with leading and trailing whitespace removed.
 """
 
 
+"""------------------------------MESSAGES------------------------------------"""
+# The game's texts, shared by the console front-end and the network server.
+
+TITLE = "=== The Road Wrecker's Adventure! ==="
+INTRO = """This is a game where every turn is a gamble with potholes, pedestrians, and stray shopping carts.
+Your journey begins after purchasing your car for $2000.
+Get ready to laugh, lose money, and dodge your way through the ultimate test of driver’s luck.
+But beware of treacherous roads ahead!"""
+START_LEVEL_PROMPT = "Press Enter to start the level, or type 'quit' to exit the game: "
+GOODBYE = "Thanks for playing! Goodbye!"
+UPGRADE_PROMPT = "Would you like to upgrade tires for $500 to reduce pothole damage risk? (yes/no): "
+UPGRADE_ACCEPTED = "Tires upgraded! Pothole damage risk reduced."
+UPGRADE_DECLINED = "You chose not to upgrade tires."
+UPGRADE_INVALID = "Invalid input. Please enter 'yes' or 'no'."
+TIRES_ALREADY_UPGRADED = "Tires are already upgraded."
+TIRES_SOFTENED = "Your upgraded tires kept their grip and softened the blow!"
+CHOICE_PROMPT = "Choose your path (Left / Straight ahead / Right): "
+CHOICE_INVALID = "Invalid choice. Please choose 'left', 'straight', or 'right'."
+CONTINUE_PROMPT = "Press Enter to continue..."
+RESET_MESSAGES = (
+    "\n--- Whoa! Your car just took a one-way trip to the junkyard! ---",
+    "--- It’s now officially a metal pancake! ---",
+    "--- You’re going back to MrMecanique1994, who’s probably trying to figure out "
+    "if he can use the parts for a new coffee table. ---",
+)
+RETRY_PROMPT = "Please press Enter to try again..."
+CONGRATULATIONS = "=== Congratulations! You've made it home safely! ==="
+THANK_YOU = "Thank you for playing!"
+
+DEFAULT_LEVEL_PACK = ("levels", "default.json")
+# The levels of the game live in this level pack, package data of the levels package (found through
+# importlib.resources, so it also works from an installed wheel); Game.create_levels() can load any other pack.
+
+
+class Damage(enum.IntEnum):
+    """
+    Purpose: The damage an event does to the car, as a small integer (worse damage has a bigger value).
+    Prints as the game's label, e.g. f"Car status: {Damage.SEVERE}" shows "Car status: Severely Damaged".
+    """
+    HEALTHY = 0
+    SLIGHT = 1
+    SEVERE = 2
+    TOTALED = 3
+
+    @property
+    def label(self):
+        return _DAMAGE_LABELS[self]
+
+    def __str__(self):
+        return self.label
+
+    def __format__(self, format_spec):
+        return format(self.label, format_spec)
+
+    @classmethod
+    def parse(cls, damage):
+        """
+        :param damage: A Damage, its integer value, or its label ("Healthy", "Slightly Damaged", ...).
+        :return: The matching Damage.
+        """
+        if isinstance(damage, str):
+            return _DAMAGES_BY_LABEL[damage]
+        return cls(damage)
+
+
+_DAMAGE_LABELS = ("Healthy", "Slightly Damaged", "Severely Damaged", "Totaled")
+_DAMAGES_BY_LABEL = {label: Damage(value) for value, label in enumerate(_DAMAGE_LABELS)}
+
+
 class Event:
     """
     Purpose: Represents a specific event that can happen in the game, with details on what the event is and the damage
     it causes.
+    Events are immutable and interned: creating the same (description, damage) twice returns the same object,
+    so every game, level and process shares one copy of each event.
     """
-    def __init__(self, description, damage):
+    __slots__ = ('description', 'damage')
+    _interned = {}
+    # Maps (description, damage) to the one Event object with those values.
+
+    def __new__(cls, description, damage):
         """
         :param description: A string that describes the event (e.g., "You hit a pothole").
-        :param damage: A string indicating the damage level ("Slightly Damaged", "Severely Damaged", or "Totaled").
-        :function: Sets 'self.description' and 'self.damage' for each Event instance.
+        :param damage: The damage level as a Damage or its label ("Slightly Damaged", "Severely Damaged", or "Totaled").
+        :function: Returns the interned Event with that 'description' and 'damage', creating it the first time.
         """
-        self.description = description
-        self.damage = damage  # "Slightly Damaged", "Severely Damaged", "Totaled".
-        self.tires_upgraded = False
-        #Initializes a tires_upgraded attribute, as a flag for whether upgraded tires are available to reduce damage.
+        damage = Damage.parse(damage)
+        key = (description, damage)
+        event = cls._interned.get(key)
+        if event is None:
+            event = object.__new__(cls)
+            object.__setattr__(event, 'description', description)
+            object.__setattr__(event, 'damage', damage)  # Damage.SLIGHT, Damage.SEVERE, Damage.TOTALED.
+            cls._interned[key] = event
+        return event
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Event objects are immutable")
+
+    def __reduce__(self):
+        return Event, (self.description, int(self.damage))
+        # Unpickling goes through __new__ again, so it returns the interned event of the receiving process.
 
+    def __repr__(self):
+        return f"Event({self.description!r}, {self.damage.label!r})"
 
-class Turn:
+
+class Turn(tuple):
     """
-    Attributes: choices, a dictionary that maps the player's options to Event objects.
+    Attributes: the (left, straight, right) Event objects of the turn, stored as a tuple.
     Methods: get_event() retrieves an event based on the player’s choice (left, straight, or right).
     """
-    def __init__(self, left_event, straight_event, right_event):
+    __slots__ = ()
+    CHOICE_INDEX = {'left': 0, 'straight': 1, 'right': 2}
+    # Maps each direction to its position in the tuple.
+
+    def __new__(cls, left_event, straight_event, right_event):
         """
-        :description: Initializes a Turn instance by setting up options for left, straight, and right events.
-        :param left_event, straight_event, right_event : Each is an Event object that will be stored in a dictionary
-                                                        called choices, mapping the direction to the specific event.
-        :function: Sets up choices in the form of a dictionary, so the player can choose a direction,
-                    and the game can retrieve the corresponding event.
+        :description: Creates a Turn from the events of the left, straight, and right directions.
+        :param left_event, straight_event, right_event : Each is an Event object, stored in that order.
         """
-        self.choices = {
-            'left': left_event,
-            'straight': straight_event,
-            'right': right_event
-        }
-        # This line creates a dictionary called choices that maps each direction ('left', 'straight', 'right')
-        # to its corresponding event.
-        # This setup allows the program to retrieve the appropriate event when the player chooses a direction.
+        return tuple.__new__(cls, (left_event, straight_event, right_event))
+
+    def __getnewargs__(self):
+        return tuple(self)
 
+    @property
+    def choices(self):
+        """
+        :return: A dictionary that maps each direction ('left', 'straight', 'right') to its corresponding event.
+        """
+        return dict(zip(self.CHOICE_INDEX, self))
 
     def get_event(self, choice):
         """
         :description: Retrieves the event based on the player’s choice.
         :param choice: A string representing the player's choice ('left', 'straight', or 'right').
         :return:Uses choice.lower() to ensure case-insensitive matching and retrieves the corresponding
-                Event object from choices. Returns None if the choice isn’t valid.
+                Event object. Returns None if the choice isn’t valid.
         """
-        return self.choices.get(choice.lower())
+        index = self.CHOICE_INDEX.get(choice.lower())
         # Ensures that the player's choice is case-insensitive.
-        # self.choices.get Retrieves the Event instance that corresponds to the player's direction choice.
-        # If the choice is not in the dictionary, it will return None.
+        # If the choice is not a direction, there is no event and it will return None.
+        return None if index is None else self[index]
 
 
 class Level:
     # This segment completes the Turn class, which allows the game to handle a player’s directional choice
     # by mapping each option to a unique event.
+    __slots__ = ('name', 'turns', 'random_event_chance')
+
     def __init__(self, name, turns,random_event_chance):
         #The __init__ method sets these attributes for each Level instance.
 
         """
         :param name: String
-        :param turns: List, The list of turn objects
+        :param turns: Sequence, The turn objects, stored as a tuple; the level never changes once built.
         """
         self.name = name
         # The name of the level (a string), like "Suburban Roads", "Countryside Roads" or "Mountain Roads".
-        self.turns = turns
-        # A list of Turn objects, which represents the sequence of choices the player will encounter in the level.
+        self.turns = turns if getattr(turns, 'preshuffled', False) or getattr(turns, 'lazy', False) else tuple(turns)
+        # A tuple of Turn objects. Every game plays them in its own shuffled order (see Game.turn_orders).
+        # Generated routes and the levels of large level packs keep their lazy turn sequence, which builds
+        # each Turn only when it is played.
         self.random_event_chance = random_event_chance
         #A float (e.g., 0.1 or 0.2) that determines the likelihood of a random event occurring within this level.
 
 
+class TurnResult:
+    """
+    Purpose: The structured outcome of one headless turn, returned by Game.resolve_turn() and Game.step()
+    so that simulations, servers and front-ends can react to a turn without any console I/O.
+    """
+    def __init__(self, level_index, turn_index, choice, event, cost, money_lost,
+                 random_event=False, upgraded=False, reset=False, level_completed=False, game_completed=False,
+                 damage=None, softened=False):
+        """
+        :param level_index: Integer, the index of the level the turn was played in.
+        :param turn_index: Integer, the index of the turn within that level, starting from 0.
+        :param choice: String, the direction that was played ('left', 'straight' or 'right').
+        :param event: Event, the event that happened (the turn's event or the random clear-path event).
+        :param cost: Integer, the money this event cost in $ (TOTAL_DAMAGE_COST for a totaled car).
+        :param money_lost: Integer, the game's money_lost right after the event was applied.
+        :param random_event: Boolean, True when the random clear-path event replaced the turn's event.
+        :param upgraded: Boolean, True when the tires were bought right before this turn.
+        :param reset: Boolean, True when the car was totaled and the game has to restart from level 0.
+        :param level_completed: Boolean, True when this was the last turn of the level.
+        :param game_completed: Boolean, True when this was the last turn of the last level.
+        :param damage: Damage the car actually took; defaults to the event's damage.
+        :param softened: Boolean, True when a modifier (the upgraded tires) took the damage below the event's.
+        """
+        self.level_index = level_index
+        self.turn_index = turn_index
+        self.choice = choice
+        self.event = event
+        self.damage = event.damage if damage is None else damage
+        # The event's damage, unless a modifier softened it.
+        self.cost = cost
+        self.money_lost = money_lost
+        self.random_event = random_event
+        self.upgraded = upgraded
+        self.reset = reset
+        self.level_completed = level_completed
+        self.game_completed = game_completed
+        self.softened = softened
+
+
+def build_outcome_table(random_event_chance, damage_costs, grips):
+    """
+    Description: Resolves every (modifier state, event damage) combination of a level ahead of time, so a turn
+    is decided by one table lookup and one random draw however many modifiers there are.
+    :param random_event_chance: Float, the level's chance of the random clear-path event.
+    :param damage_costs: Tuple with the cost in $ of each Damage, Healthy first.
+    :param grips: Tuple with, for every modifier bit, the chance that the modifier takes one tier off the damage
+                  (Totaled -> Severely Damaged -> Slightly Damaged -> Healthy). Active modifiers apply one after
+                  the other, each with its own chance.
+    :return: List indexed by modifier_state * 4 + damage of the turn's event, of (thresholds, outcomes) pairs:
+             outcome i happens when the draw is below thresholds[i] (and not below the ones before), and every
+             outcome is a (damage, cost, random_event, softened) tuple.
+    """
+    table = []
+    for state in range(1 << len(grips)):
+        for event_damage in Damage:
+            spread = {event_damage: 1.0}
+            # Damage -> probability once the active modifiers had their go at the event.
+            for bit, grip in enumerate(grips):
+                if state >> bit & 1:
+                    softened = {}
+                    for damage, probability in spread.items():
+                        if damage > Damage.HEALTHY and grip > 0:
+                            lower = Damage(damage - 1)
+                            softened[lower] = softened.get(lower, 0.0) + probability * grip
+                            probability *= 1 - grip
+                        if probability > 0:
+                            softened[damage] = softened.get(damage, 0.0) + probability
+                    spread = softened
+            outcomes = []
+            probabilities = []
+            if random_event_chance > 0:
+                outcomes.append((Damage.HEALTHY, 0, True, False))
+                probabilities.append(random_event_chance)
+                # The random event comes first, so a draw below the chance means a clear path, as it always did.
+            for damage in sorted(spread, reverse=True):
+                outcomes.append((damage, damage_costs[damage], False, damage < event_damage))
+                probabilities.append((1 - random_event_chance) * spread[damage])
+            thresholds = []
+            running = 0.0
+            for probability in probabilities:
+                running += probability
+                thresholds.append(running)
+            thresholds[-1] = 1.0
+            # Every draw is below 1.0, so rounding can never leave a draw without an outcome.
+            table.append((tuple(thresholds), tuple(outcomes)))
+    return table
+
+
+class GameObserver:
+    """
+    Purpose: Base class of the listeners that can be attached to a game with Game.add_observer().
+    Every hook does nothing here; a listener overrides the ones it needs. Hooks run inside the game loop,
+    so they should only record what happened and leave slow work (I/O, exports) to another thread.
+    """
+    def on_turn(self, game, level, result, seconds):
+        """
+        :param level: Level, the level the turn was played in.
+        :param result: TurnResult of the turn.
+        :param seconds: Float, how long the turn took: step() for headless games, the whole play_turn()
+                        (including the player's answers) for the console game.
+        """
+
+    def on_upgrade(self, game, level_index, accepted):
+        """
+        :description: The tire upgrade was offered at the start of a level, and taken if accepted is True.
+        """
+
+    def on_level_completed(self, game, level_index):
+        pass
+
+    def on_reset(self, game):
+        """
+        :description: The car was totaled and the game went back to the first level (game.restarts is updated).
+        """
+
+    def on_game_completed(self, game):
+        pass
+
+
 class Game:
 
+    CHOICES = ('left', 'straight', 'right')
+    # The directions a player can choose on every turn.
+    TIRE_UPGRADE_COST = 500
+    # The cost in $ of the tire upgrade offered at the start of each level.
     SLIGHT_DAMAGE_COST = 250
     # The cost in $ when the car suffers slight damage.
     SEVERE_DAMAGE_COST = 500
     # The cost in $ when the car suffers severe damage.
     TOTAL_DAMAGE_COST = 2000
     # The cost in $ when the car suffers total damage.
+    CAR_PRICE = 2000
+    # The price in $ of the car every game (and every restart) begins with.
+    TIRE_GRIP = 0.25
+    # The chance that upgraded tires take one tier off the damage of an event (e.g. Totaled -> Severely Damaged).
+    TIRES_MODIFIER = 1
+    # The bit of the tire upgrade in Game.modifiers. Every upgrade that changes outcomes gets its own bit,
+    # and its grip in modifier_grips().
 
 
-    def __init__(self):
+    def __init__(self, rng=None, levels=None, seed=None, record=False):
         """
         Attributes:
             1.levels: An empty list that will hold all levels in the game. Each level can include multiple turns.
             2.current_level: Tracks which level the player is on.
         Purpose: Manages the player's progression through levels, holding the game structure.
         :description: Initializes a new game instance for a specific player.
+        :param rng: Optional random.Random used for the turn shuffles and random events;
+                    by default every game gets its own random.Random seeded with `seed`.
+        :param levels: Optional sequence of Level objects to play instead of the default ones from create_levels().
+        :param seed: Optional integer seed (0 to 2**64 - 1); a fresh random one is picked when neither rng nor seed
+                     is given. The same seed, levels and choices always replay the same game.
+        :param record: Boolean, whether to log every played turn in self.recording (see replay.py).
         """
-        self.levels = self.create_levels()
-        # Stores all levels in the game, generated by calling self.create_levels()
+        if rng is None:
+            import random
+            # Imported on first use rather than at the top, so importing main stays fast for tools and workers.
+            if seed is None:
+                seed = int.from_bytes(os.urandom(8), 'little')
+            rng = random.Random(seed)
+        self.rng = rng
+        # Gives every game its own random stream, so a game never depends on what other games drew.
+        self.seed = seed
+        # The seed the game was started with, None when the caller passed its own rng without a seed.
+        self.recording = bytearray() if record else None
+        # One byte per played turn when recording: the choice index, plus 4 if the tires were upgraded on the
+        # first turn of a level. Together with the seed it is all that is needed to replay the game.
+        self.levels = self.create_levels() if levels is None else tuple(levels)
+        # The level tables are shared by every game and never modified, generated once by create_levels().
+        self.turn_orders = self.shuffle_turn_orders()
+        # The game's own shuffled order of the turns of each level, one permutation per level.
+        self.shuffle_key = self.rng.getrandbits(64)
+        # Seeds the new turn orders of every restart (see restart()), so restarts never draw from self.rng.
+        damage_costs, grips = self.damage_costs(), self.modifier_grips()
+        self.outcome_tables = [self.outcome_table(level.random_event_chance, damage_costs, grips)
+                               for level in self.levels]
+        # The shared outcome table of each level (see outcome_table()), looked up once here instead of every turn.
+        # The costs are part of the cache key, so changed (or per-game) costs always get their own tables.
         self.current_level_index = 0
         # Tracks which level the player is currently on, starting at 0.
         self.current_turn_index = 0
         #  Tracks the current turn within a level, also starting at 0.
-        self.car_status = "Healthy"
+        self.car_status = Damage.HEALTHY
         # Represents the current condition of the car, initially set to "Healthy".
-        self.money_lost = 2000
+        self.money_lost = self.CAR_PRICE
         # Stores the initial amount of money lost at the mechanic, set to 2000.
+        self.modifiers = 0
+        # The bits of the upgrades the car has (see TIRES_MODIFIER); they pick the row of the outcome table.
         self.tires_upgraded = False
-        # A boolean flag indicating whether the player has upgraded their tires.
-
-
-    def create_levels(self):
-        suburban_turns = [
-            Turn(
-                Event("You hit a pothole the size of a golf ball.", "Slightly Damaged"),
-                Event("A pedestrian suddenly walks out. You swerve to avoid.", "Slightly Damaged"),
-                Event("Narrow road with parked cars, you clip a side mirror.", "Severely Damaged"),
-            ),
-            Turn(
-                Event("A speed bump ahead, your car bottoms out.", "Slightly Damaged"),
-                Event("Construction zone with debris.", "Severely Damaged"),
-                Event("You rear-end someone at a sudden traffic stop.", "Totaled")
-            ),
-            Turn(
-                Event("A dog runs across the road. You swerve to avoid.", "Slightly Damaged"),
-                Event("Skid on a wet road.", "Severely Damaged"),
-                Event("Avoided a cyclist just in time.", "Slightly Damaged")
-            ),
-            Turn(
-                Event("Hit a parked truck's tailgate.", "Totaled"),
-                Event("You swerve to avoid debris.", "Slightly Damaged"),
-                Event("Clip a pothole, damaging the suspension.", "Slightly Damaged")
-            ),
-            Turn(
-                Event("A fallen tree blocks the road.", "Severely Damaged"),
-                Event("Lost control on a sharp turn.", "Severely Damaged"),
-                Event("Your tires blow out unexpectedly.", "Slightly Damaged")
-            ),
-            Turn(
-                Event("Hit a pothole, damaging the tires.", "Slightly Damaged"),
-                Event("A sudden hailstorm damages the windshield.", "Severely Damaged"),
-                Event("Collision with a stray shopping cart.", "Totaled")
-            ),
-            Turn(
-                Event("Minor scrape with a parked car.", "Slightly Damaged"),
-                Event("Failed to brake in time, causing minor damage.", "Slightly Damaged"),
-                Event("Overturned on a slippery road.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Hit a small curb.", "Slightly Damaged"),
-                Event("Side mirror knocked off.", "Severely Damaged"),
-                Event("Total loss in a minor collision.", "Totaled")
-            ),
-            Turn(
-                Event("Broken headlight from a minor bump.", "Slightly Damaged"),
-                Event("Damage to the car's bumper.", "Slightly Damaged"),
-                Event("Engine trouble from hitting a pothole.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Lost a tire on a rough patch.", "Severely Damaged"),
-                Event("Minor fender bender.", "Slightly Damaged"),
-                Event("Total loss from a major collision.", "Totaled")
-            )
-        ]
-
-        countryside_turns = [
-            Turn(
-                Event("You hit a pothole the size of a golf ball.", "Slightly Damaged"),
-                Event("A pedestrian suddenly walks out. You swerve to avoid.", "Slightly Damaged"),
-                Event("Narrow road with parked cars, you clip a side mirror.", "Severely Damaged")
-            ),
-            Turn(
-                Event("A speed bump ahead, your car bottoms out.", "Slightly Damaged"),
-                Event("Construction zone with debris.", "Severely Damaged"),
-                Event("You rear-end someone at a sudden traffic stop.", "Totaled")
-            ),
-            Turn(
-                Event("A dog runs across the road. You swerve to avoid.", "Slightly Damaged"),
-                Event("Skid on a wet road.", "Severely Damaged"),
-                Event("Avoided a cyclist just in time.", "Slightly Damaged")
-            ),
-            Turn(
-                Event("Hit a parked truck's tailgate.", "Totaled"),
-                Event("You swerve to avoid debris.", "Slightly Damaged"),
-                Event("Clip a pothole, damaging the suspension.", "Slightly Damaged")
-            ),
-            Turn(
-                Event("A fallen tree blocks the road.", "Severely Damaged"),
-                Event("Lost control on a sharp turn.", "Severely Damaged"),
-                Event("Your tires blow out unexpectedly.", "Slightly Damaged")
-            ),
-            Turn(
-                Event("Hit a pothole, damaging the tires.", "Slightly Damaged"),
-                Event("A sudden hailstorm damages the windshield.", "Severely Damaged"),
-                Event("Collision with a stray shopping cart.", "Totaled")
-            ),
-            Turn(
-                Event("Minor scrape with a parked car.", "Slightly Damaged"),
-                Event("Failed to brake in time, causing minor damage.", "Slightly Damaged"),
-                Event("Overturned on a slippery road.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Hit a small curb.", "Slightly Damaged"),
-                Event("Side mirror knocked off.", "Severely Damaged"),
-                Event("Total loss in a minor collision.", "Totaled")
-            ),
-            Turn(
-                Event("Broken headlight from a minor bump.", "Slightly Damaged"),
-                Event("Damage to the car's bumper.", "Slightly Damaged"),
-                Event("Engine trouble from hitting a pothole.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Lost a tire on a rough patch.", "Severely Damaged"),
-                Event("Minor fender bender.", "Slightly Damaged"),
-                Event("Total loss from a major collision.", "Totaled")
-            )
-        ]
-
-        mountain_turns = [
-            Turn(
-                Event("Loose rocks hit the windshield.", "Slightly Damaged"),
-                Event("Sharp cliff edge causes you to lose control.", "Totaled"),
-                Event("Sudden drop in the road surface.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Small landslide, need to reverse.", "Slightly Damaged"),
-                Event("Brake failure on a downhill slope.", "Totaled"),
-                Event("Narrow path with overhanging branches.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Clip the guardrail on a narrow path.", "Severely Damaged"),
-                Event("Avalanche warning, you make it through.", "Slightly Damaged"),
-                Event("Rock slide debris on the road.", "Severely Damaged")
-            ),
-            Turn(
-                Event("Minor damage from loose gravel.", "Slightly Damaged"),
-                Event("Severely damaged from hitting a large rock.", "Severely Damaged"),
-                Event("Total loss from falling off a cliff.", "Totaled")
-            ),
-            Turn(
-                Event("Worn-out tires slip on icy road.", "Severely Damaged"),
-                Event("Minor scrape with a mountain sign.", "Slightly Damaged"),
-                Event("Total loss after collision with a large boulder.", "Totaled")
-            ),
-            Turn(
-                Event("Minor damage from a loose stone.", "Slightly Damaged"),
-                Event("Severely damaged suspension from rough terrain.", "Severely Damaged"),
-                Event("Total loss from a major accident.", "Totaled")
-            ),
-            Turn(
-                Event("Hit a small branch.", "Slightly Damaged"),
-                Event("Side mirror damaged from a collision.", "Severely Damaged"),
-                Event("Total loss from rolling off the path.", "Totaled")
-            ),
-            Turn(
-                Event("Minor fender bender with a fellow traveler.", "Slightly Damaged"),
-                Event("Severely damaged from hitting a large rock.", "Severely Damaged"),
-                Event("Totaled after sliding off the road.", "Totaled")
-            ),
-            Turn(
-                Event("Minor damage from hitting a small hill.", "Slightly Damaged"),
-                Event("Severely damaged from scraping the undercarriage.", "Severely Damaged"),
-                Event("Total loss from a severe collision.", "Totaled")
-            ),
-            Turn(
-                Event("Swerve to avoid a goat blocks the road and fall off the cliff.", "Totaled"),
-                Event("Minor damage from a loose rock.", "Slightly Damaged"),
-                Event("Severely damaged from hitting a tree.", "Severely Damaged")
-            )
-        ]
-        levels = [
-            Level("Suburban Roads", suburban_turns, random_event_chance=0.1),
-            Level("Countryside Roads", countryside_turns, random_event_chance=0.2),
-            Level("Mountain Roads", mountain_turns, random_event_chance=0.3)
-        ]
-        for level in levels:
-            random.shuffle(level.turns)
-            # Shuffles each level’s turns for added variability in gameplay.
+        # A boolean flag indicating whether the player has upgraded their tires, kept in self.modifiers.
+        self.restarts = 0
+        # Counts how many times the car was totaled and the game restarted from the first level.
+        self.turns_played = 0
+        # Counts every resolved turn. Each turn draws exactly one number from self.rng, so the seed and this
+        # counter are enough to bring a new rng to the same state (see snapshot.py).
+        self.observers = ()
+        # The GameObserver listeners of this game. Empty for most games, so every hook point costs a single check.
+
+
+    @property
+    def tires_upgraded(self):
+        return bool(self.modifiers & self.TIRES_MODIFIER)
+
+    @tires_upgraded.setter
+    def tires_upgraded(self, upgraded):
+        self.modifiers = self.modifiers | self.TIRES_MODIFIER if upgraded else self.modifiers & ~self.TIRES_MODIFIER
+
+
+    @classmethod
+    def modifier_grips(cls):
+        """
+        :return: Tuple with the grip of every modifier, indexed by its bit (see build_outcome_table()).
+        """
+        return (cls.TIRE_GRIP,)
+
+
+    def damage_costs(self):
+        """
+        :return: Tuple with the cost in $ of each Damage, Healthy first, read from this game's cost attributes.
+        """
+        return (0, self.SLIGHT_DAMAGE_COST, self.SEVERE_DAMAGE_COST, self.TOTAL_DAMAGE_COST)
 
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def outcome_table(random_event_chance, damage_costs, grips):
+        """
+        :return: The outcome table of build_outcome_table() for these arguments, built once per process and
+                 shared by every game with the same chance, costs and grips.
+        """
+        return build_outcome_table(random_event_chance, damage_costs, grips)
+
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def create_levels(path=None):
+        """
+        :param path: The level pack to load, a .json or .toml file (see levelpack.py); defaults to DEFAULT_LEVEL_PACK.
+        :return: The sequence of the game's levels (see levelpack.LevelPack.levels()). They are built once per
+                 process, the turns of large packs only when they are played, and shared by every game.
+        """
+        if path is None:
+            import importlib.resources
+            package, name = DEFAULT_LEVEL_PACK
+            with importlib.resources.as_file(importlib.resources.files(package).joinpath(name)) as default_path:
+                return Game.create_levels(str(default_path))
+                # as_file() gives the file itself from a normal install and a temporary copy from a zipped one,
+                # which stays usable after it is removed because the pack is memory-mapped.
+        import levelpack
+        # Imported here so that games given their own levels never read a level pack.
+        levels = levelpack.open_pack(path).levels(Event, Turn, Level)
+        # The pack is compiled once into a binary file next to it and memory-mapped from then on;
+        # Event, Turn and Level are passed in so the levels use the classes of this module.
         return levels
-        # Returns the list of levels to be stored in self.levels in the game’s __init__ method.
+        # Returns the levels to be stored in self.levels in the game’s __init__ method.
 
 
-    def reset_game(self):
+    def restart(self):
         """
-        :return: Resets the game state to its initial conditions, simulating a restart after a total car loss.
+        :description: Headless part of reset_game(): puts the game state back to its initial conditions
+                      without printing anything or waiting for the player.
         """
-        print("\n--- Whoa! Your car just took a one-way trip to the junkyard! ---")
-        print("--- It’s now officially a metal pancake! ---")
-        print("--- You’re going back to MrMecanique1994, who’s probably trying to figure out "
-            "if he can use the parts for a new coffee table. ---")
         self.current_level_index = 0
         # Reset to 0, ensuring the game restarts from the first level and first turn.
         self.current_turn_index = 0
         # Reset to 0, ensuring the game restarts from the first level and first turn.
-        self.car_status = "Healthy"
+        self.car_status = Damage.HEALTHY
         # Set back to "Healthy".
-        self.money_lost = 2000
+        self.money_lost = self.CAR_PRICE
         # Reset to $2000 as if the player is starting fresh with the Samsarica_Gelu14’s initial fee.
         self.tires_upgraded = False
         # Set to False, indicating the player must choose the tire upgrade option again in the new game.
-        input("Please press Enter to try again...")
+        self.restarts += 1
+        # The restart counter is the only thing that survives a restart.
+        import random
+        self.turn_orders = self.shuffle_turn_orders(random.Random(self.shuffle_key + self.restarts))
+        # Every attempt drives the levels in a new order. The shuffle has its own stream, derived from the game's
+        # shuffle_key and the restart count, so each turn still draws exactly one number from self.rng.
+        if self.observers:
+            self.notify('on_reset')
+
+
+    def add_observer(self, observer):
+        """
+        :param observer: GameObserver whose hooks are called from now on.
+        """
+        self.observers += (observer,)
+
+
+    def remove_observer(self, observer):
+        self.observers = tuple(existing for existing in self.observers if existing is not observer)
+
+
+    def notify(self, hook, *args):
+        """
+        :description: Calls the hook (e.g. 'on_turn') of every observer with this game and the given arguments.
+        """
+        for observer in self.observers:
+            getattr(observer, hook)(self, *args)
+
+
+    def shuffle_turn_orders(self, rng=None):
+        """
+        :param rng: Optional random.Random to shuffle with; defaults to self.rng.
+        :return: One shuffled permutation of turn indices per level, stored as bytes (or an array for very long
+                 levels), so a game only owns a few bytes per level instead of its own copy of the turns.
+        """
+        turn_orders = []
+        for level in self.levels:
+            if getattr(level.turns, 'preshuffled', False):
+                turn_orders.append(range(len(level.turns)))
+                # Generated routes (see generator.py) are already in random order, and a long route would
+                # otherwise cost every game a permutation as long as the route.
+                continue
+            order = list(range(len(level.turns)))
+            (rng or self.rng).shuffle(order)
+            # Shuffles each level’s turns for added variability in gameplay.
+            if len(order) <= 256:
+                turn_orders.append(bytes(order))
+            else:
+                import array
+                turn_orders.append(array.array('I', order))
+        return turn_orders
+
+
+    def turn_at(self, level_index, turn_index):
+        """
+        :return: The Turn this game plays at position turn_index of the level.
+        """
+        return self.levels[level_index].turns[self.turn_orders[level_index][turn_index]]
+
+
+    def ordered_turns(self, level_index):
+        """
+        :return: List of the level's turns in the order this game plays them.
+        """
+        turns = self.levels[level_index].turns
+        return [turns[index] for index in self.turn_orders[level_index]]
+
+
+    def reset_game(self):
+        """
+        :return: Resets the game state to its initial conditions, simulating a restart after a total car loss.
+        """
+        for message in RESET_MESSAGES:
+            print(message)
+        self.restart()
+        # Resets the level, turn, car status, money lost and tires back to their starting values.
+        input(RETRY_PROMPT)
         # Prompts the player to press Enter, pausing the game until they’re ready to restart,
         # adding a small interactive element before resetting.
 
 
     def random_event(self):
     # Defines a method that returns a favorable event where there’s no damage.
-        return Event("Clear path! No issues this turn.", "Healthy")
+        return Event("Clear path! No issues this turn.", Damage.HEALTHY)
         # This event is returned when the player encounters a random event chance that results in no obstacles.
+        # Events are interned, so this is the same object every time.
+
+
+    def buy_tire_upgrade(self):
+        """
+        :description: Headless part of offer_tire_upgrade(): buys the tires if they are not upgraded yet.
+        :return: True if the tires were bought now, False if they were already upgraded.
+        """
+        if self.tires_upgraded:
+            return False
+            # Tires can only be bought once per car.
+        self.money_lost += self.TIRE_UPGRADE_COST
+        # Adds $500 to self.money_lost, recording the upgrade cost.
+        self.tires_upgraded = True
+        return True
 
 
     def offer_tire_upgrade(self):
@@ -336,26 +578,173 @@ class Game:
         if not self.tires_upgraded:
         # Checks if the tires haven’t been upgraded yet to prevent re-offering the option.
             while True:
-                upgrade_choice = input("Would you like to upgrade tires for $500 to reduce "
-                                       "pothole damage risk? (yes/no): ").strip().lower()
+                upgrade_choice = input(UPGRADE_PROMPT).strip().lower()
                 # Loop until a valid input is given
                 if upgrade_choice == "yes":
-                    self.money_lost += 500
-                    # Adds $500 to self.money_lost, recording the upgrade cost.
-                    self.tires_upgraded = True
-                    print("Tires upgraded! Pothole damage risk reduced.")
-                    # Sense of comfort added. Just a trick mwuhaha!
+                    self.buy_tire_upgrade()
+                    # Records the $500 upgrade cost and marks the tires as upgraded.
+                    print(UPGRADE_ACCEPTED)
                     break  # Exit the loop after the upgrade.
                 elif upgrade_choice == "no":
-                    print("You chose not to upgrade tires.")
+                    print(UPGRADE_DECLINED)
                     # Prints this message if input is "no".
                     break
                     # Exit the loop if they decline the upgrade.
                 else:
-                    print("Invalid input. Please enter 'yes' or 'no'.")
+                    print(UPGRADE_INVALID)
                     # Print for invalid inputs.
+            if self.observers:
+                self.notify('on_upgrade', self.current_level_index, upgrade_choice == "yes")
+        else:
+            print(TIRES_ALREADY_UPGRADED)
+
+
+    def resolve_turn(self, level, turn_number, turn, choice):
+        """
+        Description: The headless engine behind play_turn(). Looks up the event for the choice, resolves it
+        through the level's outcome table (random event, upgrades) with one random draw, and applies the
+        resulting damage and repair cost to the game state.
+        A totaled car is only reported (reset=True); restarting is left to the caller, so step() can
+        restart silently and the console front-end can go through reset_game().
+        :param level: Level, The current level object.
+        :param turn_number: Integer, The index of the current turn within the level, starting from 0.
+        :param turn: Turn, The current turn object.
+        :param choice: String, 'left', 'straight' or 'right' (case-insensitive).
+        :return: TurnResult describing the event, its cost and the money lost so far.
+        """
+        choice = choice.strip().lower()
+        if choice not in self.CHOICES:
+            raise ValueError(f"Invalid choice {choice!r}, expected one of {self.CHOICES}")
+
+        if self.recording is not None:
+            self.recording.append(Turn.CHOICE_INDEX[choice] | (4 if turn_number == 0 and self.tires_upgraded else 0))
+            # Both step() and the console game buy the tires before resolving the first turn of a level,
+            # so tires_upgraded already tells whether the upgrade was taken by then.
+
+        self.turns_played += 1
+        event = turn.get_event(choice)
+        thresholds, outcomes = self.outcome_tables[self.current_level_index][self.modifiers << 2 | event.damage]
+        # The row for this car's upgrades and this event: every possible outcome with its probability.
+        damage, cost, random_event, softened = outcomes[bisect.bisect_right(thresholds, self.rng.random())]
+        # Generates a random number; the number of thresholds at or below it is the index of its outcome.
+        # For a TOTALED outcome the cost is TOTAL_DAMAGE_COST: the replacement car, which is what the restart charges.
+        if random_event:
+            event = self.random_event()
+
+        if damage == Damage.SEVERE:
+            self.car_status = Damage.SEVERE
+        elif damage == Damage.SLIGHT and self.car_status != Damage.SEVERE:
+            self.car_status = Damage.SLIGHT
+            # Slight damage never hides an earlier severe damage.
+
+        reset = damage == Damage.TOTALED
+        if not reset:
+            self.money_lost += cost
+            # Repairs are only paid for cars that are still on the road.
+
+        return TurnResult(self.current_level_index, turn_number, choice, event, cost, self.money_lost,
+                          random_event=random_event, reset=reset,
+                          level_completed=not reset and turn_number == len(level.turns) - 1,
+                          damage=damage, softened=softened)
+
+
+    def is_finished(self):
+        """
+        :return: True once every level has been completed.
+        """
+        return self.current_level_index >= len(self.levels)
+
+
+    def step(self, choice, upgrade_tires=False):
+        """
+        Description: Advances the game by one turn without any console I/O.
+        The tire upgrade is only offered on the first turn of a level, exactly like in play_turn().
+        :param choice: String, 'left', 'straight' or 'right'.
+        :param upgrade_tires: Boolean, whether to buy the tire upgrade if it is offered on this turn.
+        :return: TurnResult for the played turn. On reset the game is already back at level 0.
+        """
+        if self.is_finished():
+            raise RuntimeError("The game is already finished.")
+
+        started = time.perf_counter() if self.observers else 0.0
+        level = self.levels[self.current_level_index]
+        turn_number = self.current_turn_index
+        upgraded = False
+        if turn_number == 0 and not self.tires_upgraded:
+            if upgrade_tires:
+                upgraded = self.buy_tire_upgrade()
+            if self.observers:
+                self.notify('on_upgrade', self.current_level_index, upgraded)
+
+        result = self.resolve_turn(level, turn_number, self.turn_at(self.current_level_index, turn_number), choice)
+        result.upgraded = upgraded
+
+        if result.reset:
+            if self.observers:
+                self.notify('on_turn', level, result, time.perf_counter() - started)
+            self.restart()
+        elif result.level_completed:
+            self.current_level_index += 1
+            self.current_turn_index = 0
+            result.game_completed = self.is_finished()
+            if self.observers:
+                self.notify('on_turn', level, result, time.perf_counter() - started)
+                self.notify('on_level_completed', result.level_index)
+                if result.game_completed:
+                    self.notify('on_game_completed')
         else:
-            print("Tires are already upgraded.")
+            self.current_turn_index += 1
+            if self.observers:
+                self.notify('on_turn', level, result, time.perf_counter() - started)
+        return result
+
+
+    def play_choices(self, choices):
+        """
+        Description: Plays a whole choice sequence headlessly, stopping early once the game is finished.
+        :param choices: Iterable of directions, or of (direction, upgrade_tires) pairs.
+        :return: List of TurnResult, one per played turn.
+        """
+        results = []
+        for choice in choices:
+            if self.is_finished():
+                break
+            if isinstance(choice, str):
+                results.append(self.step(choice))
+            else:
+                results.append(self.step(*choice))
+        return results
+
+
+    def level_banner(self, verb, level_index):
+        """
+        :return: The "--- Starting Level 1: Suburban Roads ---" style line for a level.
+        """
+        return f"--- {verb} Level {level_index + 1}: {self.levels[level_index].name} ---"
+
+
+    def turn_header(self, level, turn_number):
+        """
+        :return: The "Level: ... | Turn: 2/10" line shown before the player chooses a direction.
+        """
+        return f"\nLevel: {level.name} | Turn: {turn_number + 1}/{len(level.turns)}"
+
+
+    def report_turn(self, result):
+        """
+        :param result: TurnResult returned by resolve_turn() or step().
+        :return: List of the lines telling the player what happened on the turn.
+        """
+        lines = [f"Event: {result.event.description}"]
+        if result.softened:
+            lines.append(TIRES_SOFTENED)
+        lines.append(f"Car status: {result.damage}")
+        if not result.reset:
+            if result.cost:
+                lines.append(f"You lost an additional ${result.cost} for repairs.")
+            lines.append(f"Total Money Lost: ${result.money_lost}")
+            # Displays the total amount of money lost due to repairs so far.
+        return lines
 
 
     def play_turn(self, level, turn_number, turn):
@@ -367,71 +756,47 @@ class Game:
         :param turn: turn : Turn, The current turn object that contains information about the specific turn.
         :return: Level: City Streets | Turn: 2/3, Choose your path (Left / Straight ahead / Right):
         """
+        started = time.perf_counter() if self.observers else 0.0
         if turn_number == 0:
             self.offer_tire_upgrade()
             #  Checks if it’s the first turn in the level, offering a tire upgrade.
 
-        print(f"\nLevel: {level.name} | Turn: {turn_number + 1}/{len(level.turns)}")
+        self.current_turn_index = turn_number
+        # Keeps the game state in sync with the turn being played.
+        print(self.turn_header(level, turn_number))
         # Displays the level name and the current turn number out of the total turns in the level.
 
         while True:
         # Ensures that the player provides a valid path choice.
-            choice = input("Choose your path (Left / Straight ahead / Right): ").strip().lower()
+            choice = input(CHOICE_PROMPT).strip().lower()
             # Asks the player to choose between left, straight, or right.
-            if choice in ['left', 'straight', 'right']:
+            if choice in self.CHOICES:
                 break
                 # Exit the loop if the choice is valid.
             else:
-                print("Invalid choice. Please choose 'left', 'straight', or 'right'.")
+                print(CHOICE_INVALID)
                 # If not valid, prints this message prompting the player to enter a correct choice.
 
-        if random.random() < level.random_event_chance:
-            # Generates a random number and compares it to the level’s random event chance.
-            event = self.random_event()
-            # Calls self.random_event() to generate a no-issue event
-            print("Event:", event.description)
-            # Prints "Event: <description>" (e.g., "Clear path! No issues this turn.").
-        else:
-            event = turn.get_event(choice)
-            # Calls get_event() on turn with the player’s choice to fetch the corresponding event for the path.
-            print("Event:", event.description)
-            # Prints the event description (e.g., "A pedestrian suddenly walks out. You swerve to avoid.").
-
-        print(f"Car status: {event.damage}")
-        # Process the selected event.
+        result = self.resolve_turn(level, turn_number, turn, choice)
+        # The engine rolls the random event and applies the damage; this method only talks to the player.
+        for line in self.report_turn(result):
+            print(line)
+            # Prints the event description, the car status and, if the car survived, the repair costs.
 
-        if event.damage == "Totaled":
-            # If the damage attribute of the event is "Totaled" :
+        if result.reset:
+            if self.observers:
+                self.notify('on_turn', level, result, time.perf_counter() - started)
             self.reset_game()
             # Calling the reset_game() method to reset the game state.
             return False
             # After resetting, it returns False to indicate that the turn (and effectively the level)
             # could not be completed due to the car being totaled.
-        elif event.damage == "Severely Damaged":
-        # If the event’s damage level is "Severely Damaged":
-            self.car_status = "Severely Damaged"
-            # Sets self.car_status to "Severely Damaged" to keep track of the car's current condition.
-            self.money_lost += self.SEVERE_DAMAGE_COST
-            # Increases self.money_lost by SEVERE_DAMAGE_COST, a fixed cost defined earlier,
-            # to account for the additional repair expense due to severe damage.
-            print(f"You lost an additional ${self.SEVERE_DAMAGE_COST} for repairs.")
-            # Prints a message indicating the repair cost lost for severe damage.
-        elif event.damage == "Slightly Damaged":
-        # If the event’s damage level is "Slightly Damaged":
-            if self.car_status != "Severely Damaged":
-            # If the car status is not already set to "Severely Damaged."
-                self.car_status = "Slightly Damaged"
-                # If the car isn’t already "Severely Damaged," it updates the car status to "Slightly Damaged."
-            self.money_lost += self.SLIGHT_DAMAGE_COST
-            # Adds the cost associated with slight damage to self.money_lost.
-            print(f"You lost an additional ${self.SLIGHT_DAMAGE_COST} for repairs.")
-            # Printing a message indicating the cost added due to slight damage.
 
-        print(f"Total Money Lost: ${self.money_lost}")
-        # Displays the total amount of money lost due to repairs so far.
-        input("Press Enter to continue...")
+        input(CONTINUE_PROMPT)
         # Pauses the game until the player presses Enter.
         # This provides a moment to process the information before moving to the next turn.
+        if self.observers:
+            self.notify('on_turn', level, result, time.perf_counter() - started)
         return True
         # Indicates that this turn was completed successfully and allows the game to proceed to the next one.
 
@@ -442,8 +807,9 @@ class Game:
         :return: If success is False, the method returns that the level was not completed successfully.
         If all turns are successfully completed, the method returns that the level was completed without any issues.
         """
-        for turn_number, turn in enumerate(level.turns):
-        # Loops through each turn in the level by iterating over level.turns, which is a list of turn objects.
+        for turn_number in range(len(level.turns)):
+        # Loops through each turn in the level, in the order this game shuffled them.
+            turn = self.turn_at(self.current_level_index, turn_number)
             success = self.play_turn(level, turn_number, turn)
             # Calls the play_turn method for each turn, passing in the current level, turn number, and turn object.
             # Stores the result (True or False) in success.
@@ -460,11 +826,10 @@ class Game:
 
     def start_game(self):
     # Defines the start_game method, which initiates and runs the entire game sequence across all levels.
-        print("=== The Road Wrecker's Adventure! ===")
-        print("""This is a game where every turn is a gamble with potholes, pedestrians, and stray shopping carts.
-Your journey begins after purchasing your car for $2000.
-Get ready to laugh, lose money, and dodge your way through the ultimate test of driver’s luck.
-But beware of treacherous roads ahead!""")
+    # Restarts after a totaled car stay inside the loop below: reset_game() puts current_level_index back to 0,
+    # so the game needs the same memory after its 100,000th restart as after its first.
+        print(TITLE)
+        print(INTRO)
 
         while self.current_level_index < len(self.levels):
         # loop runs as long as there are more levels to play, determined by checking if
@@ -472,13 +837,13 @@ But beware of treacherous roads ahead!""")
 
             current_level = self.levels[self.current_level_index]
             # Retrieves the current level to play based on self.current_level_index.
-            print(f"--- Starting Level {self.current_level_index + 1}: {current_level.name} ---")
+            print(self.level_banner("Starting", self.current_level_index))
             # Prints the current level’s name and number to indicate the beginning of a new level.
-            quit_choice = input("Press Enter to start the level, or type 'quit' to exit the game: ").strip().lower()
+            quit_choice = input(START_LEVEL_PROMPT).strip().lower()
             # Giving the option to the player to quit/start before each level if they want to.
             if quit_choice == 'quit':
             # Checks if the player entered "quit."
-                print("Thanks for playing! Goodbye!")
+                print(GOODBYE)
                 # Prints a farewell message if the player chooses to quit.
                 exit()
 
@@ -488,23 +853,74 @@ But beware of treacherous roads ahead!""")
 
             if level_completed:
             # If play_level returned True, the level was completed.
-                print(f"--- Completed Level {self.current_level_index + 1}: {current_level.name} ---\n")
+                print(self.level_banner("Completed", self.current_level_index) + "\n")
                 # Prints a message indicating successful completion of the level.
+                if self.observers:
+                    self.notify('on_level_completed', self.current_level_index)
                 self.current_level_index += 1
                 # Increments current_level_index to move to the next level.
             else:
-                return self.start_game()
-                # If the level wasn’t completed (car was "Totaled"), it restarts the game by calling start_game() again.
+                continue
+                # If the level wasn’t completed (car was "Totaled"), reset_game() already sent the player back to
+                # the first level, so the loop simply starts over from there.
 
-        print("=== Congratulations! You've made it home safely! ===")
+        if self.observers:
+            self.notify('on_game_completed')
+        print(CONGRATULATIONS)
         print(f"Total Money Lost: ${self.money_lost}")
-        print("Thank you for playing!")
-
+        print(THANK_YOU)
 
-game = Game()
-# Creates a new instance of the Game class, initializing the game.
-game.start_game()
-# Calls the start_game method on the game instance to begin the game sequence.
 
+def seed_argument(text):
+    """
+    Description: argparse type of --seed, so an out-of-range seed is rejected before the game starts
+    instead of when the finished game is recorded (replays store the seed as a u64, see replay.py).
+    :return: Integer between 0 and 2**64 - 1.
+    """
+    import argparse
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid seed: {text!r}") from None
+    if not 0 <= seed < 2 ** 64:
+        raise argparse.ArgumentTypeError(f"seeds must be between 0 and 2**64 - 1, not {seed}")
+    return seed
 
 
+def main(argv=None):
+    """
+    Description: Entry point of the interactive game, used by `python main.py` and the road-wrecker console script.
+    :param argv: Optional list of command line arguments: --seed N replays the same roads and luck,
+                 --record FILE appends the game to a replay file when it ends (see replay.py),
+                 --batch SCRIPT plays the scripted games of a file or stdin without pauses (see batch.py).
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Play The Road Wrecker's Adventure.")
+    parser.add_argument('--seed', type=seed_argument, help="seed of the game, printed when the game is recorded")
+    parser.add_argument('--record', metavar='FILE', help="append the game to this replay file when it ends")
+    parser.add_argument('--batch', metavar='SCRIPT', help="play the games of a script file ('-' for stdin)")
+    parser.add_argument('--output', choices=('full', 'summary', 'quiet'), default='summary',
+                        help="what --batch writes for every game")
+    args = parser.parse_args(argv)
+
+    if args.batch is not None:
+        import batch
+        batch.main_batch(args.batch, args.output)
+        return
+
+    game = Game(seed=args.seed, record=args.record is not None)
+    # Creates a new instance of the Game class, initializing the game.
+    try:
+        game.start_game()
+        # Calls the start_game method on the game instance to begin the game sequence.
+    finally:
+        if args.record is not None:
+            import replay
+            replay.append_replays(args.record, [replay.Replay.from_game(game)])
+            # Also saved when the player quits, so unfinished games can be reported too.
+            print(f"Game {game.seed} recorded to {args.record}.")
+
+
+if __name__ == "__main__":
+# Only start the interactive game when main.py is run directly, so the classes can be imported headlessly.
+    main()
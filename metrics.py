@@ -0,0 +1,209 @@
+"""
+In-process metrics for running games, exported in the Prometheus text format.
+
+MetricsCollector is a GameObserver: attach it to any number of games with game.add_observer(collector).
+Its hooks only bump in-memory counters under a lock, so the game loop never waits for I/O; the text
+exposition is rendered on demand by a background exporter, either written to a file (e.g. for the node
+exporter's textfile collector) or served over HTTP on /metrics.
+
+Exported metrics:
+    road_wrecker_turns_total{level,damage}            turns played, by level and resulting damage
+    road_wrecker_random_events_total{level}           turns replaced by the random clear-path event
+    road_wrecker_random_event_chance{level}           the configured chance, to compare with the above
+    road_wrecker_turn_seconds                         histogram of turn latency
+    road_wrecker_money_lost_dollars_total{level}      repair and replacement costs
+    road_wrecker_levels_completed_total{level}
+    road_wrecker_resets_total                         totaled cars
+    road_wrecker_games_completed_total
+    road_wrecker_restarts_per_game                    histogram of restarts of completed games
+    road_wrecker_tire_upgrade_offers_total            tire upgrades offered by offer_tire_upgrade/step
+    road_wrecker_tire_upgrades_total                  ...and taken
+"""
+import bisect
+import http.server
+import os
+import tempfile
+import threading
+
+from main import GameObserver
+
+
+TURN_SECONDS_BUCKETS = (1e-5, 1e-4, 1e-3, 0.01, 0.1, 1.0, 10.0, 60.0)
+RESTART_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class Histogram:
+    """
+    Purpose: Cumulative Prometheus histogram with fixed bucket upper bounds.
+    """
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        # counts[i] holds the observations in bucket i only; the last slot is +Inf.
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name):
+        cumulative = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{le="{bound}"}} {cumulative}'
+        yield f"{name}_sum {self.total}"
+        yield f"{name}_count {self.count}"
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsCollector(GameObserver):
+    """
+    Purpose: Aggregates the hooks of every game it is attached to into counters and histograms.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turns = {}
+        # (level name, damage label) -> count
+        self.random_events = {}
+        self.random_event_chance = {}
+        self.money_lost = {}
+        self.levels_completed = {}
+        self.resets = 0
+        self.games_completed = 0
+        self.upgrade_offers = 0
+        self.upgrades = 0
+        self.turn_seconds = Histogram(TURN_SECONDS_BUCKETS)
+        self.restarts_per_game = Histogram(RESTART_BUCKETS)
+
+    def on_turn(self, game, level, result, seconds):
+        key = (level.name, result.damage.label)
+        with self.lock:
+            self.turns[key] = self.turns.get(key, 0) + 1
+            self.random_event_chance[level.name] = level.random_event_chance
+            if result.random_event:
+                self.random_events[level.name] = self.random_events.get(level.name, 0) + 1
+            self.money_lost[level.name] = self.money_lost.get(level.name, 0) + result.cost
+            self.turn_seconds.observe(seconds)
+
+    def on_upgrade(self, game, level_index, accepted):
+        with self.lock:
+            self.upgrade_offers += 1
+            self.upgrades += accepted
+
+    def on_level_completed(self, game, level_index):
+        name = game.levels[level_index].name
+        with self.lock:
+            self.levels_completed[name] = self.levels_completed.get(name, 0) + 1
+
+    def on_reset(self, game):
+        with self.lock:
+            self.resets += 1
+
+    def on_game_completed(self, game):
+        with self.lock:
+            self.games_completed += 1
+            self.restarts_per_game.observe(game.restarts)
+
+    def render(self):
+        """
+        :return: All metrics in the Prometheus text exposition format.
+        """
+        with self.lock:
+            lines = ["# TYPE road_wrecker_turns_total counter"]
+            lines += [f'road_wrecker_turns_total{{level="{_label(level)}",damage="{_label(damage)}"}} {count}'
+                      for (level, damage), count in sorted(self.turns.items())]
+            lines.append("# TYPE road_wrecker_random_events_total counter")
+            lines += [f'road_wrecker_random_events_total{{level="{_label(level)}"}} {self.random_events.get(level, 0)}'
+                      for level in sorted(self.random_event_chance)]
+            lines.append("# TYPE road_wrecker_random_event_chance gauge")
+            lines += [f'road_wrecker_random_event_chance{{level="{_label(level)}"}} {chance}'
+                      for level, chance in sorted(self.random_event_chance.items())]
+            lines.append("# TYPE road_wrecker_money_lost_dollars_total counter")
+            lines += [f'road_wrecker_money_lost_dollars_total{{level="{_label(level)}"}} {money}'
+                      for level, money in sorted(self.money_lost.items())]
+            lines.append("# TYPE road_wrecker_levels_completed_total counter")
+            lines += [f'road_wrecker_levels_completed_total{{level="{_label(level)}"}} {count}'
+                      for level, count in sorted(self.levels_completed.items())]
+            for name, value in (('resets', self.resets), ('games_completed', self.games_completed),
+                                ('tire_upgrade_offers', self.upgrade_offers), ('tire_upgrades', self.upgrades)):
+                lines += [f"# TYPE road_wrecker_{name}_total counter", f"road_wrecker_{name}_total {value}"]
+            lines.append("# TYPE road_wrecker_turn_seconds histogram")
+            lines += self.turn_seconds.lines("road_wrecker_turn_seconds")
+            lines.append("# TYPE road_wrecker_restarts_per_game histogram")
+            lines += self.restarts_per_game.lines("road_wrecker_restarts_per_game")
+        return "\n".join(lines) + "\n"
+
+
+"""-------------------------------EXPORTERS----------------------------------"""
+
+
+def write_metrics(collector, path):
+    """
+    Description: Writes the metrics to a file atomically, so a scraper never reads a half-written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as temporary:
+        temporary.write(collector.render())
+    os.chmod(temporary.name, 0o644)
+    os.replace(temporary.name, path)
+
+
+class FileExporter:
+    """
+    Purpose: Rewrites a metrics file every `interval` seconds from a daemon thread.
+    """
+    def __init__(self, collector, path, interval=15.0):
+        self.collector = collector
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='metrics-file-exporter', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            write_metrics(self.collector, self.path)
+
+    def stop(self):
+        """
+        :description: Stops the thread and writes the file one last time.
+        """
+        self.stopped.set()
+        self.thread.join()
+        write_metrics(self.collector, self.path)
+
+
+def serve_metrics(collector, host='127.0.0.1', port=9108):
+    """
+    Description: Serves GET /metrics from a daemon thread.
+    :return: The http.server.ThreadingHTTPServer (port 0 picks a free port; call shutdown() to stop it).
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = collector.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+            # Scrapes are not worth a line on stderr each.
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
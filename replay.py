@@ -0,0 +1,196 @@
+"""
+Compact replay logs of played games and a fast headless replayer.
+
+A game is fully determined by its seed, its levels and the choices made, so a replay only stores the
+seed and one byte per turn (see Game.recording), plus the final state the game ended in. Replaying
+re-runs the choices through Game.step() and checks that the game ends in the same state; after a
+balance change a corpus of recorded games shows exactly which games now play out differently.
+
+Record layout (little-endian), records are simply concatenated in a replay file:
+    header  magic "RWRP", version u8, seed u64, turn count u32
+    turns   one byte per turn: choice index (0 left, 1 straight, 2 right) | 4 if the tires were upgraded
+    footer  money_lost i64, restarts u32, car_status u8, finished u8
+
+Usage: python replay.py games.rwr               replay and verify every game of a file
+       python replay.py games.rwr --record 1000 first append 1000 games of a built-in strategy
+"""
+import argparse
+import struct
+import time
+
+from main import Damage, Game
+
+
+MAGIC = b"RWRP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBQI")
+FOOTER = struct.Struct("<qIBB")
+UPGRADE_FLAG = 4
+
+
+class Replay:
+    """
+    Purpose: One recorded game: its seed, its turn bytes and the state it ended in.
+    """
+    __slots__ = ('seed', 'turns', 'money_lost', 'restarts', 'car_status', 'finished')
+
+    def __init__(self, seed, turns, money_lost, restarts, car_status, finished):
+        """
+        :param seed: Integer, the seed of the game (0 to 2**64 - 1).
+        :param turns: bytes, one byte per played turn.
+        :param money_lost, restarts, car_status, finished: The final state of the game.
+        """
+        self.seed = seed
+        self.turns = bytes(turns)
+        self.money_lost = money_lost
+        self.restarts = restarts
+        self.car_status = Damage(car_status)
+        self.finished = bool(finished)
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        :param game: Game created with record=True and an integer seed.
+        :return: Replay of the game as it stands now.
+        """
+        if game.recording is None or game.seed is None:
+            raise ValueError("Only games created with record=True and a seed can be replayed")
+        return cls(game.seed, game.recording, game.money_lost, game.restarts, game.car_status, game.is_finished())
+
+    def final_state(self):
+        return self.money_lost, self.restarts, self.car_status, self.finished
+
+    def choices(self):
+        """
+        :return: List of (direction, upgrade_tires) pairs, as accepted by Game.play_choices().
+        """
+        return [(Game.CHOICES[turn & 3], bool(turn & UPGRADE_FLAG)) for turn in self.turns]
+
+    def encode(self):
+        if not 0 <= self.seed < 2 ** 64:
+            raise ValueError(f"Replay seeds must be integers between 0 and 2**64 - 1, not {self.seed}")
+        return (HEADER.pack(MAGIC, FORMAT_VERSION, self.seed, len(self.turns)) + self.turns
+                + FOOTER.pack(self.money_lost, self.restarts, self.car_status, self.finished))
+
+    @classmethod
+    def decode(cls, buffer, offset=0):
+        """
+        :return: (Replay, offset of the next record) for the record starting at offset.
+        """
+        magic, version, seed, turn_count = HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"No version {FORMAT_VERSION} replay record at offset {offset}")
+        offset += HEADER.size
+        turns = bytes(buffer[offset:offset + turn_count])
+        offset += turn_count
+        return cls(seed, turns, *FOOTER.unpack_from(buffer, offset)), offset + FOOTER.size
+
+
+def append_replays(path, replays):
+    """
+    Description: Appends replays to a replay file (created if needed).
+    """
+    with open(path, 'ab') as file:
+        file.write(b"".join(replay.encode() for replay in replays))
+
+
+def read_replays(path):
+    """
+    :return: Generator of the Replay records of a replay file.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    offset = 0
+    while offset < len(data):
+        replay, offset = Replay.decode(data, offset)
+        yield replay
+
+
+def replay_game(replay, levels=None, game_class=Game):
+    """
+    Description: Re-runs a recorded game headlessly.
+    :return: The Game in the state the recorded choices lead to with the current rules and levels.
+    """
+    game = game_class(levels=levels, seed=replay.seed)
+    step = game.step
+    for turn in replay.turns:
+        if game.is_finished():
+            break
+            # Turns past the end of the game mean it finished earlier than when it was recorded.
+        step(Game.CHOICES[turn & 3], turn & UPGRADE_FLAG)
+    return game
+
+
+def verify(replay, levels=None, game_class=Game):
+    """
+    :return: (True if the game ends in the recorded state, the replayed Game).
+    """
+    game = replay_game(replay, levels, game_class)
+    replayed = (game.money_lost, game.restarts, game.car_status, game.is_finished())
+    return replayed == replay.final_state(), game
+
+
+def verify_all(replays, levels=None, game_class=Game):
+    """
+    :return: (number of replays checked, list of (index, Replay, replayed Game) for every mismatch).
+    """
+    count = 0
+    mismatches = []
+    for count, replay in enumerate(replays, 1):
+        matches, game = verify(replay, levels, game_class)
+        if not matches:
+            mismatches.append((count - 1, replay, game))
+    return count, mismatches
+
+
+def record_games(strategy, games, seed=0, levels=None, max_turns=10_000, game_class=Game):
+    """
+    Description: Plays games with a tournament strategy and records them.
+    :param strategy: Callable strategy(game, level, turn_number, turn), see tournament.py. It must not draw
+                     from game.rng, since the replay only contains the game's own draws. All of
+                     tournament.STRATEGIES qualify; 'random' draws from its own stream seeded by the game.
+    :param seed: Integer, game i is seeded with seed + i.
+    :return: List of Replay.
+    """
+    replays = []
+    for index in range(games):
+        game = game_class(levels=levels, seed=(seed + index) % 2 ** 64, record=True)
+        while not game.is_finished() and len(game.recording) < max_turns:
+            turn_number = game.current_turn_index
+            decision = strategy(game, game.levels[game.current_level_index], turn_number,
+                                game.turn_at(game.current_level_index, turn_number))
+            if isinstance(decision, str):
+                game.step(decision)
+            else:
+                game.step(*decision)
+        replays.append(Replay.from_game(game))
+    return replays
+
+
+def main(argv=None):
+    import tournament
+    parser = argparse.ArgumentParser(description="Replay and verify recorded games.")
+    parser.add_argument('path', help="replay file")
+    parser.add_argument('--record', type=int, default=0, metavar='GAMES', help="first append this many new games")
+    parser.add_argument('--strategy', choices=sorted(tournament.STRATEGIES), default='greedy')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.record:
+        append_replays(args.path, record_games(tournament.STRATEGIES[args.strategy], args.record, args.seed))
+    replays = list(read_replays(args.path))
+    started = time.perf_counter()
+    count, mismatches = verify_all(replays)
+    elapsed = time.perf_counter() - started
+    for index, replay, game in mismatches[:20]:
+        print(f"Game {index} (seed {replay.seed}): recorded money_lost ${replay.money_lost}, "
+              f"{replay.restarts} restarts, {replay.car_status}; replayed ${game.money_lost}, "
+              f"{game.restarts} restarts, {game.car_status}")
+    turns = sum(len(replay.turns) for replay in replays)
+    print(f"Replayed {count} games ({turns} turns) in {elapsed:.2f}s "
+          f"({count / max(elapsed, 1e-9):,.0f} games/s): {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+"""
+Asyncio multi-session server for The Road Wrecker's Adventure.
+
+Every TCP connection plays its own game over a line-based protocol: the server sends the same texts
+as the console game, one message per line, and every prompt line ends with the prompt text itself.
+The client answers each prompt with one line ('', 'quit', 'yes'/'no', 'left'/'straight'/'right').
+Answers may be pipelined; they are consumed in order.
+
+All sessions share one copy of the level/turn/event tables; a session only owns its Game state
+(indices, money, car status and its turn-order permutations), so thousands of idle players cost a few KB each.
+
+Usage: python server.py --port 8023, then e.g. nc localhost 8023
+"""
+import argparse
+import asyncio
+
+import main
+from main import Game
+
+
+class Session:
+    """
+    Purpose: One connected player: the line reader/writer and the game being played.
+    """
+    __slots__ = ('reader', 'writer', 'game')
+
+    def __init__(self, reader, writer, levels, observers=()):
+        """
+        :param reader, writer: The asyncio streams of the connection.
+        :param levels: The shared Level tables.
+        :param observers: GameObserver listeners attached to the session's game.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.game = Game(levels=levels)
+        for observer in observers:
+            self.game.add_observer(observer)
+
+    def send(self, *lines):
+        for line in lines:
+            self.writer.write(line.encode() + b"\n")
+
+    async def ask(self, prompt):
+        """
+        :return: The player's answer, stripped and lower-cased; None when the client disconnected
+                 or sent a line longer than the stream limit, which ends the session.
+        """
+        self.send(prompt)
+        await self.writer.drain()
+        try:
+            line = await self.reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            return None
+            # readline() raises ValueError for an over-long line; nothing else is caught here.
+        if not line:
+            return None
+        return line.decode(errors='replace').strip().lower()
+
+    async def ask_choice(self, prompt, valid, invalid_message):
+        """
+        :return: One of `valid`, 'quit', or None when the client disconnected.
+        """
+        while True:
+            answer = await self.ask(prompt)
+            if answer is None or answer == 'quit' or answer in valid:
+                return answer
+            self.send(invalid_message)
+
+    async def play(self):
+        """
+        Description: Runs the game loop of Game.start_game() over the connection.
+        :return: True if the player made it home, False if they quit or disconnected.
+        """
+        game = self.game
+        self.send(main.TITLE, *main.INTRO.splitlines())
+        while not game.is_finished():
+            level = game.levels[game.current_level_index]
+            turn_number = game.current_turn_index
+            upgrade = False
+            if turn_number == 0:
+                self.send(game.level_banner("Starting", game.current_level_index))
+                if await self.ask(main.START_LEVEL_PROMPT) in (None, 'quit'):
+                    return False
+                if game.tires_upgraded:
+                    self.send(main.TIRES_ALREADY_UPGRADED)
+                else:
+                    answer = await self.ask_choice(main.UPGRADE_PROMPT, ('yes', 'no'), main.UPGRADE_INVALID)
+                    if answer in (None, 'quit'):
+                        return False
+                    upgrade = answer == 'yes'
+                    self.send(main.UPGRADE_ACCEPTED if upgrade else main.UPGRADE_DECLINED)
+
+            self.send(*game.turn_header(level, turn_number).splitlines())
+            choice = await self.ask_choice(main.CHOICE_PROMPT, Game.CHOICES, main.CHOICE_INVALID)
+            if choice in (None, 'quit'):
+                return False
+            result = game.step(choice, upgrade)
+            self.send(*game.report_turn(result))
+
+            if result.reset:
+                self.send(*main.RESET_MESSAGES)
+                prompt = main.RETRY_PROMPT
+            else:
+                prompt = main.CONTINUE_PROMPT
+            if await self.ask(prompt) in (None, 'quit'):
+                return False
+            if result.level_completed:
+                self.send(game.level_banner("Completed", result.level_index), "")
+
+        self.send(main.CONGRATULATIONS, f"Total Money Lost: ${game.money_lost}", main.THANK_YOU)
+        return True
+
+
+class GameServer:
+    """
+    Purpose: Accepts connections and runs one Session per connection, all sharing one set of levels.
+    """
+    def __init__(self, levels=None, observers=()):
+        """
+        :param levels: Shared Level tables; defaults to Game.create_levels(), which every process builds only once.
+        :param observers: GameObserver listeners attached to every session's game, e.g. a metrics.MetricsCollector.
+        """
+        self.levels = levels if levels is not None else Game.create_levels()
+        self.observers = tuple(observers)
+        self.sessions = 0
+        self.completed = 0
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        session = Session(reader, writer, self.levels, self.observers)
+        try:
+            if await session.play():
+                self.completed += 1
+            else:
+                session.send(main.GOODBYE)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8023, backlog=4096):
+        """
+        :return: The started asyncio.Server (port 0 picks a free port, see server.sockets).
+        """
+        return await asyncio.start_server(self.handle, host, port, backlog=backlog)
+
+    async def serve_forever(self, host='127.0.0.1', port=8023):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Host The Road Wrecker's Adventure over TCP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8023)
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics on this port at /metrics")
+    parser.add_argument('--metrics-file', help="write Prometheus metrics to this file every 15 seconds")
+    parser.add_argument('--leaderboard', help="record completed games in this leaderboard file")
+    args = parser.parse_args(argv)
+
+    observers = []
+    exporter = None
+    if args.metrics_port is not None or args.metrics_file:
+        import metrics
+        collector = metrics.MetricsCollector()
+        observers.append(collector)
+        if args.metrics_port is not None:
+            metrics.serve_metrics(collector, args.host, args.metrics_port)
+        if args.metrics_file:
+            exporter = metrics.FileExporter(collector, args.metrics_file).start()
+    board = submitter = None
+    if args.leaderboard:
+        import concurrent.futures
+        import leaderboard
+        board = leaderboard.Leaderboard(args.leaderboard)
+        submitter = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='leaderboard')
+        # One thread keeps the submission order; its fsyncs and compactions never stall the sessions.
+        observers.append(leaderboard.LeaderboardObserver(board, executor=submitter))
+    try:
+        asyncio.run(GameServer(observers=observers).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        if board is not None:
+            submitter.shutdown()
+            board.close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,477 @@
+"""
+Vectorized Monte Carlo simulation of The Road Wrecker's Adventure.
+
+Instead of playing Game objects one turn at a time, the level/turn/event tables are turned into
+integer arrays and N games are advanced together: every step draws the random event rolls and the
+policy's choices for all unfinished games at once and applies the damage costs and the
+restart-on-"Totaled" rule with NumPy operations.
+
+Results are folded into exact histograms chunk by chunk (every cost is a multiple of $250),
+so 10M games need no more memory than one chunk of games. Results of different runs or workers
+merge, and long runs can checkpoint after every chunk and resume where they stopped (--checkpoint).
+
+Usage: python simulation.py --games 10000000 --policy greedy
+"""
+import argparse
+import functools
+import math
+import time
+
+import numpy as np
+
+from main import Damage, Game
+from sketches import load_checkpoint, save_checkpoint
+
+
+HEALTHY, SLIGHT, SEVERE, TOTALED = (int(damage) for damage in Damage)
+# Integer damage codes (the values of main.Damage), ordered so that the worse damage always has the bigger code.
+MAX_TABLE_TURNS = 16
+# Levels up to this many turns are shuffled through a (2 ** turns, turns) lookup table.
+
+
+class LevelTables:
+    """
+    Purpose: The Level/Turn/Event tables of a game encoded as NumPy arrays.
+    """
+    def __init__(self, levels, game_class=Game):
+        """
+        :param levels: List of Level objects (e.g. Game.create_levels()); the turn order is ignored,
+                       every simulated game shuffles its own order.
+        :param game_class: The class whose *_COST constants and CAR_PRICE are used.
+        """
+        self.names = [level.name for level in levels]
+        self.turn_counts = np.array([len(level.turns) for level in levels], dtype=np.int64)
+        self.max_turns = int(self.turn_counts.max())
+        self.damage = np.zeros((len(levels), self.max_turns, len(Game.CHOICES)), dtype=np.int8)
+        # damage[level, turn, choice] is the damage code of that choice; padded turns are never played.
+        for level_index, level in enumerate(levels):
+            for turn_index, turn in enumerate(level.turns):
+                for choice_index, choice in enumerate(Game.CHOICES):
+                    self.damage[level_index, turn_index, choice_index] = turn.get_event(choice).damage
+        self.turn_codes = (self.damage[:, :, 0] | self.damage[:, :, 1] << 2 | self.damage[:, :, 2] << 4).astype(np.uint8)
+        # turn_codes[level, turn] packs the three damage codes of a turn into one byte, 2 bits per choice.
+        self.random_event_chance = np.array([level.random_event_chance for level in levels], dtype=np.float64)
+        self.costs = np.array([0, game_class.SLIGHT_DAMAGE_COST, game_class.SEVERE_DAMAGE_COST,
+                               game_class.TOTAL_DAMAGE_COST], dtype=np.int64)
+        # costs[damage code] is the money one event of that damage costs.
+        self.car_price = game_class.CAR_PRICE
+        self.tire_upgrade_cost = game_class.TIRE_UPGRADE_COST
+        damage_costs = tuple(int(cost) for cost in self.costs)
+        tables = [game_class.outcome_table(level.random_event_chance, damage_costs, game_class.modifier_grips())
+                  for level in levels]
+        width = max(len(thresholds) for table in tables for thresholds, _ in table)
+        shape = (len(levels), len(tables[0]) // len(Damage), len(Damage), width)
+        self.outcome_thresholds = np.full(shape, np.inf)
+        self.outcome_damage = np.zeros(shape, dtype=np.int8)
+        # The game's outcome tables (see main.build_outcome_table) as arrays indexed
+        # [level, modifier state, event damage, outcome]; padding thresholds are never reached.
+        for level_index, table in enumerate(tables):
+            for index, (thresholds, outcomes) in enumerate(table):
+                state, damage = divmod(index, len(Damage))
+                self.outcome_thresholds[level_index, state, damage, :len(thresholds)] = thresholds
+                self.outcome_damage[level_index, state, damage, :len(outcomes)] = [outcome[0] for outcome in outcomes]
+        self.cost_unit = math.gcd(*(int(cost) for cost in self.costs), self.car_price, self.tire_upgrade_cost)
+        # Every money amount is a multiple of this unit, which keeps the money histograms exact.
+
+    @property
+    def level_count(self):
+        return len(self.names)
+
+
+def resolve_outcomes(tables, level, modifiers, event_damage, draws):
+    """
+    Description: The vectorized version of Game.resolve_turn()'s table lookup.
+    :param modifiers: Integer (or boolean tires) array with every game's modifier state.
+    :param event_damage: Array with the damage code of the chosen event of every game.
+    :param draws: Array with one uniform draw in [0, 1) per game.
+    :return: Array with the damage every game actually takes.
+    """
+    modifiers = modifiers.astype(np.int64)
+    thresholds = tables.outcome_thresholds[level, modifiers, event_damage]
+    outcome = (draws[:, None] >= thresholds).sum(axis=1)
+    # The number of thresholds at or below the draw is the index of the outcome it falls into.
+    return tables.outcome_damage[level, modifiers, event_damage, outcome].astype(event_damage.dtype)
+
+
+"""-------------------------------POLICIES-----------------------------------"""
+"""
+A policy is a callable policy(turn_codes, level_index, turn_index, tires_upgraded, rng) that gets, for k
+games at once, the packed damage codes of the turn each game is on (see unpack_options), and returns
+k choice indices (0 = left, 1 = straight, 2 = right).
+"""
+
+
+def unpack_options(turn_codes):
+    """
+    :param turn_codes: Integer array of packed turn codes.
+    :return: Array of shape (k, 3) with the damage code of every choice.
+    """
+    return (turn_codes[:, None] >> np.array([0, 2, 4], dtype=np.uint8)) & 3
+
+
+def damage_of(turn_codes, choice):
+    """
+    :return: The damage code of the chosen direction for every game.
+    """
+    return (turn_codes >> (2 * choice).astype(np.uint8)) & 3
+
+
+def fixed_policy(choice):
+    """
+    :param choice: String, the direction to always take.
+    :return: A policy that always picks that direction.
+    """
+    choice_index = Game.CHOICES.index(choice)
+
+    def policy(turn_codes, level_index, turn_index, tires_upgraded, rng):
+        return np.full(len(turn_codes), choice_index, dtype=np.uint8)
+    return policy
+
+
+def table_policy(choices_by_code):
+    """
+    :param choices_by_code: Sequence of 64 choice indices, one per packed turn code.
+    :return: A policy that looks every game's choice up in that table.
+    """
+    table = np.asarray(choices_by_code, dtype=np.uint8)
+
+    def policy(turn_codes, level_index, turn_index, tires_upgraded, rng):
+        return table[turn_codes]
+    return policy
+
+
+def random_policy(turn_codes, level_index, turn_index, tires_upgraded, rng):
+    """
+    :return: A uniformly random direction for every game.
+    """
+    return rng.integers(0, len(Game.CHOICES), size=len(turn_codes), dtype=np.uint8)
+
+
+greedy_policy = table_policy(unpack_options(np.arange(64, dtype=np.uint8)).argmin(axis=1))
+# The direction with the least damage on every game's current turn (leftmost on ties).
+
+
+POLICIES = {
+    'left': fixed_policy('left'),
+    'straight': fixed_policy('straight'),
+    'right': fixed_policy('right'),
+    'random': random_policy,
+    'greedy': greedy_policy,
+}
+
+
+"""-------------------------------RESULTS------------------------------------"""
+
+
+class SimulationResult:
+    """
+    Purpose: Histograms and per-level counters collected over all simulated games.
+    money_lost is the game's final "Total Money Lost" (which restarts from the car price after a reset);
+    total_money_lost also counts every totaled car and every repair of the earlier attempts.
+    """
+    def __init__(self, tables):
+        self.tables = tables
+        self.games = 0
+        self.completed = 0
+        self.money_lost_counts = np.zeros(0, dtype=np.int64)
+        self.total_money_lost_counts = np.zeros(0, dtype=np.int64)
+        # counts[i] is the number of completed games that lost exactly i * cost_unit dollars.
+        self.restart_counts = np.zeros(0, dtype=np.int64)
+        # restart_counts[i] is the number of completed games that needed exactly i restarts.
+        self.level_attempts = np.zeros(tables.level_count, dtype=np.int64)
+        self.level_busts = np.zeros(tables.level_count, dtype=np.int64)
+        self.damage_counts = np.zeros((tables.level_count, len(Damage)), dtype=np.int64)
+        # damage_counts[level, damage code] is the number of turns of that level that ended with that damage.
+
+    @staticmethod
+    def _add_counts(counts, values):
+        return SimulationResult._merge_counts(counts, np.bincount(values))
+
+    @staticmethod
+    def _merge_counts(counts, new_counts):
+        if len(new_counts) > len(counts):
+            counts = np.pad(counts, (0, len(new_counts) - len(counts)))
+        counts[:len(new_counts)] += new_counts
+        return counts
+
+    def add_games(self, games, money_lost, total_money_lost, restarts):
+        """
+        :param games: Integer, how many games were simulated in this chunk (finished or not).
+        :param money_lost, total_money_lost, restarts: Integer arrays for the games that were completed.
+        """
+        unit = self.tables.cost_unit
+        self.games += games
+        self.completed += len(money_lost)
+        self.money_lost_counts = self._add_counts(self.money_lost_counts, money_lost // unit)
+        self.total_money_lost_counts = self._add_counts(self.total_money_lost_counts, total_money_lost // unit)
+        self.restart_counts = self._add_counts(self.restart_counts, restarts)
+
+    def merge(self, other):
+        """
+        :param other: SimulationResult of the same levels, e.g. from another worker.
+        :return: self, with the games of other added.
+        """
+        self.games += other.games
+        self.completed += other.completed
+        for name in ('money_lost_counts', 'total_money_lost_counts', 'restart_counts'):
+            setattr(self, name, self._merge_counts(getattr(self, name), getattr(other, name)))
+        self.level_attempts += other.level_attempts
+        self.level_busts += other.level_busts
+        self.damage_counts += other.damage_counts
+        return self
+
+    def to_dict(self):
+        """
+        :return: JSON-friendly dictionary of all counters; SimulationResult.from_dict(tables, data) restores it.
+        """
+        return {'games': self.games, 'completed': self.completed,
+                'money_lost_counts': self.money_lost_counts.tolist(),
+                'total_money_lost_counts': self.total_money_lost_counts.tolist(),
+                'restart_counts': self.restart_counts.tolist(),
+                'level_attempts': self.level_attempts.tolist(), 'level_busts': self.level_busts.tolist(),
+                'damage_counts': self.damage_counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, tables, data):
+        result = cls(tables)
+        result.games, result.completed = data['games'], data['completed']
+        for name in ('money_lost_counts', 'total_money_lost_counts', 'restart_counts', 'level_attempts',
+                     'level_busts', 'damage_counts'):
+            setattr(result, name, np.array(data[name], dtype=np.int64))
+        return result
+
+    def histogram(self, name):
+        """
+        :param name: 'money_lost', 'total_money_lost' or 'restarts'.
+        :return: (values, counts) arrays, only for values that occurred.
+        """
+        if name == 'restarts':
+            counts, scale = self.restart_counts, 1
+        else:
+            counts, scale = getattr(self, name + '_counts'), self.tables.cost_unit
+        values = np.flatnonzero(counts)
+        return values * scale, counts[values]
+
+    def mean(self, name):
+        values, counts = self.histogram(name)
+        return float((values * counts).sum() / counts.sum()) if counts.sum() else math.nan
+
+    def quantile(self, name, q):
+        values, counts = self.histogram(name)
+        if not counts.sum():
+            return math.nan
+        return int(values[np.searchsorted(np.cumsum(counts), q * counts.sum())])
+
+    @property
+    def completion_rate(self):
+        return self.completed / self.games if self.games else math.nan
+
+    def bust_rates(self):
+        """
+        :return: Dictionary level name -> share of the attempts at that level that ended with a totaled car.
+        """
+        return {name: (float(busts / attempts) if attempts else math.nan)
+                for name, attempts, busts in zip(self.tables.names, self.level_attempts, self.level_busts)}
+
+    def summary(self):
+        lines = [f"Games: {self.games}  Completed: {self.completed} ({self.completion_rate:.2%})"]
+        for name in ('money_lost', 'total_money_lost', 'restarts'):
+            lines.append(f"{name}: mean {self.mean(name):.1f}  median {self.quantile(name, 0.5)}  "
+                         f"p99 {self.quantile(name, 0.99)}")
+        for name, rate in self.bust_rates().items():
+            lines.append(f"Bust rate {name}: {rate:.2%}")
+        for name, counts in zip(self.tables.names, self.damage_counts):
+            shares = counts / max(counts.sum(), 1)
+            lines.append(f"Damage mix {name}: " + "  ".join(f"{damage.label} {share:.1%}"
+                                                             for damage, share in zip(Damage, shares)))
+        return "\n".join(lines)
+
+
+"""------------------------------SIMULATION----------------------------------"""
+
+
+@functools.lru_cache(maxsize=None)
+def _nth_free_table(turn_count):
+    """
+    :return: Array table[mask, r] = index of the r-th turn that is not yet in the bit mask of used turns.
+    """
+    table = np.zeros((1 << turn_count, turn_count), dtype=np.int8)
+    for mask in range(1 << turn_count):
+        free = [turn for turn in range(turn_count) if not mask >> turn & 1]
+        table[mask, :len(free)] = free
+    return table
+
+
+def _turn_orders(tables, games, rng):
+    """
+    Description: Draws every game's own shuffled turn order, like random.shuffle in Game.create_levels().
+    Each position picks uniformly among the turns not used yet (a Lehmer code), which is several times
+    faster than sorting random keys.
+    :return: Array order[position, game, level] = index of the turn played at that position.
+    """
+    level_count, max_turns = tables.level_count, tables.max_turns
+    if max_turns > MAX_TABLE_TURNS:
+        keys = np.where(np.arange(max_turns) < tables.turn_counts[:, None],
+                        rng.random((games, level_count, max_turns)), np.inf)
+        return np.argsort(keys, axis=2).astype(np.int16).transpose(2, 0, 1)
+        # Shorter levels keep their padding turns at the end of the order, where they are never reached.
+
+    table = _nth_free_table(max_turns).ravel()
+    orders = [math.factorial(count) for count in tables.turn_counts]
+    code_type = np.uint32 if max(orders) <= 1 << 32 else np.uint64
+    code = rng.integers(0, orders, size=(games, level_count), dtype=code_type)
+    # One uniform draw per level in [0, turns!) holds all the digits of the order.
+    order = np.empty((max_turns, games, level_count), dtype=np.int8)
+    used = np.zeros((games, level_count), dtype=code_type)
+    for position in range(max_turns):
+        remaining = np.maximum(tables.turn_counts - position, 1).astype(code_type)
+        digit = code % remaining
+        code //= remaining
+        slot = table[used * code_type(max_turns) + digit]
+        order[position] = slot
+        used |= np.left_shift(code_type(1), slot.astype(code_type))
+    return order
+
+
+def _simulate_chunk(tables, games, policy, upgrade_tires, rng, max_turns, result):
+    level_count = tables.level_count
+    routes = tables.turn_codes[np.arange(level_count), _turn_orders(tables, games, rng)]
+    route = routes.reshape(-1)
+    # route[position * stride + game * level_count + level] is the packed code of the turn the game
+    # meets at that position, so every step needs a single flat gather; routes is the same array as
+    # routes[position, game, level].
+    stride = games * level_count
+
+    # The state of the games still on the road, kept as dense arrays; finished games are dropped.
+    base = np.arange(games) * level_count
+    level = np.zeros(games, dtype=np.int64)
+    turn = np.zeros(games, dtype=np.int64)
+    status = np.zeros(games, dtype=np.uint8)
+    tires = np.zeros(games, dtype=bool)
+    money = np.full(games, tables.car_price, dtype=np.int64)
+    total = np.full(games, tables.car_price, dtype=np.int64)
+    restarts = np.zeros(games, dtype=np.int64)
+
+    for _ in range(max_turns):
+        if not len(base):
+            break
+        starting = turn == 0
+        result.level_attempts += np.bincount(level[starting], minlength=level_count)
+        if upgrade_tires:
+            buying = starting & ~tires
+            money += buying * tables.tire_upgrade_cost
+            total += buying * tables.tire_upgrade_cost
+            tires |= buying
+
+        turn_codes = route[turn * stride + base + level]
+        choice = policy(turn_codes, level, turn, tires, rng)
+        damage = resolve_outcomes(tables, level, tires, damage_of(turn_codes, choice),
+                                  rng.random(len(base), dtype=np.float32))
+        result.damage_counts += np.bincount(level * len(Damage) + damage,
+                                            minlength=result.damage_counts.size).reshape(result.damage_counts.shape)
+        cost = tables.costs[damage]
+        total += cost
+        money += cost
+        status = np.maximum(status, damage)
+        # Slight damage never hides an earlier severe damage.
+        turn += 1
+
+        totaled = damage == TOTALED
+        if totaled.any():
+            result.level_busts += np.bincount(level[totaled], minlength=level_count)
+            level[totaled] = 0
+            turn[totaled] = 0
+            status[totaled] = HEALTHY
+            tires[totaled] = False
+            money[totaled] = tables.car_price
+            restarts[totaled] += 1
+            routes[:, base[totaled] // level_count] = tables.turn_codes[
+                np.arange(level_count), _turn_orders(tables, int(totaled.sum()), rng)]
+            # Like Game.restart(), every new attempt drives the levels in a new order.
+
+        level_done = turn == tables.turn_counts[level]
+        level += level_done
+        turn[level_done] = 0
+
+        finished = level == level_count
+        if finished.any():
+            result.add_games(0, money[finished], total[finished], restarts[finished])
+            on_road = ~finished
+            base, level, turn, status = base[on_road], level[on_road], turn[on_road], status[on_road]
+            tires, money, total, restarts = tires[on_road], money[on_road], total[on_road], restarts[on_road]
+
+    result.add_games(games, money[:0], total[:0], restarts[:0])
+    # Games still on the road after max_turns only count as played, not completed.
+
+
+def policy_name(policy):
+    """
+    :return: The POLICIES name of a policy, or its module and qualified name for other policies.
+    """
+    for name, known in POLICIES.items():
+        if known is policy:
+            return name
+    return f"{policy.__module__}.{getattr(policy, '__qualname__', type(policy).__qualname__)}"
+
+
+def simulate(games, policy=greedy_policy, upgrade_tires=False, levels=None, seed=None,
+             chunk_size=250_000, max_turns=10_000, game_class=Game, checkpoint=None):
+    """
+    Description: Simulates many games at once and returns their aggregated statistics.
+    :param games: Integer, the number of games to simulate.
+    :param policy: A policy callable (see POLICIES) choosing the direction for every game.
+    :param upgrade_tires: Boolean, whether every game buys the tire upgrade when it is offered.
+    :param levels: List of Level objects; defaults to game_class().create_levels().
+    :param seed: Optional seed for numpy.random.default_rng, for reproducible runs.
+    :param chunk_size: Integer, how many games are simulated together; bounds the memory use.
+    :param max_turns: Integer, games that have not finished after this many turns are counted as unfinished.
+    :param game_class: The class providing the costs.
+    :param checkpoint: Optional path of a JSON checkpoint holding the result so far and the random generator
+                       state, rewritten after every chunk. If it exists the run resumes from it, and the final
+                       result is the same as that of an uninterrupted run with the same seed.
+    :return: SimulationResult.
+    """
+    tables = LevelTables(levels if levels is not None else game_class().create_levels(), game_class)
+    rng = np.random.default_rng(seed)
+    result = SimulationResult(tables)
+    run = {'games': games, 'seed': seed, 'chunk_size': chunk_size, 'upgrade_tires': upgrade_tires,
+           'max_turns': max_turns, 'levels': tables.names, 'policy': policy_name(policy),
+           'costs': [game_class.SLIGHT_DAMAGE_COST, game_class.SEVERE_DAMAGE_COST, game_class.TOTAL_DAMAGE_COST,
+                     game_class.CAR_PRICE, game_class.TIRE_UPGRADE_COST, game_class.TIRE_GRIP]}
+    # A checkpoint only resumes a run with the same policy and costs.
+    state = load_checkpoint(checkpoint) if checkpoint else None
+    if state is not None:
+        if state['run'] != run:
+            raise ValueError(f"{checkpoint} belongs to a different simulation: {state['run']}")
+        result = SimulationResult.from_dict(tables, state['result'])
+        rng.bit_generator.state = state['rng']
+    remaining = games - result.games
+    while remaining > 0:
+        chunk = min(chunk_size, remaining)
+        _simulate_chunk(tables, chunk, policy, upgrade_tires, rng, max_turns, result)
+        remaining -= chunk
+        if checkpoint:
+            save_checkpoint(checkpoint, {'run': run, 'result': result.to_dict(), 'rng': rng.bit_generator.state})
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized Monte Carlo simulation of The Road Wrecker's Adventure.")
+    parser.add_argument('--games', type=int, default=1_000_000)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='greedy')
+    parser.add_argument('--upgrade-tires', action='store_true')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--chunk-size', type=int, default=250_000)
+    parser.add_argument('--checkpoint', help="JSON checkpoint to resume from and update after every chunk")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result = simulate(args.games, POLICIES[args.policy], args.upgrade_tires, seed=args.seed,
+                      chunk_size=args.chunk_size, checkpoint=args.checkpoint)
+    elapsed = time.perf_counter() - started
+    print(result.summary())
+    print(f"Simulated {args.games} games in {elapsed:.2f}s ({args.games / elapsed:,.0f} games/s)")
+
+
+if __name__ == "__main__":
+    main()
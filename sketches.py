@@ -0,0 +1,343 @@
+"""
+Mergeable, constant-memory statistics for long simulation and tournament runs.
+
+Every sketch folds values in one at a time (or a NumPy array at a time), merges with the same sketch
+from another worker or shard, and round-trips through a JSON-friendly dictionary, so a run of any
+length needs the same memory and can be checkpointed and resumed:
+
+    Moments         count, mean and variance (Welford; Chan et al. for merges), min and max
+    QuantileSketch  quantiles within a relative error, using logarithmic buckets (as in DDSketch)
+    Distribution    Moments + QuantileSketch of one quantity
+    GameSketch      the per-game results of a run: money lost, total money lost, restarts,
+                    per-level attempts/busts and per-level damage counts
+"""
+import collections
+import json
+import math
+import os
+import tempfile
+
+
+class Moments:
+    """
+    Purpose: Streaming count/mean/variance/min/max that can be merged exactly.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Sum of squared differences from the mean.
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        """
+        :param values: Sequence or NumPy array of numbers, folded in as one batch.
+        """
+        count = len(values)
+        if not count:
+            return
+        if hasattr(values, 'dtype'):
+            mean = float(values.mean())
+            batch = Moments._from_values(count, mean, float(((values - mean) ** 2).sum()),
+                                         float(values.min()), float(values.max()))
+        else:
+            mean = math.fsum(values) / count
+            batch = Moments._from_values(count, mean, math.fsum((value - mean) ** 2 for value in values),
+                                         min(values), max(values))
+        self.merge(batch)
+
+    @classmethod
+    def _from_values(cls, count, mean, m2, minimum, maximum):
+        moments = cls()
+        moments.count, moments.mean, moments.m2, moments.min, moments.max = count, mean, m2, minimum, maximum
+        return moments
+
+    def merge(self, other):
+        """
+        :return: self, with the values of other added.
+        """
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data['count']:
+            return cls()
+        return cls._from_values(data['count'], data['mean'], data['m2'], data['min'], data['max'])
+
+
+class QuantileSketch:
+    """
+    Purpose: Quantiles of non-negative values with a bounded relative error. Values fall into buckets
+    whose bounds grow geometrically by gamma = (1 + accuracy) / (1 - accuracy); every bucket is
+    reported by a value within `accuracy` of all of its members. Merging adds bucket counts, so it is
+    exact, and the number of buckets only grows with log(max / min), not with the number of values.
+    """
+    __slots__ = ('accuracy', 'gamma', 'log_gamma', 'buckets', 'zero_count', 'count')
+
+    def __init__(self, accuracy=0.01):
+        """
+        :param accuracy: Float, the relative error of every reported quantile (0.01 = 1%).
+        """
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = collections.Counter()
+        # bucket index i -> count of values in (gamma ** (i - 1), gamma ** i]
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        if value < 0:
+            raise ValueError(f"QuantileSketch only holds non-negative values, not {value}")
+        if value == 0:
+            self.zero_count += count
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += count
+        self.count += count
+
+    def add_many(self, values):
+        """
+        :param values: Sequence or NumPy array of non-negative numbers.
+        """
+        if hasattr(values, 'dtype'):
+            import numpy as np
+            if len(values) and values.min() < 0:
+                raise ValueError("QuantileSketch only holds non-negative values")
+            positive = values[values > 0]
+            indices, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64),
+                                        return_counts=True)
+            self.buckets.update(dict(zip(indices.tolist(), counts.tolist())))
+            self.zero_count += len(values) - len(positive)
+            self.count += len(values)
+        else:
+            for value in values:
+                self.add(value)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches with the same accuracy can be merged")
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """
+        :param q: Float between 0 and 1.
+        :return: A value within the sketch's relative accuracy of the q-quantile (nan when empty).
+        """
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+                # The value with the same relative distance to both bounds of the bucket.
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'accuracy': self.accuracy, 'zero_count': self.zero_count,
+                'buckets': [[index, count] for index, count in sorted(self.buckets.items())]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['accuracy'])
+        sketch.zero_count = data['zero_count']
+        sketch.buckets.update({index: count for index, count in data['buckets']})
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
+
+
+class Distribution:
+    """
+    Purpose: Moments and quantiles of one quantity.
+    """
+    __slots__ = ('moments', 'quantiles')
+
+    def __init__(self, accuracy=0.01):
+        self.moments = Moments()
+        self.quantiles = QuantileSketch(accuracy)
+
+    def add(self, value):
+        self.moments.add(value)
+        self.quantiles.add(value)
+
+    def add_many(self, values):
+        self.moments.add_many(values)
+        self.quantiles.add_many(values)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean if self.moments.count else math.nan
+
+    @property
+    def std(self):
+        return self.moments.std
+
+    def quantile(self, q):
+        return self.quantiles.quantile(q)
+
+    def summary(self):
+        return (f"mean {self.mean:.1f} ± {self.std:.1f}  median {self.quantile(0.5):.0f}  "
+                f"p99 {self.quantile(0.99):.0f}  max {self.moments.max:.0f}")
+
+    def to_dict(self):
+        return {'moments': self.moments.to_dict(), 'quantiles': self.quantiles.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        distribution = cls()
+        distribution.moments = Moments.from_dict(data['moments'])
+        distribution.quantiles = QuantileSketch.from_dict(data['quantiles'])
+        return distribution
+
+
+class GameSketch:
+    """
+    Purpose: Constant-memory summary of the games of a run, mergeable across workers.
+    money_lost is only collected for completed games; total_money_lost and restarts for every game.
+    """
+    DISTRIBUTIONS = ('money_lost', 'total_money_lost', 'restarts')
+
+    def __init__(self, accuracy=0.01):
+        self.games = 0
+        self.completed = 0
+        self.money_lost = Distribution(accuracy)
+        self.total_money_lost = Distribution(accuracy)
+        self.restarts = Distribution(accuracy)
+        self.level_attempts = collections.Counter()
+        self.level_busts = collections.Counter()
+        # level name -> count
+        self.damage = collections.Counter()
+        # (level name, damage label) -> number of turns that ended with that damage
+
+    def add_game(self, completed, money_lost, total_money_lost, restarts):
+        self.games += 1
+        if completed:
+            self.completed += 1
+            self.money_lost.add(money_lost)
+        self.total_money_lost.add(total_money_lost)
+        self.restarts.add(restarts)
+
+    def add_level(self, level_name, attempts, busts):
+        self.level_attempts[level_name] += attempts
+        self.level_busts[level_name] += busts
+
+    def add_damage(self, level_name, damage_label, turns=1):
+        self.damage[level_name, damage_label] += turns
+
+    def merge(self, other):
+        self.games += other.games
+        self.completed += other.completed
+        for name in self.DISTRIBUTIONS:
+            getattr(self, name).merge(getattr(other, name))
+        self.level_attempts.update(other.level_attempts)
+        self.level_busts.update(other.level_busts)
+        self.damage.update(other.damage)
+        return self
+
+    def bust_rates(self):
+        return {name: self.level_busts[name] / attempts for name, attempts in self.level_attempts.items() if attempts}
+
+    def summary(self):
+        lines = [f"Games: {self.games}  Completed: {self.completed}"]
+        lines += [f"{name}: {getattr(self, name).summary()}" for name in self.DISTRIBUTIONS]
+        lines += [f"Bust rate {name}: {rate:.2%}" for name, rate in self.bust_rates().items()]
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {'games': self.games, 'completed': self.completed,
+                **{name: getattr(self, name).to_dict() for name in self.DISTRIBUTIONS},
+                'level_attempts': dict(self.level_attempts), 'level_busts': dict(self.level_busts),
+                'damage': [[level, damage, count] for (level, damage), count in sorted(self.damage.items())]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.games, sketch.completed = data['games'], data['completed']
+        for name in cls.DISTRIBUTIONS:
+            setattr(sketch, name, Distribution.from_dict(data[name]))
+        sketch.level_attempts.update(data['level_attempts'])
+        sketch.level_busts.update(data['level_busts'])
+        sketch.damage.update({(level, damage): count for level, damage, count in data['damage']})
+        return sketch
+
+
+"""------------------------------CHECKPOINTS---------------------------------"""
+
+
+def save_checkpoint(path, state):
+    """
+    Description: Writes a JSON checkpoint atomically: a crash mid-write leaves the previous checkpoint intact.
+    :param state: JSON-serializable dictionary (e.g. a sketch's to_dict() plus the progress of the run).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as temporary:
+        json.dump(state, temporary)
+        temporary.flush()
+        os.fsync(temporary.fileno())
+        # On disk before the rename, so a crash can never leave an empty or truncated checkpoint in its place.
+    os.replace(temporary.name, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+            # Makes the rename itself durable (POSIX only).
+        finally:
+            os.close(descriptor)
+
+
+def load_checkpoint(path):
+    """
+    :return: The state saved by save_checkpoint(), or None if there is no checkpoint yet.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
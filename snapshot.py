@@ -0,0 +1,181 @@
+"""
+Compact save/resume snapshots of games in progress.
+
+A snapshot holds everything Game keeps between turns: the level and turn indices, car_status,
+money_lost, tires_upgraded, restarts, the game's turn order of every level, stored as the rank of
+the permutation (a Lehmer code, 3 bytes for a 10-turn level; nothing for preshuffled levels such as
+generated routes, which every game plays in their own order), and its random stream, stored as the
+seed plus the number of turns played (every turn draws exactly one number). A resumed game therefore
+plays on exactly like the original would have, including its future random events. A session of the
+default levels takes 36 bytes.
+
+Snapshots are written in batches: one header with the format version and a fingerprint of the levels,
+then one fixed-size record per game, so tens of thousands of live sessions are saved or loaded in
+one call and a batch is never resumed with levels it was not taken with.
+
+Batch layout (little-endian):
+    header  magic "RWSS", version u8, level count u16, session count u32, levels fingerprint u32,
+            then one flags u8 per level (bit 0 preshuffled: the level's records hold no rank)
+    record  seed u64, turns played u32, money_lost u32, restarts u32, level u16, turn u32,
+            flags u8 (bits 0-1 car_status, bit 2 tires_upgraded, bit 3 seeded),
+            one little-endian permutation rank per shuffled level, ceil(log2(turns!) / 8) bytes each
+"""
+import array
+import functools
+import math
+import os
+import struct
+import tempfile
+import zlib
+
+from main import Damage, Game
+
+
+MAGIC = b"RWSS"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sBHII")
+RECORD = struct.Struct("<QIIIHIB")
+TIRES_FLAG = 4
+SEEDED_FLAG = 8
+PRESHUFFLED_FLAG = 1
+# Level flag: the level is played in its stored order (see Game.shuffle_turn_orders), so no rank is saved.
+
+
+def rank_permutation(order):
+    """
+    :param order: Sequence holding a permutation of range(len(order)).
+    :return: Integer in [0, len(order)!), its rank in lexicographic order.
+    """
+    remaining = sorted(order)
+    rank = 0
+    for position, value in enumerate(order):
+        index = remaining.index(value)
+        rank += index * math.factorial(len(order) - 1 - position)
+        del remaining[index]
+    return rank
+
+
+def unrank_permutation(rank, size):
+    """
+    :return: List, the permutation of range(size) with the given lexicographic rank.
+    """
+    remaining = list(range(size))
+    order = []
+    for position in range(size):
+        index, rank = divmod(rank, math.factorial(size - 1 - position))
+        order.append(remaining.pop(index))
+    return order
+
+
+def level_flags(levels):
+    return bytes(PRESHUFFLED_FLAG if getattr(level.turns, 'preshuffled', False) else 0 for level in levels)
+
+
+def rank_sizes(levels, flags=None):
+    """
+    :param flags: The level_flags() the sizes are for; defaults to those of levels.
+    :return: Number of bytes of the permutation rank of every level, 0 for preshuffled levels.
+    """
+    flags = level_flags(levels) if flags is None else flags
+    return [0 if level_flag & PRESHUFFLED_FLAG else max(1, (math.factorial(len(level.turns)) - 1).bit_length() + 7 >> 3)
+            for level, level_flag in zip(levels, flags)]
+
+
+@functools.lru_cache(maxsize=16)
+def levels_fingerprint(levels):
+    """
+    :param levels: Tuple of Level objects.
+    :return: CRC32 of the level names, random event chances and turn events; changes whenever the content does.
+             Cached per tuple of levels, since a long generated route takes a while to walk.
+    """
+    text = "\n".join(f"{level.name}|{level.random_event_chance}|" +
+                     "|".join(f"{event.description}:{int(event.damage)}" for turn in level.turns for event in turn)
+                     for level in levels)
+    return zlib.crc32(text.encode())
+
+
+def save_games(games):
+    """
+    Description: Encodes a batch of games, which must all play the same levels.
+    :param games: Sequence of Game objects.
+    :return: bytes of the batch.
+    """
+    if not games:
+        levels = ()
+    else:
+        levels = games[0].levels
+        if any(game.levels is not levels and game.levels != levels for game in games):
+            raise ValueError("All games of a snapshot batch must play the same levels")
+    flags = level_flags(levels)
+    sizes = rank_sizes(levels, flags)
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(levels), len(games), levels_fingerprint(tuple(levels))), flags]
+    for game in games:
+        seeded = isinstance(game.seed, int) and 0 <= game.seed < 2 ** 64
+        flags = int(game.car_status) | (TIRES_FLAG if game.tires_upgraded else 0) | (SEEDED_FLAG if seeded else 0)
+        parts.append(RECORD.pack(game.seed if seeded else 0, game.turns_played, game.money_lost, game.restarts,
+                                 game.current_level_index, game.current_turn_index, flags))
+        for order, size in zip(game.turn_orders, sizes):
+            if size:
+                parts.append(rank_permutation(order).to_bytes(size, 'little'))
+    return b"".join(parts)
+
+
+def load_games(data, levels=None, game_class=Game):
+    """
+    Description: Restores a batch saved by save_games().
+    :param data: bytes of the batch.
+    :param levels: The levels the games were playing; defaults to game_class.create_levels().
+    :return: List of Game objects, ready to continue where they were saved. Games that were not seeded
+             get a fresh random stream; everything else is restored exactly.
+    """
+    levels = tuple(levels) if levels is not None else game_class.create_levels()
+    magic, version, level_count, count, fingerprint = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Not a version {FORMAT_VERSION} game snapshot")
+    if level_count != len(levels) or fingerprint != levels_fingerprint(levels):
+        raise ValueError("The snapshot was taken with different levels")
+    flags = data[HEADER.size:HEADER.size + level_count]
+    sizes = rank_sizes(levels, flags)
+    offset = HEADER.size + level_count
+    games = []
+    for _ in range(count):
+        seed, turns_played, money_lost, restarts, level_index, turn_index, flags = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        game = game_class(levels=levels, seed=seed if flags & SEEDED_FLAG else None)
+        orders = []
+        for level, size in zip(levels, sizes):
+            if not size:
+                orders.append(range(len(level.turns)))
+                continue
+            order = unrank_permutation(int.from_bytes(data[offset:offset + size], 'little'), len(level.turns))
+            orders.append(bytes(order) if len(order) <= 256 else array.array('I', order))
+            offset += size
+        game.turn_orders = orders
+        if flags & SEEDED_FLAG:
+            random = game.rng.random
+            for _ in range(turns_played):
+                random()
+                # Brings the random stream to where it was: one draw per played turn after the turn shuffles.
+        game.turns_played = turns_played
+        game.money_lost = money_lost
+        game.restarts = restarts
+        game.current_level_index = level_index
+        game.current_turn_index = turn_index
+        game.car_status = Damage(flags & 3)
+        game.tires_upgraded = bool(flags & TIRES_FLAG)
+        games.append(game)
+    return games
+
+
+def save_file(path, games):
+    """
+    Description: Writes a snapshot batch atomically, so a crash never leaves a half-written snapshot.
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), delete=False) as temporary:
+        temporary.write(save_games(games))
+    os.replace(temporary.name, path)
+
+
+def load_file(path, levels=None, game_class=Game):
+    with open(path, 'rb') as file:
+        return load_games(file.read(), levels, game_class)
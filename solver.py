@@ -0,0 +1,268 @@
+"""
+Exact expected-cost solver for The Road Wrecker's Adventure.
+
+The game is a small Markov decision process. Within a level the turns come in a shuffled order, drawn
+again for every attempt (Game.restart()), so the state is (level, set of turns already played,
+tires_upgraded) and the next turn is uniform among the turns left, also after a restart. car_status is part of the game state but never changes a cost, so it is collapsed.
+The player sees the turn (like play_turn does), picks left/straight/right, then the event is resolved
+through the game's outcome table: the level's random_event_chance may replace it with a clear path,
+and upgraded tires may take a tier off its damage. A "Totaled" car costs
+TOTAL_DAMAGE_COST and restarts the whole game from level 0 (reset_game), which makes the value of
+the start state appear on both sides of the Bellman equation.
+
+For a fixed restart value x the backward induction over the turn subsets gives f(x), which is concave
+and piecewise linear in x with slope P(bust before the end). The fixed point x = f(x) is found with
+Newton steps on that slope (policy iteration), which is exact after a handful of passes.
+
+Usage: python solver.py
+"""
+import functools
+import time
+
+import numpy as np
+
+from main import Game, build_outcome_table
+from simulation import TOTALED
+
+
+MAX_EXACT_TURNS = 16
+# Levels are solved over all 2 ** turns subsets of played turns, so they must stay small.
+
+
+class Solution:
+    """
+    Purpose: The optimal policy and the expected costs of one level layout.
+    All costs count from the start of a game, including the CAR_PRICE of the first car.
+    """
+    def __init__(self, layout, expected_total_money_lost, expected_money_lost, completion_probability,
+                 choices, upgrades):
+        """
+        :param layout: The cache key the solution was solved for (see layout_key).
+        :param expected_total_money_lost: Float, expected money spent over all cars until the game is won.
+        :param expected_money_lost: Float, expected "Total Money Lost" printed at the end of start_game.
+        :param completion_probability: Float, chance of winning a game attempt without a totaled car.
+        :param choices: List with one int8 array per level, choices[level][tires, used_mask, turn],
+                        -1 where the turn was already played.
+        :param upgrades: List with one bool per level, whether to buy tires when offered at that level.
+        """
+        self.layout = layout
+        self.expected_total_money_lost = expected_total_money_lost
+        self.expected_money_lost = expected_money_lost
+        self.completion_probability = completion_probability
+        self.expected_restarts = (1 - completion_probability) / completion_probability
+        self.choices = choices
+        self.upgrades = upgrades
+
+    def turn_index(self, level_index, turn, played_turns=()):
+        """
+        :return: (used_mask, index) of turn in the solved layout, given the Turn objects already played.
+        Turns with the same damages are interchangeable, so each played turn takes the first free match.
+        """
+        level_turns = self.layout[0][level_index][1]
+        used_mask = 0
+        for played in played_turns:
+            used_mask |= 1 << _free_match(level_turns, _turn_code(played), used_mask)
+        return used_mask, _free_match(level_turns, _turn_code(turn), used_mask)
+
+    def choose(self, level_index, turn, played_turns=(), tires_upgraded=False):
+        """
+        :param level_index: Integer, the current level.
+        :param turn: Turn, the turn the player is on.
+        :param played_turns: Iterable of the Turn objects already played in this attempt at the level.
+        :param tires_upgraded: Boolean, the game's tires_upgraded flag.
+        :return: String, the optimal direction.
+        """
+        used_mask, index = self.turn_index(level_index, turn, played_turns)
+        return Game.CHOICES[self.choices[level_index][int(tires_upgraded), used_mask, index]]
+
+    def upgrade(self, level_index, tires_upgraded=False):
+        """
+        :return: True if the tires should be bought when offered at the start of this level.
+        """
+        return not tires_upgraded and self.upgrades[level_index]
+
+    def summary(self):
+        return (f"Expected total money lost: ${self.expected_total_money_lost:,.2f}\n"
+                f"Expected final money lost: ${self.expected_money_lost:,.2f}\n"
+                f"Completion probability per attempt: {self.completion_probability:.4%}\n"
+                f"Expected restarts: {self.expected_restarts:.4f}\n"
+                f"Tire upgrades: {self.upgrades}")
+
+
+def _turn_code(turn):
+    return tuple(int(turn.get_event(choice).damage) for choice in Game.CHOICES)
+
+
+def _free_match(level_turns, code, used_mask):
+    for index, level_turn in enumerate(level_turns):
+        if level_turn == code and not used_mask >> index & 1:
+            return index
+    raise ValueError(f"No unplayed turn with damages {code} in this level")
+
+
+def layout_key(levels, game_class=Game):
+    """
+    :param levels: List of Level objects.
+    :return: A hashable description of everything the expected cost depends on. Turns are sorted,
+             so every shuffled copy of the same levels shares one cache entry.
+    """
+    costs = (game_class.SLIGHT_DAMAGE_COST, game_class.SEVERE_DAMAGE_COST, game_class.TOTAL_DAMAGE_COST,
+             game_class.CAR_PRICE, game_class.TIRE_UPGRADE_COST, game_class.TIRE_GRIP)
+    return tuple((level.random_event_chance, tuple(sorted(_turn_code(turn) for turn in level.turns)))
+                 for level in levels), costs
+
+
+def _turn_outcomes(chance, level_turns, costs):
+    """
+    :return: (bust, repair) arrays of shape (tires, turn, choice): the probability that the choice totals
+             the car and the expected repair cost paid when it does not.
+    """
+    table = build_outcome_table(chance, (0, costs[0], costs[1], costs[2]), (costs[5],))
+    # The same outcome table the game resolves its turns with; modifier state 1 is the upgraded tires.
+    bust_by_damage = np.zeros((2, 4))
+    repair_by_damage = np.zeros((2, 4))
+    for index, (thresholds, outcomes) in enumerate(table):
+        tires, event_damage = divmod(index, 4)
+        previous = 0.0
+        for threshold, (damage, cost, _, _) in zip(thresholds, outcomes):
+            if damage == TOTALED:
+                bust_by_damage[tires, event_damage] += threshold - previous
+            else:
+                repair_by_damage[tires, event_damage] += (threshold - previous) * cost
+            previous = threshold
+    codes = np.array(level_turns, dtype=np.int64)
+    return bust_by_damage[:, codes], repair_by_damage[:, codes]
+
+
+def _solve_level(chance, level_turns, costs, restart, next_level):
+    """
+    Description: Backward induction over the subsets of played turns of one level.
+    :param restart: Float, the value of starting over (the cost of a new car plus the start state value).
+    :param next_level: (value, success, success_cost) arrays over tires for the start of the next level.
+    :return: (value, success, success_cost) arrays over tires for the start of this level and the choices.
+             success is the probability of finishing the game without a totaled car, success_cost the
+             expected repair and upgrade money paid on those successful runs.
+    """
+    turn_count = len(level_turns)
+    bust, repair = _turn_outcomes(chance, level_turns, costs)
+    full = (1 << turn_count) - 1
+    masks = np.arange(1 << turn_count)
+    popcount = np.zeros(1 << turn_count, dtype=np.int64)
+    for turn in range(turn_count):
+        popcount += masks >> turn & 1
+
+    value = np.zeros((2, 1 << turn_count))
+    success = np.zeros((2, 1 << turn_count))
+    success_cost = np.zeros((2, 1 << turn_count))
+    choices = np.full((2, 1 << turn_count, turn_count), -1, dtype=np.int8)
+    value[:, full], success[:, full], success_cost[:, full] = next_level
+
+    for played in range(turn_count - 1, -1, -1):
+        group = masks[popcount == played]
+        left = turn_count - played
+        for tires in (0, 1):
+            for turn in range(turn_count):
+                free = group[(group >> turn & 1) == 0]
+                child = free | 1 << turn
+                candidates = (repair[tires, turn][None, :] + bust[tires, turn][None, :] * restart
+                              + (1 - bust[tires, turn])[None, :] * value[tires, child][:, None])
+                best = candidates.argmin(axis=1)
+                # argmin keeps the leftmost direction on ties.
+                choices[tires, free, turn] = best
+                survive = 1 - bust[tires, turn][best]
+                value[tires, free] += candidates[np.arange(len(free)), best] / left
+                success[tires, free] += survive * success[tires, child] / left
+                success_cost[tires, free] += (repair[tires, turn][best] * success[tires, child]
+                                              + survive * success_cost[tires, child]) / left
+    return value[:, 0], success[:, 0], success_cost[:, 0], choices
+
+
+def _solve_game(layout, restart_value):
+    levels, costs = layout
+    total_damage_cost, tire_upgrade_cost = costs[2], costs[4]
+    restart = total_damage_cost + restart_value
+    next_level = (np.zeros(2), np.ones(2), np.zeros(2))
+    choices, upgrades = [None] * len(levels), [False] * len(levels)
+    for level_index in range(len(levels) - 1, -1, -1):
+        chance, level_turns = levels[level_index]
+        value, success, success_cost, choices[level_index] = _solve_level(
+            chance, level_turns, costs, restart, next_level)
+        if tire_upgrade_cost + value[1] < value[0]:
+            # Buying the tires at this level's first turn beats driving on the old ones.
+            upgrades[level_index] = True
+            value[0] = tire_upgrade_cost + value[1]
+            success[0] = success[1]
+            success_cost[0] = success_cost[1] + tire_upgrade_cost * success[1]
+        next_level = (value, success, success_cost)
+    return next_level[0][0], next_level[1][0], next_level[2][0], choices, upgrades
+
+
+def _restart_bound(layout):
+    """
+    :return: A restart value far above the cost of any attempt, so the policy solved with it avoids
+             totaling the car whenever some choice can.
+    """
+    levels, costs = layout
+    slight, severe, total_damage_cost, car_price = costs[:4]
+    turns = sum(len(level_turns) for _, level_turns in levels)
+    return (car_price + total_damage_cost + max(slight, severe) * turns) * 1e6
+
+
+@functools.lru_cache(maxsize=64)
+def solve_layout(layout, tolerance=1e-9, max_iterations=100):
+    """
+    Description: Solves a layout directly, e.g. one with changed costs or chances (see balance.py).
+    Results are cached per layout.
+    :param layout: (levels, costs) as returned by layout_key().
+    :return: Solution.
+    """
+    for _, level_turns in layout[0]:
+        if len(level_turns) > MAX_EXACT_TURNS:
+            raise ValueError(f"The exact solver supports levels of up to {MAX_EXACT_TURNS} turns, "
+                             f"got {len(level_turns)}; use simulation.simulate() instead.")
+    car_price = layout[1][3]
+    restart_value = 0.0
+    for _ in range(max_iterations):
+        value, success, success_cost, choices, upgrades = _solve_game(layout, restart_value)
+        if success <= 0:
+            if restart_value >= _restart_bound(layout):
+                raise ValueError("No policy can finish this layout without totaling the car.")
+            restart_value = _restart_bound(layout)
+            # A restart this cheap makes totaling the car look free; from above the bound Newton
+            # steps only go down, towards the fixed point.
+            continue
+        new_restart_value = (value - restart_value * (1 - success)) / success
+        # Newton step on x = f(x), using f'(x) = 1 - success.
+        if abs(new_restart_value - restart_value) <= tolerance * max(1.0, new_restart_value):
+            restart_value = new_restart_value
+            break
+        restart_value = new_restart_value
+    else:
+        raise RuntimeError("The expected cost did not converge.")
+    value, success, success_cost, choices, upgrades = _solve_game(layout, restart_value)
+    return Solution(layout, car_price + value, car_price + success_cost / success, success, choices, upgrades)
+
+
+def solve(levels=None, game_class=Game):
+    """
+    Description: Computes the optimal policy and the exact expected costs for a level layout.
+    Results are cached per layout, so repeated calls for the same levels are free.
+    :param levels: List of Level objects; defaults to game_class().create_levels().
+    :param game_class: The class providing the costs.
+    :return: Solution.
+    """
+    if levels is None:
+        levels = game_class().create_levels()
+    return solve_layout(layout_key(levels, game_class))
+
+
+def main():
+    started = time.perf_counter()
+    solution = solve()
+    elapsed = time.perf_counter() - started
+    print(solution.summary())
+    print(f"Solved in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Round trips of leaderboard.py: records encode and decode losslessly, and a reopened log rebuilds the
+same indexes, also after a crash left a torn record at its end.
+"""
+import pytest
+
+import leaderboard
+from leaderboard import Entry, Leaderboard
+
+
+def entry(money_lost, level_costs=(0, 0, 0), name='player', **fields):
+    values = dict(restarts=0, turns=30, seconds=1.5, timestamp=1_700_000_000.25, seed=2 ** 64 - 1)
+    values.update(fields)
+    return Entry(money_lost, values['restarts'], values['turns'], values['seconds'], values['timestamp'],
+                 values['seed'], tuple(level_costs), name)
+
+
+def test_encode_decode_round_trip():
+    entries = [entry(7000, (1000, 2500, 3500)), entry(0, (0, 0, 0), name=''),
+               entry(2 ** 32 - 1, (2 ** 32 - 1,) * 3, name='Ünïcode ✓', restarts=12, seed=0)]
+    data = b"".join(leaderboard.encode_entry(item) for item in entries)
+    decoded, end = leaderboard.decode_entries(data, 0, 3)
+    assert decoded == entries
+    assert end == len(data)
+
+
+def test_long_name_is_cut_on_a_character_boundary():
+    data = leaderboard.encode_entry(entry(1, name='é' * 200))
+    (decoded,), _ = leaderboard.decode_entries(data, 0, 3)
+    assert decoded.name == 'é' * 127
+
+
+def test_decode_stops_at_a_corrupt_record():
+    first, second = leaderboard.encode_entry(entry(1)), bytearray(leaderboard.encode_entry(entry(2)))
+    second[-1] ^= 0xFF
+    decoded, end = leaderboard.decode_entries(first + bytes(second), 0, 3)
+    assert [item.money_lost for item in decoded] == [1]
+    assert end == len(first)
+
+
+def test_many_levels_round_trip():
+    level_costs = tuple(range(5000))
+    (decoded,), _ = leaderboard.decode_entries(leaderboard.encode_entry(entry(9, level_costs)), 0, 5000)
+    assert decoded.level_costs == level_costs
+
+
+def test_reopened_log_has_the_same_indexes(tmp_path):
+    path = str(tmp_path / "scores.rwlb")
+    with Leaderboard(path, level_count=3, k=5, sync_interval=None) as board:
+        for index in range(50):
+            board.submit(10_000 - index * 37 % 1000, restarts=index % 3, level_costs=(index, 50 - index, index % 7),
+                         name=f"run {index}", seed=index)
+        top, level_best = board.top_runs(), [board.level_best(level) for level in range(3)]
+    with Leaderboard(path, k=5, sync_interval=None) as board:
+        assert board.level_count == 3
+        assert board.top_runs() == top
+        assert [board.level_best(level) for level in range(3)] == level_best
+
+
+def test_torn_record_is_cut_off(tmp_path):
+    path = str(tmp_path / "scores.rwlb")
+    with Leaderboard(path, level_count=3, sync_interval=None) as board:
+        for money_lost in (3000, 1000, 2000):
+            board.submit(money_lost)
+    size = len(open(path, 'rb').read())
+    with open(path, 'ab') as log:
+        log.write(leaderboard.encode_entry(entry(10))[:-3])
+    with Leaderboard(path, sync_interval=None) as board:
+        assert [item.money_lost for item in board.top_runs()] == [1000, 2000, 3000]
+        board.submit(500)
+    with open(path, 'rb') as log:
+        assert len(log.read()) > size
+    with Leaderboard(path, sync_interval=None) as board:
+        assert [item.money_lost for item in board.top_runs()] == [500, 1000, 2000, 3000]
+
+
+def test_compaction_keeps_the_indexed_runs(tmp_path):
+    path = str(tmp_path / "scores.rwlb")
+    with Leaderboard(path, level_count=1, k=3, sync_interval=None) as board:
+        for money_lost in range(100, 0, -1):
+            board.submit(money_lost, level_costs=(money_lost,))
+        board.compact()
+        top = board.top_runs()
+    with Leaderboard(path, sync_interval=None) as board:
+        assert board.records == 3
+        assert board.top_runs() == top
+
+
+def test_rejects_other_level_counts(tmp_path):
+    path = str(tmp_path / "scores.rwlb")
+    Leaderboard(path, level_count=3, sync_interval=None).close()
+    with pytest.raises(ValueError, match="3 levels"):
+        Leaderboard(path, level_count=4, sync_interval=None)
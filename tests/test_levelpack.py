@@ -0,0 +1,121 @@
+"""
+Round trips of levelpack.py: a compiled pack reads back the levels of its source, small packs eagerly and
+large ones lazily, and a cached pack is recompiled when its source changes.
+"""
+import json
+import os
+
+import pytest
+
+import levelpack
+from main import Damage, Event, Game, Level, Turn
+
+
+DAMAGES = ("Healthy", "Slightly Damaged", "Severely Damaged", "Totaled")
+
+
+def source(level_count=3, turns_per_level=4, share=True):
+    levels = []
+    for level_index in range(level_count):
+        level = {'name': f"Level {level_index}", 'random_event_chance': level_index / 10}
+        if share and level_index == 1:
+            level['turns_from'] = "Level 0"
+        else:
+            level['turns'] = [{choice: [f"{choice} {level_index}.{turn} ✓", DAMAGES[(turn + offset) % 4]]
+                               for offset, choice in enumerate(levelpack.CHOICES)}
+                              for turn in range(turns_per_level)]
+        levels.append(level)
+    return {'name': "Test Pack", 'levels': levels}
+
+
+def expected_levels(data):
+    turns_by_name = {}
+    for level in data['levels']:
+        turns = turns_by_name[level['name']] = turns_by_name.get(level.get('turns_from'), level.get('turns'))
+        yield level['name'], level['random_event_chance'], [
+            tuple((turn[choice][0], Damage.parse(turn[choice][1])) for choice in levelpack.CHOICES) for turn in turns]
+
+
+def read_levels(levels):
+    return [(level.name, level.random_event_chance,
+             [tuple((event.description, event.damage) for event in turn) for turn in level.turns]) for level in levels]
+
+
+def test_compile_round_trip():
+    data = source()
+    pack = levelpack.LevelPack(levelpack.compile_source(data, 123, 456))
+    assert (pack.name, len(pack), pack.source_size, pack.source_mtime_ns) == ("Test Pack", 3, 123, 456)
+    levels = pack.levels()
+    assert isinstance(levels, tuple)
+    assert read_levels(levels) == list(expected_levels(data))
+    assert levels[1].turns is levels[0].turns
+    # "turns_from" levels share their turns.
+
+
+def test_turn_damage_matches_events():
+    data = source()
+    pack = levelpack.LevelPack(levelpack.compile_source(data))
+    turn_count = len(pack.turn_events) // 3
+    for turn_id in range(turn_count):
+        turn = pack.turn(turn_id, Event, Turn)
+        assert [pack.turn_damage[3 * turn_id + index] for index in range(3)] == [event.damage for event in turn]
+
+
+def test_large_pack_is_lazy():
+    data = source(level_count=3, turns_per_level=levelpack.EAGER_TURNS, share=False)
+    pack = levelpack.LevelPack(levelpack.compile_source(data))
+    levels = pack.levels()
+    assert isinstance(levels, levelpack.PackLevels)
+    assert isinstance(levels[2].turns, levelpack.PackTurns)
+    expected = list(expected_levels(data))
+    for level_index in (0, 2):
+        name, chance, turns = expected[level_index]
+        level = levels[level_index]
+        assert (level.name, level.random_event_chance) == (name, chance)
+        for turn_index in (0, 1, len(turns) - 1):
+            assert tuple((event.description, event.damage) for event in level.turns[turn_index]) == turns[turn_index]
+
+
+def test_lazy_pack_plays_like_the_eager_one():
+    data = source(level_count=2, turns_per_level=levelpack.EAGER_TURNS // 2 + 1, share=False)
+    lazy = levelpack.LevelPack(levelpack.compile_source(data)).levels()
+    eager = tuple(Level(level.name, tuple(level.turns), level.random_event_chance) for level in lazy)
+    games = [Game(levels=levels, seed=9) for levels in (lazy, eager)]
+    for game in games:
+        game.play_choices(['left', 'straight'] * 50)
+    lazy_game, eager_game = games
+    assert (lazy_game.money_lost, lazy_game.restarts, lazy_game.turns_played) == \
+           (eager_game.money_lost, eager_game.restarts, eager_game.turns_played)
+
+
+def test_open_pack_caches_and_recompiles(tmp_path):
+    path = tmp_path / "pack.json"
+    data = source()
+    path.write_text(json.dumps(data), encoding='utf-8')
+    first = levelpack.open_pack(str(path))
+    assert os.path.exists(levelpack.cache_path_for(str(path)))
+    assert read_levels(first.levels()) == list(expected_levels(data))
+
+    data['levels'][2]['random_event_chance'] = 0.75
+    path.write_text(json.dumps(data) + "\n", encoding='utf-8')
+    second = levelpack.open_pack(str(path))
+    assert second is not first
+    assert read_levels(second.levels()) == list(expected_levels(data))
+
+
+def test_default_pack_matches_its_source():
+    with open(os.path.join(os.path.dirname(levelpack.__file__), "levels", "default.json"), encoding='utf-8') as file:
+        data = json.load(file)
+    assert read_levels(Game.create_levels()) == list(expected_levels(data))
+
+
+@pytest.mark.parametrize('broken, message', [
+    ({'name': "No turns", 'random_event_chance': 0.1, 'turns': []}, "at least one turn"),
+    ({'name': "Bad chance", 'random_event_chance': 1.5, 'turns': []}, "between 0 and 1"),
+    ({'name': "Bad source", 'turns_from': "Missing"}, "earlier level"),
+    ({'name': "Bad damage", 'turns': [{'left': ["x", "Dented"], 'straight': ["y", 0], 'right': ["z", 0]}]},
+     "unknown damage"),
+])
+def test_compile_rejects_broken_sources(broken, message):
+    with pytest.raises(ValueError, match=message):
+        levelpack.compile_source({'name': "Broken", 'levels': [broken]})
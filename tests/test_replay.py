@@ -0,0 +1,67 @@
+"""
+Round trips of replay.py: replay records encode and decode losslessly, and replaying a recording
+reaches the state the recorded game ended in.
+"""
+import pytest
+
+import replay
+import tournament
+from main import Damage, Game
+from replay import Replay
+
+
+def test_encode_decode_round_trip():
+    records = [Replay(0, b"", 2000, 0, Damage.HEALTHY, False),
+               Replay(2 ** 64 - 1, bytes(range(7)) * 40, 12_345, 9, Damage.SEVERE, True)]
+    data = b"".join(record.encode() for record in records)
+    offset = 0
+    for record in records:
+        decoded, offset = Replay.decode(data, offset)
+        assert (decoded.seed, decoded.turns) == (record.seed, record.turns)
+        assert decoded.final_state() == record.final_state()
+    assert offset == len(data)
+
+
+def test_encode_rejects_seeds_outside_u64():
+    for seed in (-1, 2 ** 64):
+        with pytest.raises(ValueError):
+            Replay(seed, b"", 0, 0, Damage.HEALTHY, False).encode()
+
+
+def test_choices_round_trip_through_a_game():
+    game = Game(seed=42, record=True)
+    game.play_choices([('right', True), 'left', 'straight', ('left', True), 'right'] * 4)
+    assert Replay.from_game(game).choices()[:2] == [('right', True), ('left', False)]
+    replayed = Game(seed=42, record=True)
+    replayed.play_choices(Replay.from_game(game).choices())
+    assert replayed.recording == game.recording
+
+
+@pytest.mark.parametrize('strategy', sorted(tournament.STRATEGIES))
+def test_recorded_games_verify(strategy, tmp_path):
+    path = str(tmp_path / "games.rwr")
+    recorded = replay.record_games(tournament.STRATEGIES[strategy], 10, seed=2 ** 64 - 5, max_turns=500)
+    replay.append_replays(path, recorded[:6])
+    replay.append_replays(path, recorded[6:])
+    records = list(replay.read_replays(path))
+    assert [record.seed for record in records] == [record.seed for record in recorded]
+    count, mismatches = replay.verify_all(records)
+    assert (count, mismatches) == (10, [])
+
+
+def test_unfinished_game_verifies():
+    game = Game(seed=7, record=True)
+    game.play_choices(['straight'] * 25)
+    matches, replayed = replay.verify(Replay.decode(Replay.from_game(game).encode())[0])
+    assert matches and not replayed.is_finished()
+    assert replayed.turns_played == game.turns_played
+
+
+def test_tampered_recording_is_reported():
+    game = Game(seed=11, record=True)
+    game.play_choices(['left'] * 40)
+    record = Replay.from_game(game)
+    tampered = Replay(record.seed, record.turns, record.money_lost + 250, record.restarts, record.car_status,
+                      record.finished)
+    assert replay.verify(record)[0]
+    assert not replay.verify(tampered)[0]
@@ -0,0 +1,82 @@
+"""
+Round trips of snapshot.py: a saved batch loads back into the same games, and a resumed game plays on
+exactly like the same game left running.
+"""
+import random
+
+import pytest
+
+import snapshot
+from main import Game
+
+
+CHOICES = ('straight', 'left', 'right', 'straight', 'straight')
+# Straight ahead busts often enough that the games restart and reshuffle before they are saved.
+
+
+def play(game, turns, upgrade=True):
+    for _ in range(turns):
+        if game.is_finished():
+            break
+        game.step(CHOICES[game.turns_played % len(CHOICES)], upgrade)
+
+
+def state(game):
+    return (game.current_level_index, game.current_turn_index, game.car_status, game.money_lost,
+            game.tires_upgraded, game.restarts, game.turns_played, [list(order) for order in game.turn_orders])
+
+
+def test_save_load_round_trip():
+    games = [Game(seed=seed) for seed in (0, 1, 2 ** 64 - 1, 12345)]
+    for turns, game in zip((0, 7, 40, 120), games):
+        play(game, turns)
+    assert any(game.restarts for game in games)
+    loaded = snapshot.load_games(snapshot.save_games(games), games[0].levels)
+    assert [state(game) for game in loaded] == [state(game) for game in games]
+    assert [game.seed for game in loaded] == [game.seed for game in games]
+
+
+def test_file_round_trip(tmp_path):
+    games = [Game(seed=seed) for seed in range(20)]
+    for game in games:
+        play(game, game.seed * 5)
+    path = tmp_path / "games.rwss"
+    snapshot.save_file(str(path), games)
+    assert [state(game) for game in snapshot.load_file(str(path))] == [state(game) for game in games]
+
+
+def test_default_session_size():
+    assert len(snapshot.save_games([Game(seed=0)])) - len(snapshot.save_games([])) - len(Game.create_levels()) == 36
+
+
+@pytest.mark.parametrize('seed', [3, 17, 2024])
+@pytest.mark.parametrize('saved_after', [0, 1, 9, 55])
+def test_resume_matches_uninterrupted_game(seed, saved_after):
+    original = Game(seed=seed)
+    play(original, saved_after)
+    resumed, = snapshot.load_games(snapshot.save_games([original]), original.levels)
+    uninterrupted = Game(seed=seed)
+    play(uninterrupted, saved_after)
+    for game in (uninterrupted, resumed):
+        play(game, 2_000)
+    assert resumed.is_finished()
+    assert state(resumed) == state(uninterrupted)
+
+
+def test_unseeded_game_keeps_its_state():
+    game = Game(rng=random.Random(5))
+    play(game, 30)
+    loaded, = snapshot.load_games(snapshot.save_games([game]), game.levels)
+    assert state(loaded) == state(game)
+
+
+def test_rejects_other_levels():
+    data = snapshot.save_games([Game(seed=1)])
+    levels = Game.create_levels()
+    with pytest.raises(ValueError, match="different levels"):
+        snapshot.load_games(data, levels[:-1])
+
+
+def test_rejects_other_formats():
+    with pytest.raises(ValueError):
+        snapshot.load_games(b"RWLB" + bytes(20))
@@ -0,0 +1,314 @@
+"""
+Multi-core tournament runner for player strategies.
+
+Games are split into fixed-size shards that run on a ProcessPoolExecutor. Every game gets its own
+random.Random stream derived from (seed, shard, game index), so results do not depend on the number
+of workers and game i of a shard meets the same turn orders and random event rolls with every strategy
+(common random numbers), however many draws the strategies' earlier games used.
+Per-strategy statistics are constant-memory sketches, merged as shards finish and optionally
+checkpointed so that an interrupted run can be resumed (--checkpoint).
+
+A strategy is a picklable callable strategy(game, level, turn_number, turn) that sees the same
+Level/Turn objects as Game.play_turn and returns a direction, or a (direction, upgrade_tires) pair.
+Strategies must not draw from game.rng; random ones keep their own stream (see RandomChoice).
+
+Usage: python tournament.py --games 100000 --workers 4
+"""
+import argparse
+import concurrent.futures
+import math
+import os
+import random
+import time
+import weakref
+
+from main import Game
+from sketches import GameSketch, load_checkpoint, save_checkpoint
+
+
+"""------------------------------STRATEGIES----------------------------------"""
+
+
+def always_left(game, level, turn_number, turn):
+    return 'left'
+
+
+def always_straight(game, level, turn_number, turn):
+    return 'straight'
+
+
+def always_right(game, level, turn_number, turn):
+    return 'right'
+
+
+class RandomChoice:
+    """
+    Purpose: Picks a uniformly random direction from its own random stream per game, seeded from the game's
+    seed (or its shuffle_key when it has none). Drawing from game.rng instead would shift the game's random
+    events, which breaks common random numbers, snapshots and replays.
+    """
+    SALT = "road-wrecker:random-choice"
+
+    def __init__(self):
+        self._rngs = weakref.WeakKeyDictionary()
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self._rngs = weakref.WeakKeyDictionary()
+
+    def __call__(self, game, level, turn_number, turn):
+        rng = self._rngs.get(game)
+        if rng is None:
+            key = game.seed if game.seed is not None else game.shuffle_key
+            rng = self._rngs[game] = random.Random(f"{self.SALT}:{key}")
+        return rng.choice(Game.CHOICES)
+
+
+random_choice = RandomChoice()
+
+
+def greedy_by_damage(game, level, turn_number, turn):
+    """
+    :return: The direction whose event does the least damage (leftmost on ties).
+    """
+    return min(Game.CHOICES, key=lambda choice: turn.get_event(choice).damage)
+
+
+def upgrade_then_greedy(game, level, turn_number, turn):
+    """
+    :return: greedy_by_damage, buying the tire upgrade as soon as it is offered.
+    """
+    return greedy_by_damage(game, level, turn_number, turn), True
+
+
+class OptimalStrategy:
+    """
+    Purpose: Plays the exact optimal policy of solver.solve() for the game's levels.
+    The policy is solved lazily in each worker process and cached per layout there.
+    """
+    def __init__(self):
+        self._game = None
+        self._solution = None
+
+    def __getstate__(self):
+        return {'_game': None, '_solution': None}
+        # Workers solve for themselves instead of receiving a pickled solution.
+
+    def __call__(self, game, level, turn_number, turn):
+        if game is not self._game:
+            import solver
+            # Imported here so processes that never use this strategy do not load the solver.
+            self._game, self._solution = game, solver.solve(game.levels, type(game))
+        solution = self._solution
+        level_index = game.current_level_index
+        upgrade = turn_number == 0 and solution.upgrade(level_index, game.tires_upgraded)
+        choice = solution.choose(level_index, turn, game.ordered_turns(level_index)[:turn_number],
+                                 game.tires_upgraded or upgrade)
+        # On the turn the tires are bought they already apply, so the choice comes from the upgraded policy.
+        return choice, upgrade
+
+
+STRATEGIES = {
+    'left': always_left,
+    'straight': always_straight,
+    'right': always_right,
+    'random': random_choice,
+    'greedy': greedy_by_damage,
+    'upgrade-greedy': upgrade_then_greedy,
+    'optimal': OptimalStrategy(),
+}
+
+
+"""------------------------------STATISTICS----------------------------------"""
+
+
+class StrategyStats(GameSketch):
+    """
+    Purpose: Mergeable, constant-memory statistics of the games one strategy played
+    (see sketches.GameSketch), plus the number of turns played.
+    """
+    def __init__(self):
+        super().__init__()
+        self.turns = 0
+
+    def add_game(self, completed, money_lost, total_money_lost, restarts, turns=0):
+        """
+        :param completed: Boolean, whether the game was won before the turn limit.
+        :param money_lost: Integer, the final money_lost of the game (only counted for completed games).
+        :param total_money_lost: Integer, the money spent over all cars of the game.
+        :param restarts: Integer, how many times the car was totaled.
+        :param turns: Integer, how many turns were played.
+        """
+        super().add_game(completed, money_lost, total_money_lost, restarts)
+        self.turns += turns
+
+    def merge(self, other):
+        """
+        :param other: StrategyStats from another shard; its totals are added to this one.
+        :return: self, so merges can be chained.
+        """
+        super().merge(other)
+        self.turns += other.turns
+        return self
+
+    @property
+    def mean_money_lost(self):
+        return self.money_lost.mean
+
+    @property
+    def std_money_lost(self):
+        return self.money_lost.std
+
+    @property
+    def best_money_lost(self):
+        return self.money_lost.moments.min if self.completed else None
+
+    @property
+    def worst_money_lost(self):
+        return self.money_lost.moments.max if self.completed else None
+
+    @property
+    def mean_total_money_lost(self):
+        return self.total_money_lost.mean
+
+    @property
+    def mean_restarts(self):
+        return self.restarts.mean
+
+    def summary(self):
+        return (f"games {self.games}  completed {self.completed}  money_lost {self.mean_money_lost:.1f} "
+                f"± {self.std_money_lost:.1f} (p50 {self.money_lost.quantile(0.5):.0f}, "
+                f"p99 {self.money_lost.quantile(0.99):.0f})  total {self.mean_total_money_lost:.1f}  "
+                f"restarts {self.mean_restarts:.3f}  turns/game {self.turns / max(self.games, 1):.1f}")
+
+    def to_dict(self):
+        return {**super().to_dict(), 'turns': self.turns}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        GameSketch.merge(stats, GameSketch.from_dict(data))
+        stats.turns = data['turns']
+        return stats
+
+
+"""--------------------------------RUNNER------------------------------------"""
+
+
+def play_game(strategy, rng, max_turns=10_000, game_class=Game, stats=None):
+    """
+    Description: Plays one headless game with a strategy.
+    :param stats: Optional GameSketch that gets the per-level attempts, busts and damage of the game's turns.
+    :return: (completed, money_lost, total_money_lost, restarts, turns)
+    """
+    game = game_class(rng=rng)
+    total_money_lost = game.money_lost
+    turns = 0
+    while not game.is_finished() and turns < max_turns:
+        level = game.levels[game.current_level_index]
+        turn_number = game.current_turn_index
+        decision = strategy(game, level, turn_number, game.turn_at(game.current_level_index, turn_number))
+        result = game.step(decision) if isinstance(decision, str) else game.step(*decision)
+        total_money_lost += result.cost + (game.TIRE_UPGRADE_COST if result.upgraded else 0)
+        turns += 1
+        if stats is not None:
+            stats.add_level(level.name, turn_number == 0, result.reset)
+            stats.add_damage(level.name, result.damage.label)
+    return game.is_finished(), game.money_lost, total_money_lost, game.restarts, turns
+
+
+def game_rng(seed, shard, game_index):
+    """
+    :return: The independent, reproducible random stream of one game of a shard.
+    """
+    return random.Random(f"road-wrecker:{seed}:{shard}:{game_index}")
+
+
+def run_shard(strategies, shard, games, seed, max_turns=10_000):
+    """
+    Description: Worker entry point; plays `games` games with every strategy.
+    :param strategies: Dictionary name -> strategy callable (must be picklable).
+    :return: Dictionary name -> StrategyStats for this shard.
+    """
+    results = {}
+    for name, strategy in strategies.items():
+        stats = StrategyStats()
+        for game_index in range(games):
+            stats.add_game(*play_game(strategy, game_rng(seed, shard, game_index), max_turns, stats=stats))
+            # Every strategy plays each game on the same stream, so they are compared on the same roads.
+        results[name] = stats
+    return results
+
+
+def run_tournament(strategies, games, workers=None, seed=0, shard_size=1_000, max_turns=10_000, on_progress=None,
+                   checkpoint=None):
+    """
+    Description: Plays `games` games per strategy across a process pool.
+    :param strategies: Dictionary name -> strategy callable.
+    :param games: Integer, games per strategy.
+    :param workers: Integer, worker processes; defaults to os.cpu_count().
+    :param seed: Any hashable seed; the same seed and shard_size always give the same results.
+    :param shard_size: Integer, games per shard (the unit of work sent to a worker).
+    :param max_turns: Integer, games still running after this many turns count as not completed.
+    :param on_progress: Optional callable(done_games, totals) called after every merged shard.
+    :param checkpoint: Optional path of a JSON checkpoint, rewritten after every merged shard. If it already
+                       exists the run resumes from it and only plays the shards that are still missing.
+    :return: Dictionary name -> StrategyStats.
+    """
+    totals = {name: StrategyStats() for name in strategies}
+    shards = [(shard, min(shard_size, games - shard * shard_size)) for shard in range(math.ceil(games / shard_size))]
+    run = {'seed': seed, 'games': games, 'shard_size': shard_size, 'max_turns': max_turns,
+           'strategies': sorted(strategies)}
+    finished_shards = set()
+    state = load_checkpoint(checkpoint) if checkpoint else None
+    if state is not None:
+        if state['run'] != run:
+            raise ValueError(f"{checkpoint} belongs to a different tournament: {state['run']}")
+        finished_shards = set(state['finished_shards'])
+        totals = {name: StrategyStats.from_dict(data) for name, data in state['totals'].items()}
+    done = sum(shard_games for shard, shard_games in shards if shard in finished_shards)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(run_shard, strategies, shard, shard_games, seed, max_turns): (shard, shard_games)
+                   for shard, shard_games in shards if shard not in finished_shards}
+        for future in concurrent.futures.as_completed(futures):
+            for name, stats in future.result().items():
+                totals[name].merge(stats)
+            shard, shard_games = futures[future]
+            done += shard_games
+            finished_shards.add(shard)
+            if checkpoint:
+                save_checkpoint(checkpoint, {'run': run, 'finished_shards': sorted(finished_shards),
+                                             'totals': {name: stats.to_dict() for name, stats in totals.items()}})
+            if on_progress is not None:
+                on_progress(done, totals)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a multi-core strategy tournament.")
+    parser.add_argument('--games', type=int, default=10_000, help="games per strategy")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shard-size', type=int, default=1_000)
+    parser.add_argument('--max-turns', type=int, default=10_000)
+    parser.add_argument('--checkpoint', help="JSON checkpoint to resume from and update after every shard")
+    parser.add_argument('--strategies', nargs='+', choices=sorted(STRATEGIES),
+                        default=['greedy', 'upgrade-greedy', 'straight', 'optimal'])
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    totals = run_tournament({name: STRATEGIES[name] for name in args.strategies}, args.games, args.workers,
+                            args.seed, args.shard_size, args.max_turns, checkpoint=args.checkpoint)
+    elapsed = time.perf_counter() - started
+    for name, stats in sorted(totals.items(), key=lambda item: item[1].mean_total_money_lost):
+        print(f"{name:15s} {stats.summary()}")
+        print(f"{'':15s} bust rates: " + "  ".join(f"{level} {rate:.2%}" for level, rate in stats.bust_rates().items()))
+    played = sum(stats.games for stats in totals.values())
+    print(f"Played {played} games in {elapsed:.2f}s ({played / elapsed:,.0f} games/s)")
+
+
+if __name__ == "__main__":
+    main()